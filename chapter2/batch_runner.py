@@ -0,0 +1,247 @@
+"""批处理作业：不依赖 Tk，从作业文件逐行读取指令并通过串口流式发送
+
+作业文件每行一条指令（如 JointAngle_10,20,30,100），发送前按 commands 模块校验参数，
+空行和 # 开头的行忽略；
+也可以是 JSONL，每行 {"command": "Suction_1"} 或 {"op": "DescartesLine", "args": [1, 2, 3, 100]}。
+给出 --workcell 时，按推算的末端位置检查每段运动是否穿过工作单元中的障碍物（见 workcell.py）。
+
+用法：
+    python batch_runner.py job.txt --port /dev/ttyUSB0 --start-line 120
+"""
+
+import argparse
+import collections
+import json
+import os
+import sys
+import time
+
+import commands
+from kinematics import Kinematics, load_kinematics
+from serial_io import DEFAULT_ACK_TIMEOUT, SerialController
+from streaming import CommandStreamer, StreamError
+from workcell import load_workcell, next_position
+
+
+def parse_job_line(text):
+    """把作业文件中的一行解析为校验过的指令对象，空行和注释返回 None"""
+    text = text.strip()
+    if not text or text.startswith("#"):
+        return None
+    if text.startswith("{"):
+        item = json.loads(text)
+        if "command" in item:
+            text = item["command"]
+        else:
+            args = item.get("args", [])
+            text = item["op"] + ("_" + ",".join(str(a) for a in args) if args else "")
+    return commands.from_text(text)
+
+
+def read_job(path, start_line=1):
+    """逐行惰性读取作业文件，生成 (行号, 指令, 已读字节数)，不会整体载入内存"""
+    with open(path, "rb") as f:
+        offset = 0
+        for line_no, raw in enumerate(f, start=1):
+            offset += len(raw)
+            if line_no < start_line:
+                continue
+            try:
+                command = parse_job_line(raw.decode())
+            except (UnicodeDecodeError, ValueError, KeyError) as e:
+                raise ValueError(f"第 {line_no} 行格式错误: {e}") from e
+            if command is not None:
+                yield line_no, command, offset
+
+
+def check_reach(kinematics, command):
+    """检查绝对位置指令的目标是否可达，可达或无需检查时返回 None"""
+    if isinstance(command, commands.JointAngle):
+        return kinematics.check_joints(command.x, command.y, command.z)
+    if isinstance(command, (commands.DescartesPoint, commands.DescartesLine)):
+        return kinematics.check_point(command.x, command.y, command.z)
+    return None
+
+
+class Progress:
+    """按时间间隔输出进度，避免每条确认都刷新终端"""
+
+    def __init__(self, total_bytes, stream=sys.stderr, interval=0.5):
+        self.total_bytes = total_bytes
+        self.stream = stream
+        self.interval = interval
+        self.done = 0
+        self.line_no = 0
+        self.offset = 0
+        self._started = time.monotonic()
+        self._last = 0
+
+    def update(self, line_no, offset):
+        self.done += 1
+        self.line_no = line_no
+        self.offset = offset
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._last = now
+            self._write(now)
+
+    def finish(self):
+        self._write(time.monotonic())
+        self.stream.write("\n")
+
+    def _write(self, now):
+        percent = 100 * self.offset / self.total_bytes if self.total_bytes else 100
+        rate = self.done / max(now - self._started, 1e-9) * 60
+        self.stream.write(
+            f"\r已完成 {self.done} 条，当前第 {self.line_no} 行 ({percent:.1f}%)，"
+            f"{rate:.0f} 条/分钟"
+        )
+        self.stream.flush()
+
+
+def run_job(
+    controller,
+    path,
+    start_line=1,
+    window=4,
+    timeout=DEFAULT_ACK_TIMEOUT,
+    kinematics=None,
+    workcell=None,
+    reach_check=True,
+):
+    """执行作业文件，返回完成的指令数；失败时抛出 StreamError，其 line_no 为可续跑的行号
+
+    给出 kinematics 且 reach_check 为真时，目标不可达的指令在发送前以 ValueError 拒绝；
+    给出 workcell 时，路径穿过障碍物的指令同样被拒绝。第一条绝对位置指令之前起点未知，
+    只检查目标点。
+    """
+    progress = Progress(os.path.getsize(path))
+    sent = collections.deque()  # 已发送未确认指令的 (行号, 已读字节数)
+    check = reach_check and kinematics is not None
+    if workcell is not None and kinematics is None:
+        kinematics = Kinematics()
+    position = None  # 推算的末端位置
+
+    def iter_job_commands():
+        nonlocal position
+        for line_no, command, offset in read_job(path, start_line):
+            if check:
+                error = check_reach(kinematics, command)
+                if error:
+                    raise ValueError(f"第 {line_no} 行目标不可达: {error}")
+            if workcell is not None:
+                error = workcell.check_move(position, command, kinematics)
+                if error:
+                    raise ValueError(f"第 {line_no} 行发生碰撞: {error}")
+                position = next_position(position, command, kinematics)
+            sent.append((line_no, offset))
+            yield command
+
+    def on_ack(index, command, reply):
+        line_no, offset = sent.popleft()
+        progress.update(line_no, offset)
+
+    streamer = CommandStreamer(controller, window=window, timeout=timeout)
+    try:
+        count = streamer.stream(iter_job_commands(), on_ack)
+    except StreamError as e:
+        e.line_no = sent[0][0]
+        raise
+    finally:
+        progress.finish()
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="机械臂批处理作业")
+    parser.add_argument("job", help="作业文件（每行一条指令或 JSONL）")
+    parser.add_argument("--port", default="/dev/ttyUSB0")
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument(
+        "--start-line", type=int, default=1, help="从第 N 行开始（故障后续跑）"
+    )
+    parser.add_argument("--window", type=int, default=4, help="同时在途的指令数")
+    parser.add_argument(
+        "--timeout", type=float, default=DEFAULT_ACK_TIMEOUT, help="等待确认的秒数"
+    )
+    parser.add_argument(
+        "--arm-config",
+        help="机械臂标定配置 (JSON)，给出时在发送前检查目标是否可达",
+    )
+    parser.add_argument(
+        "--no-reach-check",
+        action="store_true",
+        help="给出标定配置时也不检查可达性（标定配置仍用于工作单元路径检查）",
+    )
+    parser.add_argument("--workcell", help="工作单元障碍物配置 (JSON)")
+    parser.add_argument(
+        "--binary",
+        action="store_true",
+        help="尝试启用二进制帧模式（合并发送、CRC 校验），控制器不支持时使用文本指令",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help="统计指令延迟并在结束时写入该文件（.json 为 JSON，否则为 Prometheus 格式）",
+    )
+    args = parser.parse_args(argv)
+    kinematics = None
+    if args.arm_config:
+        try:
+            kinematics = load_kinematics(args.arm_config)
+        except (OSError, ValueError) as e:
+            print(f"无法读取机械臂标定配置: {e}", file=sys.stderr)
+            return 1
+    workcell = None
+    if args.workcell:
+        try:
+            workcell = load_workcell(args.workcell)
+        except (OSError, ValueError) as e:
+            print(f"无法读取工作单元配置: {e}", file=sys.stderr)
+            return 1
+
+    controller = SerialController(events=False)
+    if args.metrics_file:
+        from instrumentation import Instrumentation
+
+        controller.instrument(Instrumentation())
+    if not controller.open_serial(args.port, args.baudrate):
+        print(f"无法打开串口: {controller.last_error}", file=sys.stderr)
+        return 2
+    if args.binary:
+        from binary_protocol import negotiate
+
+        if negotiate(controller):
+            print("已启用二进制帧模式", file=sys.stderr)
+        else:
+            print("控制器不支持二进制帧，使用文本指令", file=sys.stderr)
+    try:
+        count = run_job(
+            controller,
+            args.job,
+            args.start_line,
+            args.window,
+            args.timeout,
+            kinematics,
+            workcell,
+            reach_check=not args.no_reach_check,
+        )
+    except StreamError as e:
+        print(
+            f"作业中断: 第 {e.line_no} 行 {e.command} 失败: {e.error}",
+            file=sys.stderr,
+        )
+        print(f"排除故障后可用 --start-line {e.line_no} 续跑", file=sys.stderr)
+        return 1
+    except ValueError as e:
+        print(f"作业文件错误: {e}", file=sys.stderr)
+        return 1
+    finally:
+        controller.close_serial()
+        if args.metrics_file:
+            controller.instrumentation.save(args.metrics_file)
+    print(f"作业完成，共 {count} 条指令", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""上位机性能基准：指令编码、send_command 吞吐、发送延迟、端到端运动吞吐与日志框开销
+
+全部在本机伪终端上运行，不需要机械臂。用法：
+    python benchmark.py --count 2000 --baudrate 115200 --json bench.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import timeit
+import tty
+
+import commands
+from serial_io import SerialController
+from simulator import PtySimulator
+from streaming import CommandStreamer
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    index = min(len(samples) - 1, round(p / 100 * (len(samples) - 1)))
+    return samples[index]
+
+
+def bench_encode(count):
+    """指令编码的每秒条数
+
+    fstring 为原先 send_* 中的格式化加 encode（基线），command 为每次新建
+    DescartesLine 对象再编码，cached 为重复发送同一对象（直接返回缓存的字节串）。
+    """
+    x, y, z, speed = 123.456, -78.9, 42.0, 100
+    command = commands.DescartesLine(x, y, z, speed)
+    cases = {
+        "encode_fstring_per_s": lambda: f"DescartesLine_{x},{y},{z},{speed}\n".encode(),
+        "encode_command_per_s": lambda: commands.DescartesLine(x, y, z, speed).encode(),
+        "encode_cached_per_s": command.encode,
+    }
+    return {
+        name: count / timeit.timeit(func, number=count) for name, func in cases.items()
+    }
+
+
+def bench_send(count):
+    """send_command 入队到写线程全部写出的吞吐，以及从调用到字节出现在线路上的延迟"""
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    controller = SerialController()
+    controller.open_serial(os.ttyname(slave), 115200)
+    try:
+        command = "MovStart_0,1,1,\n"  # 不需要应答的指令
+        size = len(command)
+
+        # 吞吐：连续入队，队列满时读走线路上的数据，让写线程继续
+        received = 0
+        started = time.perf_counter()
+        sent = 0
+        while sent < count:
+            if controller.send_command(command):
+                sent += 1
+            else:
+                received += len(os.read(master, 65536))
+        while received < count * size:
+            received += len(os.read(master, 65536))
+        throughput = count / (time.perf_counter() - started)
+
+        # 延迟：逐条发送，从调用 send_command 到主端读到完整指令
+        latencies = []
+        for _ in range(min(count, 1000)):
+            started = time.perf_counter()
+            controller.send_command(command)
+            got = 0
+            while got < size:
+                got += len(os.read(master, 65536))
+            latencies.append((time.perf_counter() - started) * 1e6)
+    finally:
+        controller.close_serial()
+        os.close(master)
+        os.close(slave)
+    return {
+        "send_per_s": throughput,
+        "send_latency_p50_us": percentile(latencies, 50),
+        "send_latency_p99_us": percentile(latencies, 99),
+        "send_latency_mean_us": statistics.fmean(latencies),
+    }
+
+
+def bench_moves(count, baudrate, windows=(1, 4)):
+    """经模拟器确认的端到端运动吞吐（条/分钟），比较停等与流水线窗口"""
+    result = {}
+    for window in windows:
+        sim = PtySimulator(time_scale=0, baudrate=baudrate).start()
+        controller = SerialController(events=False)
+        controller.open_serial(sim.port, baudrate or 115200)
+        try:
+            moves = (
+                commands.DescartesLinearOffset(i % 2 * 2 - 1, 0, 0, 100)
+                for i in range(count)
+            )
+            started = time.perf_counter()
+            CommandStreamer(controller, window=window, timeout=5).stream(moves)
+            elapsed = time.perf_counter() - started
+        finally:
+            controller.close_serial()
+            sim.close()
+        result[f"moves_per_min_window_{window}"] = count / elapsed * 60
+    return result
+
+
+def bench_log_pane(count):
+    """RobotControlApp.update_serial_info 每条消息的耗时（含按帧刷新），需要图形显示环境"""
+    try:
+        import tkinter as tk
+
+        root = tk.Tk()
+    except Exception as e:
+        print(f"跳过日志框测试: {e}", file=sys.stderr)
+        return {}
+    from main import RobotControlApp
+
+    root.withdraw()
+    app = RobotControlApp(root)
+    try:
+        started = time.perf_counter()
+        for i in range(count):
+            app.update_serial_info(f"发送成功: DescartesLine_{i},0,0,100")
+            if i % 100 == 0:
+                root.update()  # 模拟界面循环按帧刷新
+        app.serial_log.flush()
+        root.update_idletasks()
+        per_message = (time.perf_counter() - started) / count
+    finally:
+        root.destroy()
+    return {"log_pane_us_per_message": per_message * 1e6}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="上位机性能基准")
+    parser.add_argument("--count", type=int, default=2000, help="每项测试的指令数")
+    parser.add_argument(
+        "--baudrate", type=int, default=None, help="模拟器线路速率，不设则不限速"
+    )
+    parser.add_argument("--json", help="把结果写入 JSON 文件，便于回归比较")
+    args = parser.parse_args(argv)
+
+    results = {}
+    results.update(bench_encode(args.count * 100))
+    results.update(bench_send(args.count))
+    results.update(bench_moves(args.count, args.baudrate))
+    results.update(bench_log_pane(args.count))
+
+    for name, value in results.items():
+        print(f"{name:32s} {value:14.1f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""二进制帧模式：定点数编码、长度前缀、CRC16 校验，多条指令合并为一帧
+
+帧格式（多字节整数均为小端，CRC 为大端）：
+
+    0xA5 | LEN | 记录 1 | 记录 2 | ... | CRC16
+    记录 = 操作码编号 (1 字节) + 定长字段
+
+LEN 为记录部分的字节数 (1~255)，CRC16 为 CRC-16/CCITT-FALSE，覆盖 LEN 与全部记录。
+坐标、偏移和关节角按 0.001 的定点数存为 int32，与文本指令保留三位小数的精度相同；
+速度、引脚等小整数各占 1 字节。一条 DescartesLinearOffset_ 的记录为 14 字节，
+文本约 40 字节，一帧最多合并 18 条。
+
+控制器按首字节区分帧和文本行，两种格式可以在同一链路上混用：协商成功后运动指令
+按帧发送，急停、松开按键和手动输入的文本仍以文本发送。这要求文本中不出现 0xA5，
+因此帧模式下文本指令只能是 ASCII，SerialWriter 拒绝发送含其他字符的文本。
+控制器对每条记录仍以文本行应答，与文本模式完全一致；CRC 错误的帧整帧丢弃，
+控制器回复一次 "Error: frame crc"，并跳过到下一个同步字节或换行为止的字节，
+不把帧的残余当作文本执行；主机让这一帧里所有等待回复的指令失败。
+
+LEN 字节损坏时解码器会把之后的字节都当作帧内容等待。为了让急停不被吞掉，
+等待不完整的帧时一旦收到完整的 "Stop\n" 或 "MovStp\n"，或等待超过 FRAME_TIMEOUT，
+就丢弃这个不完整的帧（回复 "Error: frame truncated"）；夹在乱码后面的急停文本也会
+单独分出。
+
+协商：发送 Binary_1，控制器回复 "Binary: 1" 后启用；不支持的控制器回复错误或不回复，
+保持文本模式。重新打开串口后回到文本模式，需要再次协商。
+"""
+
+import binascii
+import struct
+import time
+from concurrent.futures import Future
+
+import commands
+
+SYNC = 0xA5
+MAX_PAYLOAD = 255
+HEADER_SIZE = 2  # SYNC + LEN
+CRC_SIZE = 2
+FIXED_SCALE = 1000  # 定点数的缩放倍数
+NEGOTIATE_TIMEOUT = 1.0  # 等待协商回复的秒数 (s)
+FRAME_TIMEOUT = 0.5  # 不完整的帧最多等待的时间，覆盖 9600 波特率下最长的一帧 (s)
+
+# 操作码编号为在此表中的序号加 1，属于协议的一部分，只能在末尾追加。
+# 急停 (Stop) 与松开按键 (MovStp) 不在表中，始终以文本发送，帧损坏时也能被解码器识别
+OPCODE_TABLE = (
+    "JointAngle",
+    "JointAngleOffset",
+    "DescartesPoint",
+    "DescartesPointOffset",
+    "DescartesLine",
+    "DescartesLinearOffset",
+    "Speed",
+    "Suction",
+    "Grasp",
+    "CtrlMode",
+    "SetStepOK",
+    "Clean",
+    "Editor",
+    "Single",
+    "Cycle",
+    "Delete",
+    "Insert",
+    "Align",
+    "Axis",
+    "RodLen",
+    "DI",
+    "DO",
+    "Factory",
+    "MovStart",
+    "Origin",
+    "SetStep",
+    "Infor",
+    "Refer",
+    "Trigger",
+    "ZERO",
+)
+
+# 每种记录的字段：f 为定点数 (int32)，其余为 struct 格式字符
+_MOTION = "fffB"
+_LAYOUTS = {
+    "JointAngle": _MOTION,
+    "JointAngleOffset": _MOTION,
+    "DescartesPoint": _MOTION,
+    "DescartesPointOffset": _MOTION,
+    "DescartesLine": _MOTION,
+    "DescartesLinearOffset": _MOTION,
+    "Speed": "B",
+    "Suction": "B",
+    "Grasp": "B",
+    "CtrlMode": "B",
+    "SetStepOK": "B",
+    "Clean": "B",
+    "Editor": "B",
+    "Single": "B",
+    "Cycle": "B",
+    "Delete": "B",
+    "Insert": "B",
+    "Align": "I",
+    "Axis": "H",
+    "RodLen": "H",
+    "DI": "BB",
+    "DO": "BB",
+    "Factory": "BB",
+    "MovStart": "BBB",
+    "Origin": "B",  # 速度，0 表示不带速度
+    "SetStep": "BBBBfffBIBB",
+    "Infor": "",
+    "Refer": "",
+    "Trigger": "",
+    "ZERO": "",
+}
+
+
+class _Record:
+    __slots__ = ("code", "cls", "struct", "fixed")
+
+    def __init__(self, code, name, layout):
+        self.code = code
+        self.cls = commands.OPCODES[name]
+        self.struct = struct.Struct("<" + layout.replace("f", "i"))
+        self.fixed = tuple(i for i, c in enumerate(layout) if c == "f")
+
+
+_RECORDS = {
+    name: _Record(code, name, _LAYOUTS[name])
+    for code, name in enumerate(OPCODE_TABLE, start=1)
+}
+_BY_CODE = {record.code: record for record in _RECORDS.values()}
+
+
+def crc16(data):
+    """CRC-16/CCITT-FALSE"""
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def encode_record(command):
+    """指令对象 -> 记录字节串；文本指令或只能以文本发送的指令返回 None"""
+    record = _RECORDS.get(getattr(command, "opcode", None))
+    if record is None:
+        return None
+    if command.opcode == "Origin":
+        args = (command.speed or 0,)
+    else:
+        args = list(command.args())
+        for i in record.fixed:
+            args[i] = round(args[i] * FIXED_SCALE)
+    return bytes((record.code,)) + record.struct.pack(*args)
+
+
+def encode_frame(records):
+    """把若干条记录组成一帧，记录总长不能超过 MAX_PAYLOAD"""
+    payload = b"".join(records)
+    if not 0 < len(payload) <= MAX_PAYLOAD:
+        raise ValueError(f"帧长度超出范围 1~{MAX_PAYLOAD}: {len(payload)}")
+    body = bytes((len(payload),)) + payload
+    return bytes((SYNC,)) + body + crc16(body).to_bytes(2, "big")
+
+
+def decode_payload(payload):
+    """帧内的记录部分 -> 指令对象列表；编号未知或参数不合法时抛出 ValueError"""
+    result = []
+    offset = 0
+    while offset < len(payload):
+        record = _BY_CODE.get(payload[offset])
+        if record is None:
+            raise ValueError(f"未知的操作码编号: {payload[offset]}")
+        offset += 1
+        end = offset + record.struct.size
+        if end > len(payload):
+            raise ValueError("记录不完整")
+        args = list(record.struct.unpack_from(payload, offset))
+        offset = end
+        for i in record.fixed:
+            args[i] = args[i] / FIXED_SCALE
+        if record.cls is commands.Origin:
+            args = [args[0]] if args[0] else []
+        result.append(record.cls(*args))
+    return result
+
+
+class BinaryFraming:
+    """SerialWriter 使用的编码器：判断指令能否按帧发送，并把一批指令编码为一帧"""
+
+    max_payload = MAX_PAYLOAD
+
+    def accepts(self, command):
+        return getattr(command, "opcode", None) in _RECORDS
+
+    def size(self, command):
+        """指令记录的字节数"""
+        return 1 + _RECORDS[command.opcode].struct.size
+
+    def frame(self, batch):
+        return encode_frame([encode_record(c) for c in batch])
+
+
+# 帧损坏时也必须识别出的文本指令
+_ESCAPES = (commands.STOP.encode(), commands.MOV_STP.encode())
+
+
+class FrameDecoder:
+    """控制器一侧（模拟器）的解码器：从字节流中分出文本行和帧
+
+    feed() 返回 [(kind, value)]：("text", 行)、("command", 指令对象) 或 ("error", 原因)。
+    CRC 错误时丢弃到下一个同步字节或换行为止（可能跨多次 feed），其间的字节不产生
+    文本行，急停文本除外；不完整的帧遇到急停文本或超过 timeout 时丢弃。
+    """
+
+    def __init__(self, timeout=FRAME_TIMEOUT, clock=time.monotonic):
+        self.timeout = timeout
+        self.clock = clock
+        self._buffer = bytearray()
+        self._waiting_since = None  # 开始等待不完整帧的时刻
+        self._skipping = False  # 正在丢弃 CRC 错误的帧的残余
+
+    def feed(self, data):
+        items = []
+        buffer = self._buffer
+        now = self.clock()
+        waiting_since, self._waiting_since = self._waiting_since, None
+        if waiting_since is not None and now - waiting_since > self.timeout:
+            # 超时前收到的字节都属于这个不完整的帧，整体丢弃，新数据从头开始解析
+            buffer.clear()
+            items.append(("error", "frame truncated"))
+            waiting_since = None
+        buffer += data
+        while buffer:
+            if self._skipping:
+                # 残余到下一个同步字节、换行（含）或急停文本为止
+                cuts = [
+                    buffer.find(bytes((SYNC,))),
+                    _find_escape(buffer, 0, len(buffer)),
+                ]
+                end = buffer.find(b"\n")
+                cuts.append(end + 1 if end >= 0 else -1)
+                cuts = [i for i in cuts if i >= 0]
+                if not cuts:
+                    buffer.clear()
+                    break
+                del buffer[: min(cuts)]
+                self._skipping = False
+                continue
+            if buffer[0] == SYNC:
+                size = HEADER_SIZE + buffer[1] + CRC_SIZE if len(buffer) > 1 else 0
+                if len(buffer) < HEADER_SIZE or len(buffer) < size:
+                    escape = _find_escape(buffer, 1, len(buffer))
+                    if escape < 0:
+                        # 同一个帧跨多次 feed 时保留最初的等待时刻
+                        self._waiting_since = (
+                            now if waiting_since is None else waiting_since
+                        )
+                        break
+                    # LEN 可能已损坏：放弃这个帧，急停文本从头开始解析
+                    del buffer[:escape]
+                    items.append(("error", "frame truncated"))
+                    waiting_since = None
+                    continue
+                body = bytes(buffer[1 : size - CRC_SIZE])
+                crc = int.from_bytes(buffer[size - CRC_SIZE : size], "big")
+                if buffer[1] == 0 or crc16(body) != crc:
+                    # LEN 也可能已损坏，不能按 LEN 跳过整帧
+                    del buffer[:1]
+                    self._skipping = True
+                    items.append(("error", "frame crc"))
+                    continue
+                del buffer[:size]
+                try:
+                    items.extend(("command", c) for c in decode_payload(body[1:]))
+                except ValueError as e:
+                    items.append(("error", f"frame {e}"))
+                continue
+            end = buffer.find(b"\n")
+            sync = buffer.find(bytes((SYNC,)))
+            if 0 <= sync and (end < 0 or sync < end):
+                del buffer[:sync]  # 同步字节前的残缺文本
+                continue
+            if end < 0:
+                break
+            escape = _find_escape(buffer, 1, end + 1)
+            if escape > 0:
+                del buffer[:escape]  # 急停文本前的乱码（如损坏帧的残余）
+                continue
+            line = buffer[:end].decode(errors="replace").strip()
+            del buffer[: end + 1]
+            if line:
+                items.append(("text", line))
+        return items
+
+
+def _find_escape(buffer, start, end):
+    """buffer[start:end] 中第一条急停或松开按键文本的位置，没有时返回 -1"""
+    found = [buffer.find(escape, start, end) for escape in _ESCAPES]
+    found = [i for i in found if i >= 0]
+    return min(found) if found else -1
+
+
+def request_binary(controller, timeout=NEGOTIATE_TIMEOUT):
+    """发出 Binary_1 并立即返回 Future，不阻塞
+
+    控制器同意时先给 controller 装上 BinaryFraming，Future 结果为 True；
+    不支持（回复错误或超时）时保持文本模式，结果为 False。
+    """
+    result = Future()
+
+    def done(future):
+        accepted = (
+            not future.cancelled()
+            and future.exception() is None
+            and future.result().split(":", 1)[-1].strip() == "1"
+        )
+        if accepted:
+            controller.set_framing(BinaryFraming())
+        result.set_result(accepted)
+
+    controller.submit(commands.Binary(1), timeout=timeout).add_done_callback(done)
+    return result
+
+
+def negotiate(controller, timeout=NEGOTIATE_TIMEOUT):
+    """请求控制器启用二进制帧，成功时给 controller 装上 BinaryFraming 并返回 True
+
+    控制器不支持（回复错误或超时）时保持文本模式，返回 False。
+    """
+    try:
+        return request_binary(controller, timeout).result(timeout + 1)
+    except TimeoutError:
+        return False
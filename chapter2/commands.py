@@ -0,0 +1,457 @@
+"""Order 指令的类型化表示：构造时校验参数范围，encode() 返回以换行结尾的字节串
+
+每种操作码对应一个使用 __slots__ 的类，编码结果在第一次调用 encode() 时缓存；
+不带参数或参数固定的指令（急停、松开按键、吸嘴开关等）预先构造为模块常量，
+发送时直接使用缓存的字节串，不再做任何格式化。
+"""
+
+import math
+
+COORD_LIMIT = 1000.0  # 坐标及偏移的绝对值上限 (mm)，可达性由 kinematics 检查
+ANGLE_LIMIT = 360.0  # 关节角及偏移的绝对值上限 (°)
+DELAY_LIMIT = 100000  # 步骤延时上限 (ms)，见 Order.h 中的 DELAY_UPPER_LIMIT
+STEP_NUM = 50  # 步骤数上限，见 Order.h 中的 STEP_NUM
+RECIPE_NUM = 3  # 配方数，见 Repice.h 中的 RECIPE_NUM
+IO_NUM = 4  # DI/DO 引脚数
+
+
+def _format(value):
+    # 整数原样输出，小数最多保留三位并去掉多余的 0，避免 12.345678000001 这样的长串
+    if isinstance(value, int):
+        return str(value)
+    text = f"{value:.3f}".rstrip("0").rstrip(".")
+    return "0" if text == "-0" else text
+
+
+def _number(name, value, limit):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} 必须是数字: {value!r}") from None
+    if not math.isfinite(value) or abs(value) > limit:
+        raise ValueError(f"{name} 超出范围 ±{limit}: {value}")
+    return value
+
+
+def _integer(name, value, low, high):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} 必须是整数: {value!r}") from None
+    if not number.is_integer():
+        raise ValueError(f"{name} 必须是整数: {value!r}")
+    number = int(number)
+    if not low <= number <= high:
+        raise ValueError(f"{name} 超出范围 {low}~{high}: {number}")
+    return number
+
+
+def _speed(value):
+    return _integer("速度", value, 1, 100)
+
+
+# 指令基类
+class Command:
+    __slots__ = ("_data",)
+    opcode = ""
+    suffix = ""  # 参数后的固定后缀，如 MovStart 的结尾逗号
+
+    def __init__(self):
+        self._data = None
+
+    def args(self):
+        return ()
+
+    def encode(self):
+        """返回以换行结尾的指令字节串（缓存）"""
+        if self._data is None:
+            args = self.args()
+            text = self.opcode
+            if args:
+                text += "_" + ",".join(_format(a) for a in args)
+            self._data = (text + self.suffix + "\n").encode()
+        return self._data
+
+    def __str__(self):
+        return self.encode().decode().rstrip("\n")
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self}>"
+
+
+# 三个坐标加分速度的运动指令
+class _Motion(Command):
+    __slots__ = ("x", "y", "z", "speed")
+    limit = COORD_LIMIT
+
+    def __init__(self, x, y, z, speed):
+        super().__init__()
+        self.x = _number("X", x, self.limit)
+        self.y = _number("Y", y, self.limit)
+        self.z = _number("Z", z, self.limit)
+        self.speed = _speed(speed)
+
+    def args(self):
+        return (self.x, self.y, self.z, self.speed)
+
+
+class JointAngle(_Motion):
+    __slots__ = ()
+    opcode = "JointAngle"
+    limit = ANGLE_LIMIT
+
+
+class JointAngleOffset(_Motion):
+    __slots__ = ()
+    opcode = "JointAngleOffset"
+    limit = ANGLE_LIMIT
+
+
+class DescartesPoint(_Motion):
+    __slots__ = ()
+    opcode = "DescartesPoint"
+
+
+class DescartesPointOffset(_Motion):
+    __slots__ = ()
+    opcode = "DescartesPointOffset"
+
+
+class DescartesLine(_Motion):
+    __slots__ = ()
+    opcode = "DescartesLine"
+
+
+class DescartesLinearOffset(_Motion):
+    __slots__ = ()
+    opcode = "DescartesLinearOffset"
+
+
+# 单个整数参数的指令
+class _Single(Command):
+    __slots__ = ("value",)
+    label = "参数"
+    low = 0
+    high = 1
+
+    def __init__(self, value):
+        super().__init__()
+        self.value = _integer(self.label, value, self.low, self.high)
+
+    def args(self):
+        return (self.value,)
+
+
+class Speed(_Single):
+    __slots__ = ()
+    opcode = "Speed"
+    label = "总速度"
+    low = 1
+    high = 100
+
+
+class Suction(_Single):
+    __slots__ = ()
+    opcode = "Suction"
+    label = "吸嘴状态"
+
+
+class Grasp(_Single):
+    __slots__ = ()
+    opcode = "Grasp"
+    label = "手抓状态"
+
+
+class CtrlMode(_Single):
+    __slots__ = ()
+    opcode = "CtrlMode"
+    label = "控制模式"
+
+
+class SetStepOK(_Single):
+    __slots__ = ()
+    opcode = "SetStepOK"
+    label = "配方"
+    low = 1
+    high = RECIPE_NUM
+
+
+class Clean(SetStepOK):
+    __slots__ = ()
+    opcode = "Clean"
+
+
+class Editor(SetStepOK):
+    __slots__ = ()
+    opcode = "Editor"
+
+
+class Single(SetStepOK):
+    __slots__ = ()
+    opcode = "Single"
+
+
+class Cycle(SetStepOK):
+    __slots__ = ()
+    opcode = "Cycle"
+
+
+class Delete(_Single):
+    __slots__ = ()
+    opcode = "Delete"
+    label = "步骤数"
+    low = 1
+    high = STEP_NUM
+
+
+class Insert(Delete):
+    __slots__ = ()
+    opcode = "Insert"
+
+
+class Align(_Single):
+    __slots__ = ()
+    opcode = "Align"
+    label = "自动校准次数"
+    high = 1000000
+
+
+class Axis(_Single):
+    __slots__ = ()
+    opcode = "Axis"
+    label = "第四轴角度"
+    high = 270
+
+
+class RodLen(_Single):
+    __slots__ = ()
+    opcode = "RodLen"
+    label = "末端杆长"
+    low = 1
+    high = 1000
+
+
+class Binary(_Single):
+    """切换二进制帧模式（见 binary_protocol.py），1 为启用"""
+
+    __slots__ = ()
+    opcode = "Binary"
+    label = "二进制帧模式"
+
+
+# DI/DO 引脚状态
+class DI(Command):
+    __slots__ = ("pin", "state")
+    opcode = "DI"
+
+    def __init__(self, pin, state):
+        super().__init__()
+        self.pin = _integer("引脚号", pin, 0, IO_NUM - 1)
+        self.state = _integer("引脚状态", state, 0, 1)
+
+    def args(self):
+        return (self.pin, self.state)
+
+
+class DO(DI):
+    __slots__ = ()
+    opcode = "DO"
+
+
+class Factory(Command):
+    __slots__ = ("program", "recipe")
+    opcode = "Factory"
+
+    def __init__(self, program, recipe):
+        super().__init__()
+        self.program = _integer("出厂程序", program, 1, 2)
+        self.recipe = _integer("配方", recipe, 1, RECIPE_NUM)
+
+    def args(self):
+        return (self.program, self.recipe)
+
+
+class MovStart(Command):
+    """按键移动：frame 0 为关节坐标、1 为世界坐标，axis 为 1~3"""
+
+    __slots__ = ("frame", "axis", "direction")
+    opcode = "MovStart"
+    suffix = ","
+
+    def __init__(self, frame, axis, direction):
+        super().__init__()
+        self.frame = _integer("坐标系", frame, 0, 1)
+        self.axis = _integer("轴号", axis, 1, 3)
+        self.direction = _integer("方向", direction, 0, 1)
+
+    def args(self):
+        return (self.frame, self.axis, self.direction)
+
+
+class Origin(Command):
+    """回原点，可带速度（主程序一直以 Origin_速度 发送）"""
+
+    __slots__ = ("speed",)
+    opcode = "Origin"
+
+    def __init__(self, speed=None):
+        super().__init__()
+        self.speed = None if speed is None else _speed(speed)
+
+    def args(self):
+        return () if self.speed is None else (self.speed,)
+
+
+class SetStep(Command):
+    """步骤设入，参数顺序与 Order 指令表一致"""
+
+    __slots__ = (
+        "execute",
+        "insert",
+        "step",
+        "kind",
+        "x",
+        "y",
+        "z",
+        "speed",
+        "delay",
+        "pin",
+        "state",
+    )
+    opcode = "SetStep"
+    suffix = ","
+
+    def __init__(self, execute, insert, step, kind, x, y, z, speed, delay, pin, state):
+        super().__init__()
+        self.execute = _integer("执行判断", execute, 0, 1)
+        self.insert = _integer("插入功能", insert, 0, 1)
+        self.step = _integer("步骤数", step, 1, STEP_NUM)
+        self.kind = _integer("指令类型", kind, 1, 11)
+        self.x = _number("A1/X", x, COORD_LIMIT)
+        self.y = _number("A2/Y", y, COORD_LIMIT)
+        self.z = _number("A3/Z", z, COORD_LIMIT)
+        self.speed = _speed(speed)
+        self.delay = _integer("延时", delay, 0, DELAY_LIMIT)
+        self.pin = _integer("IO引脚", pin, 0, IO_NUM - 1)
+        self.state = _integer("IO状态", state, 0, 1)
+
+    def args(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+
+# 不带参数的指令
+class _Constant(Command):
+    __slots__ = ()
+
+
+class Stop(_Constant):
+    __slots__ = ()
+    opcode = "Stop"
+
+
+class MovStp(_Constant):
+    __slots__ = ()
+    opcode = "MovStp"
+
+
+class Infor(_Constant):
+    __slots__ = ()
+    opcode = "Infor"
+
+
+class Refer(_Constant):
+    __slots__ = ()
+    opcode = "Refer"
+
+
+class Trigger(_Constant):
+    __slots__ = ()
+    opcode = "Trigger"
+
+
+class Zero(_Constant):
+    __slots__ = ()
+    opcode = "ZERO"
+
+
+OPCODES = {
+    cls.opcode: cls
+    for cls in (
+        JointAngle,
+        JointAngleOffset,
+        DescartesPoint,
+        DescartesPointOffset,
+        DescartesLine,
+        DescartesLinearOffset,
+        Speed,
+        Suction,
+        Grasp,
+        CtrlMode,
+        SetStepOK,
+        Clean,
+        Editor,
+        Single,
+        Cycle,
+        Delete,
+        Insert,
+        Align,
+        Axis,
+        RodLen,
+        Binary,
+        DI,
+        DO,
+        Factory,
+        MovStart,
+        Origin,
+        SetStep,
+        Stop,
+        MovStp,
+        Infor,
+        Refer,
+        Trigger,
+        Zero,
+    )
+}
+
+
+def from_text(text):
+    """把一行文本指令解析为指令对象，未知操作码或参数不合法时抛出 ValueError"""
+    text = text.strip().replace("，", ",")
+    name, _, rest = text.partition("_")
+    cls = OPCODES.get(name)
+    if cls is None:
+        raise ValueError(f"未知指令: {name}")
+    args = [a.strip() for a in rest.split(",")] if rest else []
+    if args and not args[-1]:
+        args.pop()  # 文档示例中的结尾逗号
+    try:
+        return cls(*args)
+    except TypeError:
+        raise ValueError(f"{name} 参数个数错误: {len(args)}") from None
+
+
+# 预先编码的常用指令
+STOP = Stop()
+MOV_STP = MovStp()
+INFOR = Infor()
+SUCTION_ON = Suction(1)
+SUCTION_OFF = Suction(0)
+GRASP_ON = Grasp(1)
+GRASP_OFF = Grasp(0)
+MOV_START = {
+    (frame, axis, direction): MovStart(frame, axis, direction)
+    for frame in (0, 1)
+    for axis in (1, 2, 3)
+    for direction in (0, 1)
+}
+for _command in (
+    STOP,
+    MOV_STP,
+    INFOR,
+    SUCTION_ON,
+    SUCTION_OFF,
+    GRASP_ON,
+    GRASP_OFF,
+    *MOV_START.values(),
+):
+    _command.encode()
@@ -0,0 +1,260 @@
+"""串口连接管理：缓存的端口枚举、断线检测与自动重连
+
+comports() 在主机串口较多时需要遍历整个 /sys/class/tty，耗时可达数百毫秒，
+因此 PortScanner 缓存枚举结果，只在过期后重新扫描。ConnectionManager 在后台线程中
+检查读写线程是否发现串口失效，失效后关闭旧句柄，按 USB 序列号/VID:PID/物理位置
+找回重新枚举后的同一个适配器（设备名可能从 ttyUSB0 变成 ttyUSB1）并重新打开。
+
+断线时尚未完成的指令按 policy 处理：
+    "abort"  全部以 ConnectionLost 失败（默认，最安全）；
+    "replay" 还没写出的指令重连后按原顺序发送；已写出但没有回复的指令只重发
+             绝对位置类指令（重复执行结果相同），偏移类指令无法确定是否已执行，
+             仍以 ConnectionLost 失败。
+断线前已启用二进制帧时，重连后先重新协商（串口重新打开后回到文本模式），
+控制器不再支持时继续用文本指令。
+所有状态变化都以文本放入 events 队列，由界面线程显示，不弹出对话框。
+"""
+
+import queue
+import threading
+import time
+
+from serial_io import DEFAULT_ACK_TIMEOUT, ConnectionLost, command_name
+
+POLICIES = ("abort", "replay")
+DEFAULT_POLL_INTERVAL = 0.2  # 检查连接状态的间隔 (s)
+DEFAULT_SCAN_TTL = 2.0  # 已连接时端口列表的缓存时间 (s)，用于发现插拔
+
+# 重复执行结果相同的指令，断线时即使已写出也可以安全重发
+IDEMPOTENT_COMMANDS = (
+    "JointAngle",
+    "DescartesPoint",
+    "DescartesLine",
+    "Speed",
+    "Suction",
+    "Grasp",
+    "DO",
+    "DI",
+    "Infor",
+    "Stop",
+    "Origin",
+)
+
+
+def port_identity(info):
+    """适配器的稳定标识：优先 USB 序列号，其次 VID:PID 加物理位置"""
+    if info.serial_number:
+        return ("serial", info.vid, info.pid, info.serial_number)
+    if info.vid is not None:
+        return ("usb", info.vid, info.pid, info.location)
+    return ("device", info.device)
+
+
+class PortScanner:
+    """带缓存的串口枚举，线程安全"""
+
+    def __init__(self, ttl=DEFAULT_SCAN_TTL):
+        self.ttl = ttl
+        self._ports = []
+        self._time = None
+        self._lock = threading.Lock()
+
+    def ports(self, max_age=None):
+        """返回端口列表 (ListPortInfo)，缓存超过 max_age 秒时重新扫描"""
+        max_age = self.ttl if max_age is None else max_age
+        with self._lock:
+            if self._time is None or time.monotonic() - self._time > max_age:
+                self._rescan()
+            return list(self._ports)
+
+    def cached(self):
+        """返回上次扫描的结果，不触发扫描（界面线程使用）"""
+        with self._lock:
+            return list(self._ports)
+
+    def devices(self, max_age=None):
+        return [info.device for info in self.ports(max_age)]
+
+    def rescan(self):
+        """强制重新扫描，返回 (新增的设备名, 移除的设备名)"""
+        with self._lock:
+            return self._rescan()
+
+    def _rescan(self):
+        # list_ports 在 Linux 上会连带导入 glob/os.path 等模块，推迟到第一次扫描
+        import serial.tools.list_ports
+
+        before = {info.device for info in self._ports}
+        self._ports = sorted(
+            serial.tools.list_ports.comports(), key=lambda info: info.device
+        )
+        self._time = time.monotonic()
+        after = {info.device for info in self._ports}
+        return sorted(after - before), sorted(before - after)
+
+    def find(self, identity, max_age=None):
+        for info in self.ports(max_age):
+            if port_identity(info) == identity:
+                return info
+        return None
+
+
+class ConnectionManager(threading.Thread):
+    """保持一个 SerialController 处于连接状态
+
+    open() 记下要连接的端口，断线后自动重连，close() 后不再重连。
+    """
+
+    def __init__(
+        self,
+        controller,
+        policy="abort",
+        scanner=None,
+        poll_interval=DEFAULT_POLL_INTERVAL,
+    ):
+        super().__init__(name="ConnectionManager", daemon=True)
+        if policy not in POLICIES:
+            raise ValueError(f"未知的断线处理策略: {policy}")
+        self.controller = controller
+        self.policy = policy
+        self.scanner = scanner or PortScanner()
+        self.poll_interval = poll_interval
+        self.events = queue.SimpleQueue()  # 状态文本，由界面线程取走
+        self.controller.hold_on_error = True
+        self._target = None  # (identity, device, baudrate)
+        self._held = ([], [])
+        self._lost_at = None
+        self._binary = False  # 断线前是否启用了二进制帧，重连后需要重新协商
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = True
+
+    @property
+    def connected(self):
+        return self.controller.ser.is_open and not self.controller.lost.is_set()
+
+    @property
+    def reconnecting(self):
+        return self._lost_at is not None
+
+    def open(self, port, baudrate):
+        """打开串口并在断线后自动重连，打开失败返回 False（原因见 controller.last_error）"""
+        with self._lock:
+            self._give_up(ConnectionLost("已重新选择串口"))
+            self._lost_at = None
+            self._binary = False
+            if self.controller.ser.is_open:
+                self.controller.close_serial()
+            if not self.controller.open_serial(port, baudrate):
+                self._target = None
+                return False
+            # 用缓存的端口列表，不在界面线程里重新扫描
+            info = next((i for i in self.scanner.cached() if i.device == port), None)
+            identity = port_identity(info) if info else ("device", port)
+            self._target = (identity, port, baudrate)
+            return True
+
+    def close(self):
+        with self._lock:
+            self._target = None
+            self._lost_at = None
+            self._binary = False
+            self._give_up(ConnectionLost("串口已关闭"))
+            return self.controller.close_serial()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+
+    def run(self):
+        # 启动后立即在后台扫描一次，界面不必等待 comports()
+        known = set(self.scanner.devices(max_age=0))
+        while self._running:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            with self._lock:
+                if self._target is None:
+                    continue
+                if self.controller.lost.is_set():
+                    self._on_lost()
+                if self._lost_at is not None:
+                    self._try_reconnect()
+            # 已连接时也按缓存时间扫描，报告插拔事件
+            if self._lost_at is None:
+                devices = set(self.scanner.devices())
+                if known is not None:
+                    for device in sorted(devices - known):
+                        self.events.put(f"发现串口 {device}")
+                    for device in sorted(known - devices):
+                        self.events.put(f"串口 {device} 已移除")
+                known = devices
+
+    def _on_lost(self):
+        error = self.controller.reader.error if self.controller.reader else None
+        queued, unacked = self.controller.detach()
+        self.controller.lost.clear()
+        self._binary = self._binary or self.controller.framing is not None
+        self._lost_at = time.monotonic()
+        self._held = (self._held[0] + queued, self._held[1] + unacked)
+        self.events.put(
+            f"串口 {self._target[1]} 断开（{error or '写入失败'}），正在重连"
+        )
+        if self.policy == "abort":
+            self._give_up(ConnectionLost(f"串口断开: {error or '写入失败'}"))
+
+    def _try_reconnect(self):
+        identity, device, baudrate = self._target
+        # 断线期间每次都重新扫描，尽快发现重新枚举出来的设备
+        info = self.scanner.find(identity, max_age=self.poll_interval)
+        if info is None:
+            return
+        if not self.controller.open_serial(info.device, baudrate):
+            return
+        seconds = time.monotonic() - self._lost_at
+        self._lost_at = None
+        self._target = (identity, info.device, baudrate)
+        self.events.put(f"已重新连接 {info.device}，断开 {seconds:.1f} 秒")
+        if self._binary:
+            self._binary = False
+            # Binary_1 排在重发的指令之前；协商完成前指令以文本发出，控制器同样接受
+            from binary_protocol import request_binary
+
+            request_binary(self.controller).add_done_callback(self._renegotiated)
+        self._replay()
+
+    def _renegotiated(self, future):
+        if future.result():
+            self.events.put("已重新启用二进制帧模式")
+        else:
+            self.events.put("重连后控制器不支持二进制帧，改用文本指令")
+
+    def _replay(self):
+        queued, unacked = self._held
+        self._held = ([], [])
+        writer = self.controller.writer
+        resend = []
+        for command, future in unacked:
+            if command is not None and command_name(command) in IDEMPOTENT_COMMANDS:
+                resend.append((command, 0, future, DEFAULT_ACK_TIMEOUT))
+            elif not future.done():
+                future.set_exception(
+                    ConnectionLost(f"断线前已发出，无法确认: {command}")
+                )
+        for command, delay, future, timeout in resend + queued:
+            if future is not None and future.done():
+                continue
+            ok = writer.put(command, delay, future, timeout)
+            if not ok and future is not None and not future.done():
+                future.set_exception(ConnectionLost(f"重连后无法重发: {command}"))
+        if resend or queued:
+            self.events.put(f"重连后重发 {len(resend) + len(queued)} 条指令")
+
+    def _give_up(self, error):
+        queued, unacked = self._held
+        self._held = ([], [])
+        futures = [future for _, _, future, _ in queued] + [f for _, f in unacked]
+        for future in futures:
+            if future is not None and not future.done():
+                future.set_exception(error)
+        if futures:
+            self.events.put(f"放弃 {len(futures)} 条未完成的指令（{error}）")
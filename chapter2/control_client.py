@@ -0,0 +1,273 @@
+"""控制服务 (control_server.py) 的客户端
+
+RemoteController 提供与 SerialController 相同的发送接口（send_command、submit、results、
+replies、ser.is_open、on_write），RobotControlApp、TelemetryPoller、CommandStreamer
+可以不加修改地通过控制服务工作；RemoteConnection 代替 ConnectionManager 交给界面使用：
+
+    python main.py --server 127.0.0.1:7070
+
+打开即连接服务并申请控制权；控制权被其他客户端占用时仍保持连接，可以急停和查询状态。
+"""
+
+import itertools
+import json
+import queue
+import socket
+import threading
+import types
+from concurrent.futures import Future
+
+from control_server import parse_address
+from serial_io import DEFAULT_ACK_TIMEOUT, AckError, ConnectionLost
+
+CONNECT_TIMEOUT = 3.0  # 连接控制服务的超时 (s)
+REQUEST_TIMEOUT = 5.0  # 等待 hello、acquire 等请求回应的超时 (s)
+DEFAULT_TOPICS = ("reply", "lock", "connection")
+
+
+class _Link:
+    """代替 serial.Serial 的 is_open 与 port"""
+
+    def __init__(self, port):
+        self.port = port
+        self.is_open = False
+
+
+class RemoteController:
+    """通过控制服务发送指令，接口与 SerialController 一致"""
+
+    def __init__(self, address, name="gui", events=True, topics=DEFAULT_TOPICS):
+        self.address = address
+        self.name = name
+        self.topics = topics
+        self.ser = _Link(address)
+        self.results = queue.SimpleQueue() if events else None
+        self.replies = queue.SimpleQueue() if events else None
+        self.events = queue.SimpleQueue()  # 控制权与服务端串口状态的文本消息
+        self.reader = None
+        self.writer = None
+        self.last_error = None
+        self.lost = threading.Event()  # 与服务的连接意外断开时置位
+        self.hold_on_error = False
+        self.on_write = None
+        self.instrumentation = None  # 只统计界面回调，串口一侧在服务端
+        self._sock = None
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._closing = False
+
+    def open_serial(self, port=None, baudrate=None):
+        """连接控制服务并申请控制权；串口和波特率由服务端决定，参数只为兼容而保留"""
+        if self.ser.is_open:
+            return False
+        self.last_error = None
+        kind, address = parse_address(self.address)
+        try:
+            if kind == "unix":
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(CONNECT_TIMEOUT)
+                sock.connect(address)
+            else:
+                sock = socket.create_connection(address, timeout=CONNECT_TIMEOUT)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.settimeout(None)
+        except OSError as e:
+            self.last_error = e
+            return False
+        self._sock = sock
+        self._closing = False
+        self.lost.clear()
+        self.ser.is_open = True
+        threading.Thread(
+            target=self._read_loop, args=(sock,), name="RemoteReader", daemon=True
+        ).start()
+        try:
+            self._call({"op": "hello", "name": self.name})
+            self._call({"op": "subscribe", "topics": list(self.topics)})
+        except (AckError, TimeoutError) as e:
+            self.last_error = e
+            self.close_serial()
+            return False
+        if not self.acquire():
+            self.events.put("控制权被其他客户端占用，只能急停和查询状态")
+        return True
+
+    def close_serial(self):
+        if not self.ser.is_open:
+            return False
+        self._closing = True
+        try:
+            self._request({"op": "release"})
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._sock.close()
+        self.ser.is_open = False
+        return True
+
+    def acquire(self):
+        """申请控制权，成功返回 True"""
+        try:
+            self._call({"op": "acquire"})
+            return True
+        except (AckError, TimeoutError) as e:
+            self.last_error = e
+            return False
+
+    def release(self):
+        self._call({"op": "release"})
+
+    def instrument(self, instrumentation):
+        self.instrumentation = instrumentation
+
+    def send_command(self, command, delay=0):
+        """交给服务端发送，不阻塞；失败原因从 results 取回"""
+        if not self.ser.is_open:
+            return False
+        future = self._request(self._send_message(command, delay, DEFAULT_ACK_TIMEOUT))
+        future.add_done_callback(lambda f: self._finished(command, f))
+        return True
+
+    def submit(self, command, delay=0, timeout=DEFAULT_ACK_TIMEOUT):
+        """发送指令并返回 Future，控制器确认后以回复行完成"""
+        result = Future()
+        if not self.ser.is_open:
+            result.set_exception(RuntimeError("未连接控制服务"))
+            return result
+        future = self._request(self._send_message(command, delay, timeout))
+
+        def done(f):
+            error = self._finished(command, f)
+            if error is not None:
+                result.set_exception(error)
+            else:
+                result.set_result(f.result().get("reply"))
+
+        future.add_done_callback(done)
+        return result
+
+    def _send_message(self, command, delay, timeout):
+        text = command if isinstance(command, str) else str(command)
+        return {
+            "op": "send",
+            "command": text.strip(),
+            "delay": delay,
+            "timeout": timeout,
+        }
+
+    def _finished(self, command, future):
+        # 在读线程中执行：回传结果并调用 on_write，返回错误（成功时为 None）
+        if future.exception() is not None:
+            error = future.exception()
+        elif not future.result().get("ok"):
+            error = AckError(future.result().get("error"))
+        else:
+            error = None
+        if self.results is not None:
+            self.results.put((command, error))
+        on_write = self.on_write
+        if error is None and on_write is not None:
+            on_write(command)
+        return error
+
+    def _request(self, message):
+        future = Future()
+        request_id = next(self._ids)
+        with self._lock:
+            self._pending[request_id] = future
+        data = (json.dumps(dict(message, id=request_id)) + "\n").encode()
+        try:
+            with self._send_lock:
+                self._sock.sendall(data)
+        except OSError as e:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            future.set_exception(ConnectionLost(f"发送到控制服务失败: {e}"))
+        return future
+
+    def _call(self, message):
+        """发送请求并等待回应，失败时抛出 AckError"""
+        response = self._request(message).result(REQUEST_TIMEOUT)
+        if not response.get("ok"):
+            raise AckError(response.get("error"))
+        return response
+
+    def _read_loop(self, sock):
+        try:
+            for line in sock.makefile("rb"):
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                if "event" in message:
+                    self._on_event(message)
+                    continue
+                with self._lock:
+                    future = self._pending.pop(message.get("id"), None)
+                if future is not None:
+                    future.set_result(message)
+        except OSError:
+            pass
+        self.ser.is_open = False
+        if not self._closing:
+            self.lost.set()
+            self.events.put("与控制服务的连接已断开")
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for future in pending:
+            future.set_exception(ConnectionLost("与控制服务的连接已断开"))
+
+    def _on_event(self, message):
+        event = message["event"]
+        if event == "reply":
+            if self.replies is not None:
+                self.replies.put(message["line"])
+        elif event == "lock":
+            owner = message.get("owner")
+            self.events.put(f"控制权: {owner}" if owner else "控制权已释放")
+        elif event == "connection":
+            self.events.put(f"服务端: {message['message']}")
+        elif event == "dropped":
+            self.events.put(f"处理过慢，丢弃了 {message['count']} 条事件")
+
+
+class RemoteConnection:
+    """界面作为控制服务客户端时代替 ConnectionManager，断线重连由服务端负责"""
+
+    def __init__(self, controller):
+        self.controller = controller
+        self.events = controller.events
+        self.scanner = _ServerPorts(controller.address)
+
+    @property
+    def connected(self):
+        return self.controller.ser.is_open
+
+    @property
+    def reconnecting(self):
+        return False
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def open(self, port, baudrate):
+        return self.controller.open_serial(port, baudrate)
+
+    def close(self):
+        return self.controller.close_serial()
+
+
+class _ServerPorts:
+    """端口下拉框中只显示控制服务的地址"""
+
+    def __init__(self, address):
+        self._ports = [types.SimpleNamespace(device=address)]
+
+    def cached(self):
+        return self._ports
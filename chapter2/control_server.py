@@ -0,0 +1,424 @@
+"""本机控制服务：独占串口，让界面、MES、视觉系统等多个客户端共用一台机械臂
+
+    python control_server.py --port /dev/ttyUSB0 --listen 127.0.0.1:7070
+    python control_server.py --port /dev/ttyUSB0 --listen unix:/tmp/robot.sock
+
+协议为 UTF-8 的 JSON 行，每行一个对象。请求带可选的 id，回应带相同的 id：
+
+    {"id": 1, "op": "hello", "name": "vision"}        -> {"id": 1, "ok": true, "client": 3}
+    {"id": 2, "op": "acquire"}                          申请控制权
+    {"id": 3, "op": "send", "command": "DescartesLine_200,0,150,100"}
+                                                        -> 控制器回复后 {"id": 3, "ok": true, "reply": "..."}
+    {"id": 4, "op": "release"}
+    {"id": 5, "op": "subscribe", "topics": ["reply", "ack"]}
+    {"id": 6, "op": "status"}
+
+失败的回应为 {"id": ..., "ok": false, "error": "..."}。同一时刻只有持有控制权的客户端
+可以发送指令；急停 (Stop) 和状态查询 (Infor) 任何客户端都可以发送。
+持有者断开时自动释放控制权，并发送 MovStp，避免按键点动无人松开。
+
+订阅的事件 {"event": 主题, ...}：
+    reply       控制器的每一行回复 {"line": ...}
+    ack         任一客户端的指令完成 {"client", "command", "reply" 或 "error"}
+    lock        控制权变化 {"owner": 客户端名或 null}
+    connection  串口断开、重连等状态 {"message": ...}
+
+每个客户端有独立的发送线程和有界事件队列，处理慢的订阅者只会丢掉自己最旧的事件
+（随后收到 {"event": "dropped", "count": n}），不影响其他客户端，也不阻塞串口读写线程。
+"""
+
+import argparse
+import collections
+import itertools
+import json
+import math
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+
+import commands
+from connection import POLICIES, ConnectionManager
+from serial_io import SerialController
+
+DEFAULT_LISTEN = "127.0.0.1:7070"
+EVENT_QUEUE_SIZE = 256  # 每个客户端最多缓存的事件数
+MAX_LINE = 65536  # 请求行的最大字节数
+TOPICS = ("reply", "ack", "lock", "connection")
+FREE_COMMANDS = ("Stop", "Infor")  # 不需要控制权的指令
+
+
+def parse_address(text):
+    """解析地址："unix:/path" -> ("unix", path)，"host:port" -> ("tcp", (host, port))"""
+    if text.startswith("unix:"):
+        return "unix", text[len("unix:") :]
+    host, _, port = text.rpartition(":")
+    try:
+        return "tcp", (host or "127.0.0.1", int(port))
+    except ValueError:
+        raise ValueError(f"监听地址应为 host:port 或 unix:/path: {text}") from None
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def encode_message(message):
+    return (json.dumps(message, ensure_ascii=False) + "\n").encode()
+
+
+class ClientSession:
+    """一个客户端连接：请求在连接线程中处理，回应与事件由独立的发送线程写出"""
+
+    def __init__(self, client_id, sock, event_queue_size=EVENT_QUEUE_SIZE):
+        self.id = client_id
+        self.name = f"client-{client_id}"
+        self.sock = sock
+        self.topics = set()
+        self.dropped = 0
+        self._responses = collections.deque()  # 回应不丢弃，数量受客户端自己的请求限制
+        self._events = collections.deque(maxlen=event_queue_size)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._sender = threading.Thread(
+            target=self._send_loop, name=f"ClientSender-{client_id}", daemon=True
+        )
+        self._sender.start()
+
+    def respond(self, message):
+        with self._cond:
+            self._responses.append(encode_message(message))
+            self._cond.notify()
+
+    def publish(self, data):
+        """放入一条已编码的事件，队列满时丢弃最旧的"""
+        with self._cond:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(data)
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    def _send_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._responses or self._events or self._closed
+                )
+                if self._closed:
+                    return
+                chunks = list(self._responses)
+                self._responses.clear()
+                if self.dropped:
+                    chunks.append(
+                        encode_message({"event": "dropped", "count": self.dropped})
+                    )
+                    self.dropped = 0
+                chunks += self._events
+                self._events.clear()
+            try:
+                self.sock.sendall(b"".join(chunks))
+            except OSError:
+                return  # 客户端已断开，由连接线程清理
+
+
+class ControlServer:
+    """在 SerialController 之上提供多客户端的本机控制接口"""
+
+    def __init__(
+        self,
+        controller,
+        connection=None,
+        address=DEFAULT_LISTEN,
+        event_queue_size=EVENT_QUEUE_SIZE,
+    ):
+        self.controller = controller
+        self.connection = connection  # ConnectionManager，用于转发断线/重连事件
+        self.address = address
+        self.event_queue_size = event_queue_size
+        self.owner = None  # 持有控制权的 ClientSession
+        self._sessions = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        # 串口读线程的回复行和指令完成通知都放进这个队列，由广播线程分发，
+        # 读线程只做一次 put，不受客户端数量影响
+        self._inbox = queue.SimpleQueue()
+        controller.replies = self._inbox  # 须在打开串口之前设置
+        self._server = None
+        self._running = False
+
+    # ---- 启停 ----
+
+    def start(self):
+        kind, address = parse_address(self.address)
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                server._serve_client(self.request, self.rfile)
+
+        if kind == "unix":
+            if os.path.exists(address):
+                os.unlink(address)  # 上次异常退出留下的套接字文件
+            self._server = _UnixServer(address, Handler)
+        else:
+            self._server = _TCPServer(address, Handler)
+        self._running = True
+        threading.Thread(
+            target=self._server.serve_forever, name="ControlServer", daemon=True
+        ).start()
+        threading.Thread(
+            target=self._broadcast_loop, name="Broadcaster", daemon=True
+        ).start()
+        return self._server.server_address
+
+    def stop(self):
+        self._running = False
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._lock:
+            sessions = list(self._sessions.values())
+        for session in sessions:
+            session.close()
+            try:
+                # 连接线程的 rfile 仍引用该套接字，只 close 不会让客户端收到断开
+                session.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    # ---- 客户端 ----
+
+    def _serve_client(self, sock, rfile):
+        session = ClientSession(next(self._ids), sock, self.event_queue_size)
+        with self._lock:
+            self._sessions[session.id] = session
+        try:
+            while self._running:
+                line = rfile.readline(MAX_LINE)
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("请求必须是 JSON 对象")
+                except ValueError as e:
+                    session.respond({"ok": False, "error": f"请求格式错误: {e}"})
+                    continue
+                response = self._handle(session, request)
+                if response is not None:
+                    response["id"] = request.get("id")
+                    session.respond(response)
+        except OSError:
+            pass
+        finally:
+            self._disconnect(session)
+
+    def _disconnect(self, session):
+        with self._lock:
+            self._sessions.pop(session.id, None)
+            was_owner = self.owner is session
+            if was_owner:
+                self.owner = None
+        session.close()
+        if was_owner:
+            # 持有者可能在点动中断开，松开按键以免一直运动
+            self.controller.send_command(commands.MOV_STP)
+            self._publish_lock()
+
+    def _handle(self, session, request):
+        """处理一条请求，返回回应；send 的回应在指令完成后异步发出，返回 None"""
+        op = request.get("op")
+        if op == "hello":
+            session.name = str(request.get("name") or session.name)
+            return {"ok": True, "client": session.id}
+        if op == "acquire":
+            with self._lock:
+                owner = self.owner
+                if owner is not None and owner is not session:
+                    return {"ok": False, "error": f"控制权被 {owner.name} 占用"}
+                self.owner = session
+            if owner is None:
+                self._publish_lock()
+            return {"ok": True}
+        if op == "release":
+            with self._lock:
+                released = self.owner is session
+                if released:
+                    self.owner = None
+            if released:
+                self._publish_lock()
+            return {"ok": True}
+        if op == "subscribe":
+            topics = set(request.get("topics") or TOPICS)
+            unknown = topics - set(TOPICS)
+            if unknown:
+                return {"ok": False, "error": f"未知的主题: {sorted(unknown)}"}
+            session.topics |= topics
+            return {"ok": True, "topics": sorted(session.topics)}
+        if op == "unsubscribe":
+            session.topics -= set(request.get("topics") or TOPICS)
+            return {"ok": True, "topics": sorted(session.topics)}
+        if op == "status":
+            return self._status()
+        if op == "send":
+            return self._send(session, request)
+        return {"ok": False, "error": f"未知的操作: {op}"}
+
+    def _send(self, session, request):
+        try:
+            command = commands.from_text(str(request.get("command", "")))
+            delay = float(request.get("delay", 0))
+            timeout = float(request.get("timeout", 30))
+        except (ValueError, TypeError) as e:
+            return {"ok": False, "error": str(e)}
+        # nan、inf 或负数会让写线程的停顿和读线程的超时检查失效
+        for key, value in (("delay", delay), ("timeout", timeout)):
+            if not (math.isfinite(value) and value >= 0):
+                return {"ok": False, "error": f"{key} 应为不小于 0 的有限数: {value}"}
+        if command.opcode not in FREE_COMMANDS and self.owner is not session:
+            owner = self.owner
+            holder = f"控制权被 {owner.name} 占用" if owner else "请先申请控制权"
+            return {"ok": False, "error": holder}
+        if not self.controller.ser.is_open:
+            return {"ok": False, "error": "串口未打开"}
+        future = self.controller.submit(command, delay=delay, timeout=timeout)
+        request_id = request.get("id")
+        # 在串口读/写线程中执行，只放进队列
+        future.add_done_callback(
+            lambda f: self._inbox.put((session, request_id, command, f))
+        )
+        return None
+
+    def _status(self):
+        with self._lock:
+            owner = self.owner
+            clients = [
+                {"client": s.id, "name": s.name, "topics": sorted(s.topics)}
+                for s in self._sessions.values()
+            ]
+        writer = self.controller.writer
+        return {
+            "ok": True,
+            "connected": bool(self.controller.ser.is_open),
+            "port": self.controller.ser.port,
+            "owner": owner.name if owner else None,
+            "queued": writer.pending() if writer is not None else 0,
+            "clients": clients,
+        }
+
+    # ---- 事件分发 ----
+
+    def _broadcast_loop(self):
+        while self._running:
+            try:
+                item = self._inbox.get(timeout=0.2)
+            except queue.Empty:
+                item = None
+            if isinstance(item, str):
+                self._publish("reply", {"line": item})
+            elif item is not None:
+                self._complete(*item)
+            if self.connection is not None:
+                while True:
+                    try:
+                        message = self.connection.events.get_nowait()
+                    except queue.Empty:
+                        break
+                    self._publish("connection", {"message": message})
+
+    def _complete(self, session, request_id, command, future):
+        if future.cancelled():
+            result = {"ok": False, "error": "已被急停或松开按键取消"}
+        elif future.exception() is not None:
+            result = {"ok": False, "error": str(future.exception())}
+        else:
+            result = {"ok": True, "reply": future.result()}
+        session.respond(dict(result, id=request_id))
+        event = {"client": session.name, "command": str(command)}
+        event.update(
+            {"reply": result["reply"]} if result["ok"] else {"error": result["error"]}
+        )
+        self._publish("ack", event)
+
+    def _publish_lock(self):
+        owner = self.owner
+        self._publish("lock", {"owner": owner.name if owner else None})
+
+    def _publish(self, topic, message):
+        # 每个事件只编码一次，再分发给所有订阅者
+        data = encode_message(dict(message, event=topic))
+        with self._lock:
+            sessions = [s for s in self._sessions.values() if topic in s.topics]
+        for session in sessions:
+            session.publish(data)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="机械臂本机控制服务")
+    parser.add_argument("--port", default="/dev/ttyUSB0", help="串口")
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument(
+        "--listen",
+        default=DEFAULT_LISTEN,
+        help="监听地址 host:port 或 unix:/path（默认只监听本机）",
+    )
+    parser.add_argument(
+        "--reconnect-policy",
+        choices=POLICIES,
+        default="abort",
+        help="断线时未完成的指令：abort 放弃，replay 重连后重发",
+    )
+    parser.add_argument(
+        "--binary",
+        action="store_true",
+        help="尝试启用二进制帧模式，控制器不支持时使用文本指令",
+    )
+    args = parser.parse_args(argv)
+
+    controller = SerialController(events=False)
+    connection = ConnectionManager(controller, policy=args.reconnect_policy)
+    server = ControlServer(controller, connection, args.listen)
+    connection.start()
+    if not connection.open(args.port, args.baudrate):
+        print(f"无法打开串口: {controller.last_error}", file=sys.stderr)
+        return 2
+    if args.binary:
+        from binary_protocol import negotiate
+
+        if negotiate(controller):
+            print("已启用二进制帧模式", file=sys.stderr)
+        else:
+            print("控制器不支持二进制帧，使用文本指令", file=sys.stderr)
+    try:
+        address = server.start()
+    except (OSError, ValueError) as e:
+        print(f"无法监听 {args.listen}: {e}", file=sys.stderr)
+        connection.close()
+        return 1
+    print(f"控制服务已启动: {address}", file=sys.stderr, flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        connection.stop()
+        connection.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
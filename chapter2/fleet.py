@@ -0,0 +1,179 @@
+"""多机械臂集群控制：一个进程内用 asyncio 同时驱动多个 SerialController
+
+每台机械臂仍由自己的读写线程负责串口 I/O（不依赖 pyserial-asyncio），
+asyncio 只负责调度：各机械臂的作业并行执行，每条指令发出后让出事件循环，
+保证一台指令密集的机械臂不会拖慢其他机械臂；急停直接进入各自的优先通道。
+
+用法：
+    python fleet.py --arm a=/dev/ttyUSB0 --arm b=/dev/ttyUSB1 --job a=a.txt --job b=b.txt
+"""
+
+import argparse
+import asyncio
+import sys
+
+import commands
+from batch_runner import read_job
+from serial_io import DEFAULT_ACK_TIMEOUT, SerialController
+from streaming import StreamError
+
+
+class Fleet:
+    """按名称管理多台机械臂，window 为每台机械臂同时在途的指令数"""
+
+    def __init__(self, window=4, timeout=DEFAULT_ACK_TIMEOUT):
+        self.window = window
+        self.timeout = timeout
+        self.controllers = {}
+        self._stopped = False
+
+    def add(self, name, port, baudrate=115200):
+        controller = SerialController(events=False)
+        if not controller.open_serial(port, baudrate):
+            raise OSError(f"{name}: 无法打开串口 {port}: {controller.last_error}")
+        self.controllers[name] = controller
+        return controller
+
+    def close(self):
+        for controller in self.controllers.values():
+            controller.close_serial()
+        self.controllers.clear()
+
+    async def broadcast_stop(self, timeout=1.0):
+        """向所有机械臂发送急停并停止补发作业指令，返回 {名称: 回复或异常}
+
+        急停在同一个事件循环步骤里全部入队，各写线程立即发出，
+        因此延迟不随机械臂数量增加。timeout 内没有确认的机械臂对应 TimeoutError，
+        其余机械臂的回复照常返回。
+        """
+        self._stopped = True
+        names = list(self.controllers)
+        futures = [
+            asyncio.wrap_future(self.controllers[name].submit(commands.STOP))
+            for name in names
+        ]
+        if futures:
+            await asyncio.wait(futures, timeout=timeout)
+        results = {}
+        for name, future in zip(names, futures):
+            if not future.done():
+                _discard([(None, None, future)])
+                results[name] = TimeoutError(f"{timeout:g} 秒内没有确认急停")
+            elif future.cancelled():
+                results[name] = asyncio.CancelledError("急停已取消")
+            else:
+                results[name] = future.exception() or future.result()
+        return results
+
+    async def run_job(self, name, job):
+        """在一台机械臂上按顺序执行 job 中的指令，返回确认的条数"""
+        controller = self.controllers[name]
+        credits = asyncio.Semaphore(self.window)
+        in_flight = []
+        acked = 0
+
+        for index, command in enumerate(job):
+            await credits.acquire()
+            if self._stopped:
+                credits.release()
+                break
+            future = asyncio.wrap_future(
+                controller.submit(command, timeout=self.timeout)
+            )
+            future.add_done_callback(lambda _f: credits.release())
+            in_flight.append((index, command, future))
+
+            # 按顺序检查已完成的指令，第一条失败即中止这台机械臂的作业
+            while in_flight and in_flight[0][2].done():
+                index, command, future = in_flight.pop(0)
+                if future.cancelled() or future.exception() is not None:
+                    error = "已取消" if future.cancelled() else future.exception()
+                    _discard(in_flight)
+                    raise StreamError(index, command, error)
+                acked += 1
+            # 每条指令后让出事件循环，让其他机械臂轮流发送
+            await asyncio.sleep(0)
+
+        while in_flight:
+            index, command, future = in_flight.pop(0)
+            try:
+                await future
+            except (Exception, asyncio.CancelledError) as e:
+                _discard(in_flight)
+                raise StreamError(index, command, e) from e
+            acked += 1
+        return acked
+
+    async def run_jobs(self, jobs):
+        """并行执行 {名称: 指令序列}，返回 {名称: 确认条数或异常}"""
+        self._stopped = False
+        names = list(jobs)
+        results = await asyncio.gather(
+            *(self.run_job(name, jobs[name]) for name in names),
+            return_exceptions=True,
+        )
+        return dict(zip(names, results))
+
+
+def _discard(in_flight):
+    # 作业已中止，剩余在途指令的结果不再关心，取走异常以免事件循环告警
+    for _, _, future in in_flight:
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+
+def _pairs(values):
+    return dict(value.split("=", 1) for value in values)
+
+
+async def _main(args):
+    fleet = Fleet(window=args.window, timeout=args.timeout)
+    try:
+        for name, port in _pairs(args.arm).items():
+            fleet.add(name, port, args.baudrate)
+        jobs = {
+            name: (command for _, command, _ in read_job(path))
+            for name, path in _pairs(args.job).items()
+        }
+        try:
+            results = await fleet.run_jobs(jobs)
+        except asyncio.CancelledError:
+            stops = await fleet.broadcast_stop()
+            for name, result in stops.items():
+                if isinstance(result, BaseException):
+                    print(f"{name}: 急停未确认: {result}", file=sys.stderr)
+            raise
+    finally:
+        fleet.close()
+
+    failed = False
+    for name, result in results.items():
+        if isinstance(result, BaseException):
+            failed = True
+            print(f"{name}: 作业中断: {result}", file=sys.stderr)
+        else:
+            print(f"{name}: 完成 {result} 条指令", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多机械臂集群作业")
+    parser.add_argument("--arm", action="append", default=[], help="名称=串口，可重复")
+    parser.add_argument(
+        "--job", action="append", default=[], help="名称=作业文件，可重复"
+    )
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("--window", type=int, default=4, help="每台同时在途的指令数")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_ACK_TIMEOUT)
+    args = parser.parse_args(argv)
+    try:
+        return asyncio.run(_main(args))
+    except OSError as e:
+        print(e, file=sys.stderr)
+        return 2
+    except KeyboardInterrupt:
+        print("已中断，已向所有机械臂发送急停", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+"""指令路径的延迟统计：定位一次运动的时间花在界面回调、排队、串口写出还是控制器上
+
+开启后每条指令记录以下时刻（time.perf_counter，单调时钟）并按阶段计入直方图：
+
+    handler   界面发送回调的总耗时（按回调名统计）
+    dispatch  回调开始 -> 指令入队（读输入框、校验、格式化、可达性与碰撞检查）
+    queue     入队 -> 写线程取出
+    encode    指令编码为字节
+    write     ser.write 返回
+    drain     ser.flush 返回，即系统 tty 缓冲发送完毕（drain=True 时）
+    ack       写出 -> 收到控制器回复（只统计会回复的指令）
+    total     入队 -> 收到回复（不回复的指令到写出为止）
+
+写出后另外采样 out_waiting（tty 输出缓冲中未发送的字节数）。未开启时
+SerialController.instrumentation 为 None，指令路径上只多一次 None 判断。
+
+结果可以导出为 JSON 或 Prometheus 文本格式，写入文件或由本机 HTTP 端口提供：
+
+    instrumentation = Instrumentation()
+    controller.instrument(instrumentation)
+    instrumentation.serve(9100)   # http://127.0.0.1:9100/metrics、/metrics.json
+    instrumentation.save("latency.json")
+"""
+
+import bisect
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 延迟直方图的桶上限 (s)：10 µs ~ 56 s，每十倍 4 个桶
+LATENCY_BOUNDS = tuple(10 ** (e / 4) for e in range(-20, 8))
+# out_waiting 直方图的桶上限 (字节)
+BYTES_BOUNDS = (0, 16, 32, 64, 128, 256, 512, 1024, 4096)
+QUANTILES = (0.5, 0.9, 0.99)
+METRIC_PREFIX = "robot_command"
+
+
+class Histogram:
+    """固定桶直方图，counts[i] 为落在 (bounds[i-1], bounds[i]] 的次数，最后一个桶为 +Inf"""
+
+    def __init__(self, bounds=LATENCY_BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """按桶上限估计分位数，没有样本时返回 None"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "quantiles": {str(q): self.quantile(q) for q in QUANTILES},
+            "buckets": [
+                [bound, count] for bound, count in zip(self.bounds, self.counts)
+            ]
+            + [["+Inf", self.counts[-1]]],
+        }
+
+
+class CommandTrace:
+    """一条指令在各阶段的时间戳"""
+
+    __slots__ = (
+        "name",
+        "started",
+        "enqueued",
+        "dequeued",
+        "written",
+        "expects_reply",
+    )
+
+    def __init__(self, name, started, enqueued):
+        self.name = name
+        self.started = started  # 界面回调开始的时刻，不经过界面回调时为 None
+        self.enqueued = enqueued
+        self.dequeued = None
+        self.written = None
+        self.expects_reply = False
+
+
+class Instrumentation:
+    """收集指令路径各阶段的延迟，各线程都可以调用，内部加锁"""
+
+    def __init__(self, drain=False, clock=time.perf_counter):
+        # 写出后调用 ser.flush 等 tty 缓冲发完再统计 drain，写线程会多等这段时间
+        self.drain = drain
+        self.clock = clock
+        self._histograms = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._server = None
+
+    # ---- 记录 ----
+
+    def observe(self, stage, label, value, bounds=LATENCY_BOUNDS):
+        with self._lock:
+            histogram = self._histograms.get((stage, label))
+            if histogram is None:
+                histogram = self._histograms[stage, label] = Histogram(bounds)
+            histogram.observe(value)
+
+    def handler(self, name):
+        """界面回调的上下文管理器，期间入队的指令记录 dispatch 阶段"""
+        return _HandlerScope(self, name)
+
+    def enqueued(self, name):
+        """SerialWriter.put 中调用，返回随指令排队的 CommandTrace"""
+        return CommandTrace(name, getattr(self._local, "started", None), self.clock())
+
+    def dequeued(self, trace, expects_reply):
+        """写线程取出指令；会回复的指令由 SerialWriter 随等待登记交给读线程"""
+        trace.dequeued = self.clock()
+        trace.expects_reply = expects_reply
+        self.observe("queue", trace.name, trace.dequeued - trace.enqueued)
+        if trace.started is not None:
+            self.observe("dispatch", trace.name, trace.enqueued - trace.started)
+
+    def encoded(self, trace):
+        now = self.clock()
+        self.observe("encode", trace.name, now - trace.dequeued)
+        return now
+
+    def written(self, trace, write_started, out_waiting=None):
+        """写出完成；会回复的指令等 replied() 再统计 ack 与 total"""
+        trace.written = self.clock()
+        self.observe("write", trace.name, trace.written - write_started)
+        if out_waiting is not None:
+            self.observe("out_waiting", trace.name, out_waiting, BYTES_BOUNDS)
+        if not trace.expects_reply:
+            self.observe("total", trace.name, trace.written - trace.enqueued)
+
+    def drained(self, trace):
+        now = self.clock()
+        self.observe("drain", trace.name, now - trace.written)
+
+    def replied(self, trace):
+        """SerialReader 把回复配给这条指令时调用；超时、报错或被急停中断的指令不统计"""
+        now = self.clock()
+        # 回复可能在 written() 之前到达，此时以取出时刻近似
+        self.observe("ack", trace.name, now - (trace.written or trace.dequeued))
+        self.observe("total", trace.name, now - trace.enqueued)
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    # ---- 导出 ----
+
+    def snapshot(self):
+        """{阶段: {指令或回调名: 直方图字典}}"""
+        with self._lock:
+            items = sorted(self._histograms.items())
+            result = {}
+            for (stage, label), histogram in items:
+                result.setdefault(stage, {})[label] = histogram.to_dict()
+        return result
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self):
+        """Prometheus 文本格式：延迟为 <prefix>_latency_seconds，缓冲字节数为 <prefix>_out_waiting_bytes"""
+        with self._lock:
+            items = sorted(
+                (stage, label, list(h.counts), h.bounds, h.count, h.sum)
+                for (stage, label), h in self._histograms.items()
+            )
+        lines = []
+        for metric, unit_stages in (
+            ("latency_seconds", lambda s: s != "out_waiting"),
+            ("out_waiting_bytes", lambda s: s == "out_waiting"),
+        ):
+            name = f"{METRIC_PREFIX}_{metric}"
+            selected = [item for item in items if unit_stages(item[0])]
+            if not selected:
+                continue
+            lines.append(f"# TYPE {name} histogram")
+            for stage, label, counts, bounds, count, total in selected:
+                labels = f'stage="{stage}",command="{label}"'
+                cumulative = 0
+                for bound, n in zip(bounds, counts):
+                    cumulative += n
+                    lines.append(
+                        f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}'
+                    )
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f"{name}_sum{{{labels}}} {total}")
+                lines.append(f"{name}_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def save(self, path):
+        """写入文件，扩展名为 .json 时为 JSON，否则为 Prometheus 文本格式"""
+        text = self.to_json() if path.endswith(".json") else self.to_prometheus()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def serve(self, port, host="127.0.0.1"):
+        """在后台线程中提供 /metrics（Prometheus）和 /metrics.json，返回实际端口"""
+        instrumentation = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body = instrumentation.to_prometheus()
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif self.path == "/metrics.json":
+                    body = instrumentation.to_json()
+                    content_type = "application/json; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # 不在终端打印每次抓取
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(
+            target=self._server.serve_forever, name="MetricsServer", daemon=True
+        ).start()
+        return self._server.server_address[1]
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class _HandlerScope:
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.started = None
+
+    def __enter__(self):
+        self.started = self.instrumentation.clock()
+        self.instrumentation._local.started = self.started
+        return self
+
+    def __exit__(self, *exc):
+        self.instrumentation._local.started = None
+        self.instrumentation.observe(
+            "handler", self.name, self.instrumentation.clock() - self.started
+        )
+        return False
@@ -0,0 +1,155 @@
+"""点动引擎：按固定节拍采样按键/滑块输入，合并多余的开始/停止并限制发送速率
+
+按钮、键盘和连续速度滑块只修改“期望状态”，tick() 按固定节拍比较期望状态与已发出的状态，
+只在变化时写出 MovStart_/MovStp/Speed_，因此连击、键盘自动重复产生的大量事件
+合并为最多每节拍一次改变。MovStart_ 与 Speed_ 受令牌桶限制，只占用串口带宽的一部分；
+停止从不限速：松开鼠标、按 Esc 或窗口失去焦点时立即发出 MovStp，
+键盘松开在下一个节拍内发出（自动重复的松开/按下对在此期间合并掉）。
+"""
+
+import threading
+import time
+
+import commands
+
+DEFAULT_TICK = 0.02  # 采样节拍 (s)
+DEFAULT_LINK_SHARE = 0.25  # 点动指令最多占用的串口带宽比例
+BURST_BYTES = 64  # 令牌桶容量，约三条 MovStart_
+SPEED_STEP = 5  # 滑块速度的量化步长 (%)，小于一步的变化不发送
+
+
+class TokenBucket:
+    """按字节计的令牌桶"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = capacity
+        self._time = clock()
+
+    def take(self, amount):
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._time) * self.rate)
+        self._time = now
+        if self._tokens < amount:
+            return False
+        self._tokens -= amount
+        return True
+
+
+def quantize_speed(value):
+    """滑块值 -> 1~100 的总速度，按 SPEED_STEP 取整"""
+    speed = int(round(abs(value) / SPEED_STEP)) * SPEED_STEP
+    return min(100, max(SPEED_STEP, speed))
+
+
+class JogEngine:
+    """点动输入到串口指令的转换
+
+    send 为发送函数（如 SerialController.send_command），返回是否入队；
+    key 为 MovStart_ 的 (坐标系, 轴号, 方向)。控制器同一时刻只执行一个点动，
+    同时按住多个方向时以最后按下的为准。
+    """
+
+    def __init__(
+        self,
+        send,
+        baudrate=115200,
+        link_share=DEFAULT_LINK_SHARE,
+        tick=DEFAULT_TICK,
+        base_speed=100,
+        clock=time.monotonic,
+    ):
+        self.send = send
+        self.tick_interval = tick
+        self.base_speed = base_speed  # 点动结束后恢复的总速度
+        self.bucket = TokenBucket(baudrate / 10 * link_share, BURST_BYTES, clock)
+        self._held = []  # 按下顺序的 key
+        self._velocity = None  # 滑块给出的 (key, 速度)
+        self._current = None  # 已发出 MovStart_ 的 key
+        self._speed = base_speed  # 最近发出的总速度
+        self._lock = threading.Lock()
+
+    @property
+    def moving(self):
+        return self._current is not None
+
+    def press(self, key):
+        with self._lock:
+            if key not in self._held:  # 键盘自动重复
+                self._held.append(key)
+
+    def release(self, key, immediate=False):
+        """松开一个方向；immediate 为 True 且没有其他输入时立即停止"""
+        with self._lock:
+            if key in self._held:
+                self._held.remove(key)
+            if immediate and not self._held and self._velocity is None:
+                self._stop_now()
+
+    def set_velocity(self, key, value=0):
+        """连续速度输入：key 为 None 或 value 为 0 表示回中"""
+        with self._lock:
+            if key is None or not value:
+                self._velocity = None
+                if not self._held:
+                    self._stop_now()
+            else:
+                self._velocity = (key, quantize_speed(value))
+
+    def set_speed(self, speed, sent=True):
+        """更新点动结束后恢复的总速度
+
+        调用者已把 Speed_ 发给控制器时 sent 为 True，引擎不再重复发送；否则下个节拍补发。
+        """
+        with self._lock:
+            self.base_speed = speed
+            if sent:
+                self._speed = speed
+
+    def stop(self):
+        """清除所有输入并立即停止"""
+        with self._lock:
+            self._held.clear()
+            self._velocity = None
+            self._stop_now()
+
+    def tick(self):
+        """按节拍调用：把期望状态与已发出的状态对齐"""
+        with self._lock:
+            if self._held:
+                target, speed = self._held[-1], None
+            elif self._velocity is not None:
+                target, speed = self._velocity
+            else:
+                target, speed = None, None
+
+            if target != self._current and self._current is not None:
+                self._stop_now()
+            if target is None:
+                # 滑块点动结束后恢复原来的总速度
+                self._send_speed(self.base_speed)
+                return
+            if not self._send_speed(speed or self.base_speed):
+                return  # 令牌不足，下个节拍再试
+            if target != self._current:
+                command = commands.MOV_START[target]
+                if self.bucket.take(len(command.encode())) and self.send(command):
+                    self._current = target
+
+    def _send_speed(self, speed):
+        if speed == self._speed:
+            return True
+        command = commands.Speed(speed)
+        if not self.bucket.take(len(command.encode())):
+            return False
+        if self.send(command):
+            self._speed = speed
+        return True
+
+    def _stop_now(self):
+        # 只有发出过 MovStart_ 才需要停止，避免连击时产生成串的 MovStp
+        if self._current is not None:
+            self.send(commands.MOV_STP)
+            self._current = None
@@ -0,0 +1,145 @@
+"""三轴机械臂正/逆运动学
+
+关节约定（角度制）：
+    A1 底座绕 Z 轴转角，0 指向 +X；
+    A2 大臂与竖直方向的夹角，向前为正；
+    A3 小臂与水平方向的夹角，向下为正（平行四边形连杆，小臂角度与大臂无关）。
+末端在小臂前端再水平伸出 tool_offset（对应 RodLen_ 指令的末端杆长）。
+默认尺寸为示意值，使用前需按实际机械臂标定；标定结果写入 JSON 配置文件，由 load_kinematics 读取：
+
+    {
+        "geometry": {"base_height": 138, "upper_arm": 135, "forearm": 147, "tool_offset": 61},
+        "joint_limits": [[-135, 135], [0, 85], [-10, 95]],
+        "min_z": -20
+    }
+
+界面、批量执行和排序工具只有在给出标定配置时才检查可达性，示意尺寸只用于离线估算。
+"""
+
+import collections
+import functools
+import json
+
+import numpy as np
+
+ArmGeometry = collections.namedtuple(
+    "ArmGeometry", ["base_height", "upper_arm", "forearm", "tool_offset"]
+)
+DEFAULT_GEOMETRY = ArmGeometry(
+    base_height=150.0, upper_arm=200.0, forearm=200.0, tool_offset=75.0
+)
+
+# 关节限位 (°)，每行为 (下限, 上限)
+DEFAULT_JOINT_LIMITS = np.array([[-135.0, 135.0], [-10.0, 85.0], [-30.0, 75.0]])
+DEFAULT_MIN_Z = 0.0  # 末端最低高度 (mm)，低于桌面视为不可达
+
+CACHE_SIZE = 256  # 缓存的逆解个数，覆盖常用的取放工位
+CACHE_DECIMALS = 3  # 缓存键的取整位数 (mm)
+
+
+def load_kinematics(path):
+    """读取标定配置，返回 Kinematics；格式错误时抛出 ValueError"""
+    with open(path, encoding="utf-8") as f:
+        try:
+            config = json.load(f)
+            geometry = ArmGeometry(
+                **{k: float(v) for k, v in config["geometry"].items()}
+            )
+            joint_limits = np.array(config["joint_limits"], dtype=float)
+            if joint_limits.shape != (3, 2) or np.any(
+                joint_limits[:, 0] > joint_limits[:, 1]
+            ):
+                raise ValueError("joint_limits 应为 3 行 [下限, 上限]")
+            min_z = float(config.get("min_z", DEFAULT_MIN_Z))
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"机械臂标定配置错误: {e}") from None
+    return Kinematics(geometry, joint_limits, min_z)
+
+
+class Kinematics:
+    """向量化的正/逆运动学与可达性检查，常用位姿的逆解带 LRU 缓存"""
+
+    def __init__(
+        self,
+        geometry=DEFAULT_GEOMETRY,
+        joint_limits=DEFAULT_JOINT_LIMITS,
+        min_z=DEFAULT_MIN_Z,
+    ):
+        self.geometry = geometry
+        self.joint_limits = np.asarray(joint_limits, dtype=float)
+        self.min_z = min_z
+        self._ik_cached = functools.lru_cache(maxsize=CACHE_SIZE)(self._ik_point)
+
+    def forward(self, joints):
+        """关节角 (N, 3) -> 末端坐标 (N, 3)；单个点传入 (3,) 时返回 (3,)"""
+        g = self.geometry
+        a1, a2, a3 = np.radians(np.asarray(joints, dtype=float)).T
+        r = g.upper_arm * np.sin(a2) + g.forearm * np.cos(a3) + g.tool_offset
+        z = g.base_height + g.upper_arm * np.cos(a2) - g.forearm * np.sin(a3)
+        return np.stack([r * np.cos(a1), r * np.sin(a1), z], axis=-1)
+
+    def inverse(self, points):
+        """末端坐标 (N, 3) -> 关节角 (N, 3)；几何上无解的点为 NaN"""
+        g = self.geometry
+        x, y, z = np.asarray(points, dtype=float).T
+        a1 = np.arctan2(y, x)
+        r = np.hypot(x, y) - g.tool_offset
+        h = z - g.base_height
+        d = np.hypot(r, h)
+
+        # 余弦定理求大臂与肩部-腕部连线的夹角，取肘部朝上的解
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cos_alpha = (g.upper_arm**2 + d**2 - g.forearm**2) / (2 * g.upper_arm * d)
+            elevation = np.arctan2(h, r) + np.arccos(cos_alpha)
+        a2 = np.pi / 2 - elevation
+        elbow_r = g.upper_arm * np.cos(elevation)
+        elbow_z = g.upper_arm * np.sin(elevation)
+        a3 = np.arctan2(-(h - elbow_z), r - elbow_r)
+        return np.degrees(np.stack([a1, a2, a3], axis=-1))
+
+    def joints_within_limits(self, joints):
+        """关节角是否都在限位内，返回布尔数组"""
+        joints = np.asarray(joints, dtype=float)
+        low, high = self.joint_limits.T
+        return np.all((joints >= low) & (joints <= high), axis=-1)
+
+    def reachable(self, points):
+        """末端坐标是否可达（有逆解、关节不超限、不低于桌面），返回布尔数组"""
+        points = np.asarray(points, dtype=float)
+        joints = self.inverse(points)
+        solved = ~np.any(np.isnan(joints), axis=-1)
+        return (
+            solved & self.joints_within_limits(joints) & (points[..., 2] >= self.min_z)
+        )
+
+    def inverse_point(self, x, y, z):
+        """单点逆解（带缓存），不可达时返回 None"""
+        key = tuple(round(float(v), CACHE_DECIMALS) for v in (x, y, z))
+        return self._ik_cached(*key)
+
+    def _ik_point(self, x, y, z):
+        point = np.array([x, y, z])
+        if not self.reachable(point):
+            return None
+        return tuple(self.inverse(point).tolist())
+
+    def check_point(self, x, y, z):
+        """检查单个目标点，可达返回 None，否则返回原因"""
+        if self.inverse_point(x, y, z) is not None:
+            return None
+        if z < self.min_z:
+            return f"Z={z} 低于最低高度 {self.min_z}"
+        joints = self.inverse(np.array([x, y, z], dtype=float))
+        if np.any(np.isnan(joints)):
+            return f"({x}, {y}, {z}) 超出工作空间"
+        if not self.joints_within_limits(joints):
+            return (
+                f"({x}, {y}, {z}) 需要的关节角 {np.round(joints, 1).tolist()} 超出限位"
+            )
+        return f"({x}, {y}, {z}) 不可达"
+
+    def check_joints(self, a1, a2, a3):
+        """检查关节目标，满足限位返回 None，否则返回原因"""
+        if not self.joints_within_limits([a1, a2, a3]):
+            return f"关节角 ({a1}, {a2}, {a3}) 超出限位"
+        return None
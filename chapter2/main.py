@@ -1,56 +1,87 @@
+import argparse
+import functools
+import math
 import tkinter as tk
-from tkinter import ttk, messagebox
-import serial
-import serial.tools.list_ports
-import time
-
-
-# 串口通信类
-class SerialController:
-    def __init__(self):
-        self.ser = serial.Serial()
-        self.ser.timeout = 1
-
-    def open_serial(self, port, baudrate):
-        if not self.ser.is_open:
-            self.ser.port = port
-            self.ser.baudrate = baudrate
-            try:
-                self.ser.open()
-                return True
-            except Exception as e:
-                messagebox.showerror("错误", f"无法打开串口: {e}")
-                return False
-        return False
+from tkinter import ttk
+import queue
+import threading
 
-    def close_serial(self):
-        if self.ser.is_open:
-            self.ser.close()
-            return True
-        return False
+import commands
+from connection import POLICIES, ConnectionManager
+from jog import JogEngine
+from serial_io import SerialController, reply_name
+from serial_log import SerialLog
 
-    def send_command(self, command):
-        if self.ser.is_open:
-            try:
-                self.ser.write(command.encode())
-                return True
-            except Exception as e:
-                messagebox.showerror("错误", f"发送指令失败: {e}")
-                return False
-        return False
+# 键盘点动按键 -> 方向按钮序号
+JOG_KEYS = {"q": 0, "a": 1, "w": 2, "s": 3, "e": 4, "d": 5}
+JOG_DEAD_ZONE = 5  # 滑块中点附近不点动的范围
+MOTION_WINDOW = 4  # 变速运动同时在途的段数，控制器逐段应答
+
+
+def traced(handler):
+    """发送回调的装饰器：开启延迟统计时记录回调耗时，以及从回调开始到指令入队的时间"""
+
+    @functools.wraps(handler)
+    def wrapper(self, *args, **kwargs):
+        instrumentation = self.serial_controller.instrumentation
+        if instrumentation is None:
+            return handler(self, *args, **kwargs)
+        with instrumentation.handler(handler.__name__):
+            return handler(self, *args, **kwargs)
+
+    return wrapper
 
 
 # 主窗口类
 class RobotControlApp:
-    def __init__(self, root):
+    def __init__(
+        self,
+        root,
+        log_file=None,
+        reconnect_policy="abort",
+        telemetry_file=None,
+        workcell=None,
+        instrumentation=None,
+        binary=False,
+        server=None,
+        kinematics=None,
+    ):
         self.root = root
         self.root.title("机械臂控制程序")
-        self.root.geometry("800x800")
-
-        # 串口控制器
-        self.serial_controller = SerialController()
-        self.default_port = "/dev/ttyUSB0"
+        self.root.geometry("800x950")
+        self.log_file = log_file  # 串口信息同时写入的轮转日志文件
+        self.telemetry_file = telemetry_file  # 遥测样本追加写入的二进制文件
+        # 打开串口后尝试协商二进制帧模式；连接控制服务时由服务端协商
+        self.binary = binary and server is None
+
+        if server is None:
+            # 串口控制器
+            self.serial_controller = SerialController()
+            # 断线自动重连，未完成指令按 reconnect_policy 放弃或重发
+            self.connection = ConnectionManager(
+                self.serial_controller, policy=reconnect_policy
+            )
+            self.default_port = "/dev/ttyUSB0"
+        else:
+            # 作为控制服务的客户端，串口与断线重连由服务端负责
+            from control_client import RemoteConnection, RemoteController
+
+            self.serial_controller = RemoteController(server)
+            self.connection = RemoteConnection(self.serial_controller)
+            self.default_port = server
+        # 指令路径的延迟统计，None 表示不开启
+        self.serial_controller.instrument(instrumentation)
+        self.connection.start()
         self.speed = 100  # 默认速度值
+        # 标定后的运动学模型；未给出时第一次使用才按示意尺寸创建，只用于推算不做可达性检查
+        self._kinematics = kinematics
+        self.reach_check_var = tk.BooleanVar(value=kinematics is not None)
+        self.telemetry_poller = None
+        # 工作单元障碍物，给出时发送运动前检查路径；position 为按已发送指令推算的末端位置
+        self.workcell = workcell
+        self.position = None
+        # 按钮、键盘和滑块点动都经过点动引擎合并与限速
+        self.jog = JogEngine(self.send_jog, base_speed=self.speed)
 
         # 串口选择和控制
         self.create_serial_control_frame()
@@ -58,8 +89,9 @@ class RobotControlApp:
         # 复位与急停
         self.create_stop_frame()
 
-        # 坐标控制区
+        # 坐标控制区，偏移不常用，展开时才创建
         self.create_posctrl_frame()
+        self.create_collapsible_frame("偏移发送", self.create_offset_frame)
 
         # 吸嘴控制
         self.create_suction_frame()
@@ -68,11 +100,56 @@ class RobotControlApp:
         self.create_speed_frame()
 
         # 变速区
-        self.create_variable_speed_frame()
+        self.create_collapsible_frame("变速运动", self.create_variable_speed_frame)
 
         # 按键方向控制区
         self.create_direction_control_frame()
 
+        # 遥测
+        self.create_collapsible_frame("遥测", self.create_telemetry_frame)
+
+        # 示教记录与回放
+        self.create_teach_frame()
+
+        # 后台任务（如示教回放）发给界面的消息
+        self.messages = queue.SimpleQueue()
+
+        # 定时取回串口线程的发送结果
+        self.root.after(20, self.poll_serial_results)
+        self.root.after(int(self.jog.tick_interval * 1000), self.jog_tick)
+
+    @property
+    def kinematics(self):
+        # 运动学依赖 numpy，载入较慢，第一次发送坐标时才导入
+        if self._kinematics is None:
+            from kinematics import Kinematics
+
+            self._kinematics = Kinematics()
+        return self._kinematics
+
+    def create_collapsible_frame(self, text, build):
+        """带“展开/收起”按钮的区域，第一次展开时才调用 build(frame) 创建内容"""
+        outer = ttk.LabelFrame(self.root, text=text)
+        outer.pack(pady=10, padx=10, fill="x")
+        body = ttk.Frame(outer)
+        state = {"built": False, "shown": False}
+
+        def toggle():
+            if state["shown"]:
+                body.pack_forget()
+                button.configure(text="展开")
+            else:
+                if not state["built"]:
+                    build(body)
+                    state["built"] = True
+                body.pack(fill="x")
+                button.configure(text="收起")
+            state["shown"] = not state["shown"]
+
+        button = ttk.Button(outer, text="展开", command=toggle)
+        button.pack(anchor="w", padx=5, pady=2)
+        return outer
+
     def create_serial_control_frame(self):
         frame = ttk.LabelFrame(self.root, text="串口控制")
         frame.pack(pady=10, padx=10, fill="x")
@@ -80,7 +157,8 @@ class RobotControlApp:
         # 串口选择
         port_label = ttk.Label(frame, text="串口：")
         port_label.grid(row=0, column=0, padx=5, pady=5, sticky="e")
-        self.port_combo = ttk.Combobox(frame, values=self.get_serial_ports())
+        # 端口列表由连接管理器在后台扫描，展开下拉框时读取缓存
+        self.port_combo = ttk.Combobox(frame, postcommand=self.refresh_ports)
         self.port_combo.set(self.default_port)  # 设置默认串口
         self.port_combo.grid(row=0, column=1, padx=5, pady=5, sticky="w")
 
@@ -119,10 +197,17 @@ class RobotControlApp:
             row=2, column=0, columnspan=6, padx=5, pady=5, sticky="nsew"
         )
         self.serial_info_text.configure(state="disabled")
+        self.serial_log = SerialLog(
+            self.root, self.serial_info_text, path=self.log_file
+        )
 
     def get_serial_ports(self):
-        ports = [port.device for port in serial.tools.list_ports.comports()]
-        return ports
+        # 只读缓存，不在界面线程里扫描；后台还没扫描完时为空
+        return [info.device for info in self.connection.scanner.cached()]
+
+    def refresh_ports(self):
+        """展开下拉框时更新端口列表"""
+        self.port_combo.configure(values=self.get_serial_ports())
 
     def open_serial(self):
         port = self.port_combo.get()
@@ -130,29 +215,73 @@ class RobotControlApp:
         if port and baudrate:
             try:
                 baudrate = int(baudrate)
-                if self.serial_controller.open_serial(port, baudrate):
+                if self.connection.open(port, baudrate):
                     self.update_serial_info("串口已打开")
+                    if self.binary:
+                        # 协商需要等待控制器回复，不阻塞界面
+                        threading.Thread(
+                            target=self.negotiate_binary, daemon=True
+                        ).start()
                 else:
-                    self.update_serial_info("串口打开失败")
+                    self.update_serial_info(
+                        f"串口打开失败: {self.serial_controller.last_error}"
+                    )
             except ValueError:
                 self.update_serial_info("波特率必须是整数")
         else:
             self.update_serial_info("请选择串口和波特率")
 
+    def negotiate_binary(self):
+        from binary_protocol import negotiate
+
+        if negotiate(self.serial_controller):
+            self.messages.put("已启用二进制帧模式")
+        else:
+            self.messages.put("控制器不支持二进制帧，使用文本指令")
+
     def close_serial(self):
-        if self.serial_controller.close_serial():
+        if self.connection.close():
             self.update_serial_info("串口已关闭")
 
     def update_serial_info(self, message):
-        self.serial_info_text.configure(state="normal")
-        self.serial_info_text.insert(tk.END, message + "\n")
-        self.serial_info_text.configure(state="disabled")
-        self.serial_info_text.see(tk.END)  # 自动滚动到最后一行
+        self.serial_log.append(message)
 
+    def poll_serial_results(self):
+        """在界面线程中处理写线程回传的发送结果"""
+        while True:
+            try:
+                command, error = self.serial_controller.results.get_nowait()
+            except queue.Empty:
+                break
+            if error is not None:
+                self.update_serial_info(f"发送失败: {str(command).strip()} ({error})")
+        while True:
+            try:
+                line = self.serial_controller.replies.get_nowait()
+            except queue.Empty:
+                break
+            if self.telemetry_poller is not None and reply_name(line) == "Infor":
+                continue  # 遥测查询的回复只进曲线，不刷屏
+            self.update_serial_info(f"收到: {line}")
+        for events in (self.connection.events, self.messages):
+            while True:
+                try:
+                    message = events.get_nowait()
+                except queue.Empty:
+                    break
+                self.update_serial_info(message)
+        if self.replay_thread is not None and not self.replay_thread.is_alive():
+            self.replay_thread = None
+            self.replayer = None
+            self.replay_button.configure(text="回放会话")
+        self.root.after(20, self.poll_serial_results)
+
+    @traced
     def send_custom_command(self):
         command = self.command_entry.get()
         if command:
             if self.serial_controller.send_command(command + "\n"):
+                self.position = None  # 手动输入的指令无法推算位置
                 self.update_serial_info(f"发送成功: {command}")
             else:
                 self.update_serial_info(f"发送失败: {command}")
@@ -168,19 +297,70 @@ class RobotControlApp:
         close_btn = ttk.Button(frame, text="急停", command=self.send_stop_command)
         close_btn.grid(row=0, column=1, padx=5, pady=5)
 
+    @traced
     def send_reset_command(self):
-        command = f"Origin_{self.speed}"
-        if self.serial_controller.send_command(command + "\n"):
+        command = commands.Origin(self.speed)
+        error, position = self.check_workcell([command])
+        if error:
+            self.update_serial_info(f"路径碰撞: {error}")
+            return
+        if self.serial_controller.send_command(command):
+            self.position = position
             self.update_serial_info(f"复位成功，速度: {self.speed}")
         else:
             self.update_serial_info(f"复位失败")
 
+    @traced
     def send_stop_command(self):
-        command = "Stop\n"
+        self.send(commands.STOP)
+        self.position = None  # 急停后停在路径中途
+
+    def send(self, command):
+        """发送指令对象，并在信息框中显示是否已交给串口线程"""
         if self.serial_controller.send_command(command):
-            self.update_serial_info(f"发送成功: {command.strip()}")
-        else:
-            self.update_serial_info(f"发送失败: {command.strip()}")
+            self.update_serial_info(f"发送成功: {command}")
+            return True
+        self.update_serial_info(f"发送失败: {command}")
+        return False
+
+    def send_jog(self, command):
+        self.position = None  # 点动后末端位置无法推算
+        return self.serial_controller.send_command(command)
+
+    def estimated_position(self):
+        """按已发送指令推算的末端位置，未知时取最近的遥测样本，都没有时为 None"""
+        if self.position is None and self.telemetry_poller is not None:
+            samples = self.telemetry_ring.snapshot(last=1)
+            if len(samples):
+                xyz = tuple(samples["xyz"][0].tolist())
+                if all(math.isfinite(v) for v in xyz):
+                    return xyz
+        return self.position
+
+    def check_workcell(self, moves):
+        """逐条检查运动路径是否穿过障碍物，返回 (碰撞原因或 None, 执行后的末端位置)"""
+        if self.workcell is None:
+            return None, None
+        from workcell import next_position
+
+        position = self.estimated_position()
+        for command in moves:
+            error = self.workcell.check_move(position, command, self.kinematics)
+            if error:
+                return error, position
+            position = next_position(position, command, self.kinematics)
+        return None, position
+
+    def read_entries(self, *entries):
+        """读取一组输入框中的数字，空白或非数字时抛出 ValueError"""
+        values = []
+        for entry in entries:
+            text = entry.get().strip()
+            try:
+                values.append(float(text))
+            except ValueError:
+                raise ValueError(f"请输入数字: {text!r}") from None
+        return values
 
     def create_posctrl_frame(self):
         frame = ttk.LabelFrame(self.root, text="坐标发送")
@@ -196,121 +376,143 @@ class RobotControlApp:
         joint_btn = ttk.Button(frame, text="发送关节坐标", command=self.send_joint_data)
         joint_btn.grid(row=0, column=4, padx=5, pady=5)
 
+        # 世界坐标
+        self.world_x = ttk.Entry(frame, width=10)
+        self.world_x.grid(row=1, column=1, padx=5, pady=5)
+        self.world_y = ttk.Entry(frame, width=10)
+        self.world_y.grid(row=1, column=2, padx=5, pady=5)
+        self.world_z = ttk.Entry(frame, width=10)
+        self.world_z.grid(row=1, column=3, padx=5, pady=5)
+        world_btn = ttk.Button(frame, text="发送世界坐标", command=self.send_world_data)
+        world_btn.grid(row=1, column=4, padx=5, pady=5)
+
+        # 直线运动
+        self.line_x = ttk.Entry(frame, width=10)
+        self.line_x.grid(row=2, column=1, padx=5, pady=5)
+        self.line_y = ttk.Entry(frame, width=10)
+        self.line_y.grid(row=2, column=2, padx=5, pady=5)
+        self.line_z = ttk.Entry(frame, width=10)
+        self.line_z.grid(row=2, column=3, padx=5, pady=5)
+        line_btn = ttk.Button(frame, text="发送直线运动", command=self.send_line_data)
+        line_btn.grid(row=2, column=4, padx=5, pady=5)
+
+        # 可达性检查需要标定配置 (--arm-config)
+        reach_check = ttk.Checkbutton(
+            frame, text="发送前检查可达性", variable=self.reach_check_var
+        )
+        reach_check.grid(row=3, column=1, columnspan=3, sticky="w", padx=5, pady=5)
+        if self._kinematics is None:
+            reach_check.configure(
+                state="disabled", text="发送前检查可达性（未加载标定配置）"
+            )
+
+    def create_offset_frame(self, frame):
         # 关节偏移
         self.joint_offset_x = ttk.Entry(frame, width=10)
-        self.joint_offset_x.grid(row=1, column=1, padx=5, pady=5)
+        self.joint_offset_x.grid(row=0, column=1, padx=5, pady=5)
         self.joint_offset_y = ttk.Entry(frame, width=10)
-        self.joint_offset_y.grid(row=1, column=2, padx=5, pady=5)
+        self.joint_offset_y.grid(row=0, column=2, padx=5, pady=5)
         self.joint_offset_z = ttk.Entry(frame, width=10)
-        self.joint_offset_z.grid(row=1, column=3, padx=5, pady=5)
+        self.joint_offset_z.grid(row=0, column=3, padx=5, pady=5)
         joint_offset_btn = ttk.Button(
             frame, text="发送关节偏移", command=self.send_joint_offset_data
         )
-        joint_offset_btn.grid(row=1, column=4, padx=5, pady=5)
-
-        # 世界坐标
-        self.world_x = ttk.Entry(frame, width=10)
-        self.world_x.grid(row=2, column=1, padx=5, pady=5)
-        self.world_y = ttk.Entry(frame, width=10)
-        self.world_y.grid(row=2, column=2, padx=5, pady=5)
-        self.world_z = ttk.Entry(frame, width=10)
-        self.world_z.grid(row=2, column=3, padx=5, pady=5)
-        world_btn = ttk.Button(frame, text="发送世界坐标", command=self.send_world_data)
-        world_btn.grid(row=2, column=4, padx=5, pady=5)
+        joint_offset_btn.grid(row=0, column=4, padx=5, pady=5)
 
         # 世界偏移
         self.world_offset_x = ttk.Entry(frame, width=10)
-        self.world_offset_x.grid(row=3, column=1, padx=5, pady=5)
+        self.world_offset_x.grid(row=1, column=1, padx=5, pady=5)
         self.world_offset_y = ttk.Entry(frame, width=10)
-        self.world_offset_y.grid(row=3, column=2, padx=5, pady=5)
+        self.world_offset_y.grid(row=1, column=2, padx=5, pady=5)
         self.world_offset_z = ttk.Entry(frame, width=10)
-        self.world_offset_z.grid(row=3, column=3, padx=5, pady=5)
+        self.world_offset_z.grid(row=1, column=3, padx=5, pady=5)
         world_offset_btn = ttk.Button(
             frame, text="发送世界偏移", command=self.send_world_offset_data
         )
-        world_offset_btn.grid(row=3, column=4, padx=5, pady=5)
-
-        # 直线运动
-        self.line_x = ttk.Entry(frame, width=10)
-        self.line_x.grid(row=4, column=1, padx=5, pady=5)
-        self.line_y = ttk.Entry(frame, width=10)
-        self.line_y.grid(row=4, column=2, padx=5, pady=5)
-        self.line_z = ttk.Entry(frame, width=10)
-        self.line_z.grid(row=4, column=3, padx=5, pady=5)
-        line_btn = ttk.Button(frame, text="发送直线运动", command=self.send_line_data)
-        line_btn.grid(row=4, column=4, padx=5, pady=5)
+        world_offset_btn.grid(row=1, column=4, padx=5, pady=5)
 
         # 直线偏移
         self.line_offset_x = ttk.Entry(frame, width=10)
-        self.line_offset_x.grid(row=5, column=1, padx=5, pady=5)
+        self.line_offset_x.grid(row=2, column=1, padx=5, pady=5)
         self.line_offset_y = ttk.Entry(frame, width=10)
-        self.line_offset_y.grid(row=5, column=2, padx=5, pady=5)
+        self.line_offset_y.grid(row=2, column=2, padx=5, pady=5)
         self.line_offset_z = ttk.Entry(frame, width=10)
-        self.line_offset_z.grid(row=5, column=3, padx=5, pady=5)
+        self.line_offset_z.grid(row=2, column=3, padx=5, pady=5)
         line_offset_btn = ttk.Button(
             frame, text="发送直线偏移", command=self.send_line_offset_data
         )
-        line_offset_btn.grid(row=5, column=4, padx=5, pady=5)
+        line_offset_btn.grid(row=2, column=4, padx=5, pady=5)
 
+    def send_motion(self, command_type, entries, check=None):
+        """读取三个输入框，校验并发送一条运动指令；check 为可达性检查函数"""
+        try:
+            x, y, z = self.read_entries(*entries)
+            command = command_type(x, y, z, self.speed)
+        except ValueError as e:
+            self.update_serial_info(f"参数错误: {e}")
+            return
+        if check is not None:
+            error = check(x, y, z)
+            if error:
+                self.update_serial_info(f"目标不可达: {error}")
+                return
+        error, position = self.check_workcell([command])
+        if error:
+            self.update_serial_info(f"路径碰撞: {error}")
+            return
+        if self.send(command):
+            self.position = position
+
+    def reach_check(self, name):
+        """勾选了可达性检查时返回运动学模型的检查方法，否则返回 None"""
+        if not self.reach_check_var.get():
+            return None
+        return getattr(self.kinematics, name)
+
+    @traced
     def send_joint_data(self):
-        x = self.joint_x.get()
-        y = self.joint_y.get()
-        z = self.joint_z.get()
-        command = f"JointAngle_{x},{y},{z},{self.speed}\n"
-        if self.serial_controller.send_command(command):
-            self.update_serial_info(f"发送成功: {command.strip()}")
-        else:
-            self.update_serial_info(f"发送失败: {command.strip()}")
+        self.send_motion(
+            commands.JointAngle,
+            (self.joint_x, self.joint_y, self.joint_z),
+            self.reach_check("check_joints"),
+        )
 
+    @traced
     def send_joint_offset_data(self):
-        x = self.joint_offset_x.get()
-        y = self.joint_offset_y.get()
-        z = self.joint_offset_z.get()
-        command = f"JointAngleOffset_{x},{y},{z},{self.speed}\n"
-        if self.serial_controller.send_command(command):
-            self.update_serial_info(f"发送成功: {command.strip()}")
-        else:
-            self.update_serial_info(f"发送失败: {command.strip()}")
+        self.send_motion(
+            commands.JointAngleOffset,
+            (self.joint_offset_x, self.joint_offset_y, self.joint_offset_z),
+        )
 
+    @traced
     def send_world_data(self):
-        x = self.world_x.get()
-        y = self.world_y.get()
-        z = self.world_z.get()
-        command = f"DescartesPoint_{x},{y},{z},{self.speed}\n"
-        if self.serial_controller.send_command(command):
-            self.update_serial_info(f"发送成功: {command.strip()}")
-        else:
-            self.update_serial_info(f"发送失败: {command.strip()}")
+        self.send_motion(
+            commands.DescartesPoint,
+            (self.world_x, self.world_y, self.world_z),
+            self.reach_check("check_point"),
+        )
 
+    @traced
     def send_world_offset_data(self):
-        x = self.world_offset_x.get()
-        y = self.world_offset_y.get()
-        z = self.world_offset_z.get()
-        command = f"DescartesPointOffset_{x},{y},{z},{self.speed},50\n"
-        if self.serial_controller.send_command(command):
-            self.update_serial_info(f"发送成功: {command.strip()}")
-        else:
-            self.update_serial_info(f"发送失败: {command.strip()}")
+        self.send_motion(
+            commands.DescartesPointOffset,
+            (self.world_offset_x, self.world_offset_y, self.world_offset_z),
+        )
 
+    @traced
     def send_line_data(self):
-        x = self.line_x.get()
-        y = self.line_y.get()
-        z = self.line_z.get()
-        command = f"DescartesLine_{x},{y},{z},{self.speed}\n"
-        if self.serial_controller.send_command(command):
-            self.update_serial_info(f"发送成功: {command.strip()}")
-        else:
-            self.update_serial_info(f"发送失败: {command.strip()}")
+        self.send_motion(
+            commands.DescartesLine,
+            (self.line_x, self.line_y, self.line_z),
+            self.reach_check("check_point"),
+        )
 
+    @traced
     def send_line_offset_data(self):
-        x = self.line_offset_x.get()
-        y = self.line_offset_y.get()
-        z = self.line_offset_z.get()
-        command = f"DescartesLinearOffset_{x},{y},{z},{self.speed}\n"
-        if self.serial_controller.send_command(command):
-            self.update_serial_info(f"发送成功: {command.strip()}")
-        else:
-            self.update_serial_info(f"发送失败: {command.strip()}")
+        self.send_motion(
+            commands.DescartesLinearOffset,
+            (self.line_offset_x, self.line_offset_y, self.line_offset_z),
+        )
 
     def create_suction_frame(self):
         frame = ttk.LabelFrame(self.root, text="吸嘴控制")
@@ -322,10 +524,7 @@ class RobotControlApp:
         close_btn = ttk.Button(frame, text="关闭吸嘴", command=self.close_suction)
         close_btn.grid(row=0, column=1, padx=5, pady=5)
 
-    def create_variable_speed_frame(self):
-        frame = ttk.LabelFrame(self.root, text="变速运动")
-        frame.pack(pady=10, padx=10, fill="x")
-
+    def create_variable_speed_frame(self, frame):
         # 目标坐标
         ttk.Label(frame, text="目标X:").grid(row=0, column=0, padx=5, pady=5)
         self.target_x = ttk.Entry(frame, width=10)
@@ -348,12 +547,26 @@ class RobotControlApp:
         self.end_speed = ttk.Entry(frame, width=10)
         self.end_speed.grid(row=1, column=3, padx=5, pady=5)
 
+        # 速度曲线
+        ttk.Label(frame, text="速度曲线:").grid(row=2, column=0, padx=5, pady=5)
+        self.profile_combo = ttk.Combobox(
+            frame, values=["线性", "梯形", "S形"], width=8, state="readonly"
+        )
+        self.profile_combo.current(1)
+        self.profile_combo.grid(row=2, column=1, padx=5, pady=5)
+
+        # 最高速度，留空时取当前设置的速度
+        ttk.Label(frame, text="最高速度:").grid(row=2, column=2, padx=5, pady=5)
+        self.cruise_speed = ttk.Entry(frame, width=10)
+        self.cruise_speed.grid(row=2, column=3, padx=5, pady=5)
+
         # 开始按钮
         start_btn = ttk.Button(
             frame, text="开始变速运动", command=self.start_variable_speed
         )
         start_btn.grid(row=1, column=4, columnspan=2, padx=5, pady=5)
 
+    @traced
     def start_variable_speed(self):
         try:
             # 获取输入值
@@ -362,47 +575,58 @@ class RobotControlApp:
             target_z = float(self.target_z.get())
             start_speed = float(self.start_speed.get())
             end_speed = float(self.end_speed.get())
+            cruise_speed = float(self.cruise_speed.get() or self.speed)
+            from planner import PROFILES, plan_commands, plan_linear_move
+
+            profile = PROFILES[self.profile_combo.current()]
+
+            # 按距离分段并一次性计算每段的偏移、速度和停顿
+            plan = plan_linear_move(
+                (target_x, target_y, target_z),
+                start_speed,
+                end_speed,
+                max_speed=cruise_speed,
+                profile=profile,
+            )
+
+            error, position = self.check_workcell(c for c, _ in plan_commands(plan))
+            if error:
+                self.update_serial_info(f"路径碰撞: {error}")
+                return
+
+            # 按确认流式发送：段数不受发送队列容量限制，中途失败（如急停）时
+            # 剩余的段不再发出，不会留下发了一半的运动
+            from streaming import CommandStreamer
 
-            # 计算总距离
-            dx = target_x
-            dy = target_y
-            dz = target_z
-            total_distance = (dx**2 + dy**2 + dz**2) ** 0.5
-
-            # 计算分段参数
-            num_steps = 20  # 可根据需要调整
-            speed_increment = (end_speed - start_speed) / num_steps
-            distance_increment = total_distance / num_steps
-
-            # 执行分段运动
-            for i in range(num_steps):
-                current_speed = start_speed + i * speed_increment
-                delta_x = dx * distance_increment / total_distance
-                delta_y = dy * distance_increment / total_distance
-                delta_z = dz * distance_increment / total_distance
-
-                command = f"DescartesLinearOffset_{delta_x},{delta_y},{delta_z},{current_speed}\n"
-                if not self.serial_controller.send_command(command):
-                    raise Exception("发送命令失败")
-                time.sleep(0.1)  # 根据实际需求调整间隔时间
-
-            self.update_serial_info("变速运动完成")
+            self.position = position
+            streamer = CommandStreamer(self.serial_controller, window=MOTION_WINDOW)
+            moves = [command for command, _ in plan_commands(plan)]
+            threading.Thread(
+                target=self.run_variable_speed, args=(streamer, moves), daemon=True
+            ).start()
+
+            self.update_serial_info(
+                f"变速运动已开始: {len(plan.speeds)} 段，预计 {plan.dwells.sum():.1f} 秒"
+            )
         except Exception as e:
             self.update_serial_info(f"变速运动出错: {str(e)}")
 
+    def run_variable_speed(self, streamer, moves):
+        # 在后台线程中运行，只通过 messages 队列与界面通信
+        try:
+            count = streamer.stream(moves)
+            self.messages.put(f"变速运动完成: {count} 段")
+        except Exception as e:
+            self.position = None  # 中断时无法确定停在哪一段
+            self.messages.put(f"变速运动中断: {e}")
+
+    @traced
     def open_suction(self):
-        command = "Suction_1\n"
-        if self.serial_controller.send_command(command):
-            self.update_serial_info(f"发送成功: {command.strip()}")
-        else:
-            self.update_serial_info(f"发送失败: {command.strip()}")
+        self.send(commands.SUCTION_ON)
 
+    @traced
     def close_suction(self):
-        command = "Suction_0\n"
-        if self.serial_controller.send_command(command):
-            self.update_serial_info(f"发送成功: {command.strip()}")
-        else:
-            self.update_serial_info(f"发送失败: {command.strip()}")
+        self.send(commands.SUCTION_OFF)
 
     def create_speed_frame(self):
         frame = ttk.LabelFrame(self.root, text="参数设置")
@@ -419,19 +643,15 @@ class RobotControlApp:
         set_speed_btn = ttk.Button(frame, text="设置速度", command=self.set_speed)
         set_speed_btn.grid(row=0, column=2, padx=5, pady=5)
 
+    @traced
     def set_speed(self):
         try:
-            new_speed = int(self.speed_entry.get())
-            if new_speed < 0:
-                raise ValueError
-            self.speed = new_speed
-            command = f"Speed_{self.speed}"
-            if self.serial_controller.send_command(command):
-                self.update_serial_info(f"发送成功: {command.strip()}")
-            else:
-                self.update_serial_info(f"发送失败: {command.strip()}")
+            command = commands.Speed(int(self.speed_entry.get()))
         except ValueError:
-            self.update_serial_info("请输入有效的整数速度值")
+            self.update_serial_info("请输入 1~100 的整数速度值")
+            return
+        self.speed = command.value
+        self.jog.set_speed(command.value, sent=self.send(command))
 
     def create_direction_control_frame(self):
         """创建方向控制组件"""
@@ -459,11 +679,7 @@ class RobotControlApp:
         self.joint_direction_buttons = []
         joint_labels = ["关节0+", "关节0-", "关节1+", "关节1-", "关节2+", "关节2-"]
         for i, label in enumerate(joint_labels):
-            btn = ttk.Button(
-                self.direction_frame,
-                text=label,
-                command=lambda i=i: self.start_joint_move(i),
-            )
+            btn = ttk.Button(self.direction_frame, text=label)
             btn.grid(row=1 + i // 2, column=i % 2, padx=5, pady=5)
             self.joint_direction_buttons.append(btn)
 
@@ -471,23 +687,48 @@ class RobotControlApp:
         self.world_direction_buttons = []
         world_labels = ["X+", "X-", "Y+", "Y-", "Z+", "Z-"]
         for i, label in enumerate(world_labels):
-            btn = ttk.Button(
-                self.direction_frame,
-                text=label,
-                command=lambda i=i: self.start_world_move(i),
-            )
+            btn = ttk.Button(self.direction_frame, text=label)
             btn.grid(row=1 + i // 2, column=i % 2, padx=5, pady=5)
             self.world_direction_buttons.append(btn)
 
-        # 绑定鼠标松开事件
-        for btn in self.joint_direction_buttons + self.world_direction_buttons:
-            btn.bind("<ButtonRelease-1>", lambda event: self.stop_move())
+        # 按下开始、松开立即停止（按钮的 command 在松开时才触发，不能用来开始）
+        for buttons in (self.joint_direction_buttons, self.world_direction_buttons):
+            for i, btn in enumerate(buttons):
+                btn.bind("<ButtonPress-1>", lambda event, i=i: self.start_move(i))
+                btn.bind("<ButtonRelease-1>", lambda event, i=i: self.stop_move(i))
+
+        # 连续速度滑块：偏离中点的方向决定运动方向，幅度决定总速度，松开回中并停止
+        ttk.Label(self.direction_frame, text="滑块点动轴：").grid(
+            row=4, column=0, padx=5, pady=5, sticky="e"
+        )
+        self.jog_axis_combo = ttk.Combobox(
+            self.direction_frame, values=["1", "2", "3"], width=5, state="readonly"
+        )
+        self.jog_axis_combo.set("1")
+        self.jog_axis_combo.grid(row=4, column=1, padx=5, pady=5, sticky="w")
+        self.jog_scale = ttk.Scale(
+            self.direction_frame,
+            from_=-100,
+            to=100,
+            orient="horizontal",
+            length=300,
+            command=self.on_jog_scale,
+        )
+        self.jog_scale.grid(row=5, column=0, columnspan=3, padx=5, pady=5, sticky="w")
+        self.jog_scale.bind("<ButtonRelease-1>", lambda event: self.reset_jog_scale())
+
+        # 键盘点动：Q/A、W/S、E/D 对应三个轴的正/负方向，Esc 急停点动
+        self.root.bind("<KeyPress>", self.on_jog_key_press)
+        self.root.bind("<KeyRelease>", self.on_jog_key_release)
+        self.root.bind("<Escape>", lambda event: self.jog.stop())
+        self.root.bind("<FocusOut>", self.on_focus_out)
 
         # 初始化按钮显示状态
         self.update_direction_buttons()
 
     def update_direction_buttons(self):
         """根据当前模式更新方向按钮的显示状态"""
+        self.jog.stop()  # 切换坐标系前停止正在进行的点动
         if self.mode_var.get() == 0:  # 关节坐标模式
             for btn in self.joint_direction_buttons:
                 btn.grid()  # 显示关节坐标按钮
@@ -499,39 +740,292 @@ class RobotControlApp:
             for btn in self.world_direction_buttons:
                 btn.grid()  # 显示世界坐标按钮
 
-    def start_joint_move(self, direction):
-        """关节坐标模式下的移动"""
+    def jog_key(self, direction):
+        """方向按钮序号 -> MovStart_ 的 (坐标系, 轴号, 方向)"""
+        axis_number = direction // 2 + 1  # 关节号或轴号 (1, 2, 3)
         if self.mode_var.get() == 0:  # 关节坐标模式
-            joint_number = direction // 2 + 1  # 关节号 (1, 2, 3)
             direction_value = 1 if direction % 2 == 0 else 0  # 正方向: 1, 负方向: 0
-            command = f"MovStart_0,{joint_number},{direction_value},\n"
-            if self.serial_controller.send_command(command):
-                self.update_serial_info(f"发送成功: {command.strip()}")
-            else:
-                self.update_serial_info(f"发送失败: {command.strip()}")
-
-    def start_world_move(self, direction):
-        """世界坐标模式下的移动"""
-        if self.mode_var.get() == 1:  # 世界坐标模式
-            axis_number = direction // 2 + 1  # 轴号 (1: X, 2: Y, 3: Z)
-            direction_value = 0 if direction % 2 == 0 else 1  # 正方向: 1, 负方向: 0
-            command = f"MovStart_1,{axis_number},{direction_value},\n"
-            if self.serial_controller.send_command(command):
-                self.update_serial_info(f"发送成功: {command.strip()}")
-            else:
-                self.update_serial_info(f"发送失败: {command.strip()}")
+            return 0, axis_number, direction_value
+        direction_value = 0 if direction % 2 == 0 else 1  # 世界坐标模式
+        return 1, axis_number, direction_value
+
+    def start_move(self, direction):
+        """开始移动，实际发送由点动引擎在下一个节拍完成"""
+        self.jog.press(self.jog_key(direction))
 
-    def stop_move(self):
+    def stop_move(self, direction=None):
         """停止移动"""
-        command = "MovStp\n"
-        if self.serial_controller.send_command(command):
-            self.update_serial_info(f"发送成功: {command.strip()}")
+        if direction is None:
+            self.jog.stop()
         else:
-            self.update_serial_info(f"发送失败: {command.strip()}")
+            self.jog.release(self.jog_key(direction), immediate=True)
+
+    def jog_tick(self):
+        self.jog.tick()
+        self.root.after(int(self.jog.tick_interval * 1000), self.jog_tick)
+
+    def on_jog_scale(self, value):
+        value = float(value)
+        axis = int(self.jog_axis_combo.get())
+        if abs(value) < JOG_DEAD_ZONE:
+            self.jog.set_velocity(None)
+        else:
+            direction = (axis - 1) * 2 + (0 if value > 0 else 1)
+            self.jog.set_velocity(self.jog_key(direction), value)
+
+    def reset_jog_scale(self):
+        self.jog_scale.set(0)
+        self.jog.set_velocity(None)
+
+    def on_jog_key_press(self, event):
+        direction = JOG_KEYS.get(event.keysym.lower())
+        # 输入框中打字时不点动
+        if direction is not None and not isinstance(event.widget, (tk.Entry, tk.Text)):
+            self.jog.press(self.jog_key(direction))
+
+    def on_jog_key_release(self, event):
+        direction = JOG_KEYS.get(event.keysym.lower())
+        if direction is not None:
+            self.jog.release(self.jog_key(direction))
+
+    def on_focus_out(self, event):
+        # 失去焦点后收不到松开事件，立即停止
+        if event.widget is self.root:
+            self.jog.stop()
+
+    def create_telemetry_frame(self, frame):
+        from telemetry import DEFAULT_RATE, SampleRing
+        from telemetry_plot import TelemetryPlot
+
+        ttk.Label(frame, text="频率(Hz)：").grid(row=0, column=0, padx=5, pady=5)
+        self.telemetry_rate_entry = ttk.Entry(frame, width=6)
+        self.telemetry_rate_entry.insert(0, str(DEFAULT_RATE))
+        self.telemetry_rate_entry.grid(row=0, column=1, padx=5, pady=5)
+        self.telemetry_field_var = tk.StringVar(value="xyz")
+        ttk.Radiobutton(
+            frame, text="末端坐标", variable=self.telemetry_field_var, value="xyz"
+        ).grid(row=0, column=2, padx=5, pady=5)
+        ttk.Radiobutton(
+            frame, text="关节角", variable=self.telemetry_field_var, value="joints"
+        ).grid(row=0, column=3, padx=5, pady=5)
+        self.telemetry_button = ttk.Button(
+            frame, text="开始遥测", command=self.toggle_telemetry
+        )
+        self.telemetry_button.grid(row=0, column=4, padx=5, pady=5)
+        ttk.Button(frame, text="导出", command=self.export_telemetry).grid(
+            row=0, column=5, padx=5, pady=5
+        )
+
+        canvas = tk.Canvas(frame, height=120, background="white")
+        canvas.grid(row=1, column=0, columnspan=6, padx=5, pady=5, sticky="ew")
+        frame.columnconfigure(5, weight=1)
+        self.telemetry_ring = SampleRing()
+        self.telemetry_poller = None
+        self.telemetry_plot = TelemetryPlot(self.root, canvas, self.telemetry_ring)
+        self.telemetry_field_var.trace_add(
+            "write",
+            lambda *_: setattr(
+                self.telemetry_plot, "field", self.telemetry_field_var.get()
+            ),
+        )
+
+    def toggle_telemetry(self):
+        if self.telemetry_poller is not None:
+            self.telemetry_poller.stop()
+            self.telemetry_poller = None
+            self.telemetry_plot.stop()
+            self.telemetry_button.configure(text="开始遥测")
+            return
+        from telemetry import TelemetryPoller
+
+        try:
+            rate = float(self.telemetry_rate_entry.get())
+            poller = TelemetryPoller(
+                self.serial_controller,
+                self.telemetry_ring,
+                rate=rate,
+                kinematics=self.kinematics,
+                path=self.telemetry_file,
+            )
+        except (ValueError, OSError) as e:
+            self.update_serial_info(f"无法开始遥测: {e}")
+            return
+        self.telemetry_poller = poller
+        poller.start()
+        self.telemetry_plot.start()
+        self.telemetry_button.configure(text="停止遥测")
+
+    def export_telemetry(self):
+        from tkinter import filedialog
+
+        path = filedialog.asksaveasfilename(
+            defaultextension=".bin", filetypes=[("遥测样本", "*.bin")]
+        )
+        if path:
+            try:
+                self.telemetry_ring.save(path)
+                self.update_serial_info(
+                    f"已导出 {len(self.telemetry_ring)} 个遥测样本到 {path}"
+                )
+            except OSError as e:
+                self.update_serial_info(f"导出失败: {e}")
+
+    def create_teach_frame(self):
+        frame = ttk.LabelFrame(self.root, text="示教")
+        frame.pack(pady=10, padx=10, fill="x")
+
+        self.teach_button = ttk.Button(
+            frame, text="开始记录", command=self.toggle_teach_recording
+        )
+        self.teach_button.grid(row=0, column=0, padx=5, pady=5)
+        self.replay_button = ttk.Button(
+            frame, text="回放会话", command=self.toggle_replay
+        )
+        self.replay_button.grid(row=0, column=1, padx=5, pady=5)
+        self.simplify_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(
+            frame, text="合并直线段并去掉多余的速度设置", variable=self.simplify_var
+        ).grid(row=0, column=2, padx=5, pady=5)
+        self.teach_recorder = None
+        self.replayer = None
+        self.replay_thread = None
+
+    def toggle_teach_recording(self):
+        if self.teach_recorder is not None:
+            self.teach_recorder.stop()
+            self.update_serial_info(
+                f"示教记录结束，共 {self.teach_recorder.count} 条指令"
+            )
+            self.teach_recorder = None
+            self.teach_button.configure(text="开始记录")
+            return
+        from tkinter import filedialog
+        from teach import TeachRecorder
+
+        path = filedialog.asksaveasfilename(
+            defaultextension=".jsonl", filetypes=[("示教会话", "*.jsonl")]
+        )
+        if not path:
+            return
+        recorder = TeachRecorder(path)
+        try:
+            recorder.start(self.serial_controller)
+        except OSError as e:
+            self.update_serial_info(f"无法开始记录: {e}")
+            return
+        self.teach_recorder = recorder
+        self.teach_button.configure(text="停止记录")
+        self.update_serial_info(f"开始示教记录: {path}")
+
+    def toggle_replay(self):
+        if self.replayer is not None:
+            self.replayer.abort()
+            return
+        from tkinter import filedialog
+        from teach import Replayer, load_session, plan_replay
+
+        path = filedialog.askopenfilename(filetypes=[("示教会话", "*.jsonl")])
+        if not path:
+            return
+        try:
+            entries = load_session(path)
+        except (OSError, ValueError) as e:
+            self.update_serial_info(f"无法读取会话: {e}")
+            return
+        plan = plan_replay(entries, self.simplify_var.get())
+        self.update_serial_info(
+            f"回放 {path}: 记录 {len(entries)} 条，发送 {len(plan)} 条"
+        )
+        self.replayer = Replayer(self.serial_controller)
+        self.replay_button.configure(text="停止回放")
+        self.replay_thread = threading.Thread(
+            target=self.run_replay, args=(self.replayer, plan), daemon=True
+        )
+        self.replay_thread.start()
+
+    def run_replay(self, replayer, plan):
+        # 在后台线程中运行，只通过 messages 队列与界面通信
+        try:
+            count = replayer.run(plan)
+            self.messages.put(f"回放结束，完成 {count} 条指令")
+        except Exception as e:
+            self.messages.put(f"回放中断: {e}")
 
 
 # 主程序
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="机械臂控制程序")
+    parser.add_argument("--log-file", help="串口信息同时写入的日志文件（按大小轮转）")
+    parser.add_argument(
+        "--reconnect-policy",
+        choices=POLICIES,
+        default="abort",
+        help="断线时未完成的指令：abort 放弃，replay 重连后重发",
+    )
+    parser.add_argument("--telemetry-file", help="遥测样本同时追加写入的二进制文件")
+    parser.add_argument(
+        "--workcell", help="工作单元障碍物配置 (JSON)，发送运动前检查路径"
+    )
+    parser.add_argument(
+        "--arm-config",
+        help="机械臂标定配置 (JSON)，给出时默认在发送前检查目标是否可达",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="开启指令延迟统计，在本机该端口提供 /metrics 和 /metrics.json",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help="开启指令延迟统计，退出时写入该文件（.json 为 JSON，否则为 Prometheus 格式）",
+    )
+    parser.add_argument(
+        "--binary",
+        action="store_true",
+        help="打开串口后尝试启用二进制帧模式，控制器不支持时使用文本指令",
+    )
+    parser.add_argument(
+        "--server",
+        metavar="ADDRESS",
+        help="不直接打开串口，连接控制服务 (host:port 或 unix:/path)，见 control_server.py",
+    )
+    args = parser.parse_args()
+    instrumentation = None
+    if args.metrics_port is not None or args.metrics_file:
+        from instrumentation import Instrumentation
+
+        instrumentation = Instrumentation()
+        if args.metrics_port is not None:
+            instrumentation.serve(args.metrics_port)
+    workcell = None
+    if args.workcell:
+        from workcell import load_workcell
+
+        try:
+            workcell = load_workcell(args.workcell)
+        except (OSError, ValueError) as e:
+            parser.error(f"无法读取工作单元配置: {e}")
+    kinematics = None
+    if args.arm_config:
+        from kinematics import load_kinematics
+
+        try:
+            kinematics = load_kinematics(args.arm_config)
+        except (OSError, ValueError) as e:
+            parser.error(f"无法读取机械臂标定配置: {e}")
+
     root = tk.Tk()
-    app = RobotControlApp(root)
+    app = RobotControlApp(
+        root,
+        log_file=args.log_file,
+        reconnect_policy=args.reconnect_policy,
+        telemetry_file=args.telemetry_file,
+        workcell=workcell,
+        instrumentation=instrumentation,
+        binary=args.binary,
+        server=args.server,
+        kinematics=kinematics,
+    )
     root.mainloop()
+    if args.metrics_file:
+        instrumentation.save(args.metrics_file)
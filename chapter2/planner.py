@@ -0,0 +1,94 @@
+import collections
+import math
+
+import numpy as np
+
+from commands import DescartesLinearOffset
+
+# 速度曲线：线性（原先的逐段线性变速）、梯形、S 形
+PROFILES = ("linear", "trapezoid", "scurve")
+
+DEFAULT_MAX_STEP = 5.0  # 每段最大长度 (mm)
+DEFAULT_RAMP_FRACTION = 0.25  # 加速段与减速段各占总距离的比例
+FULL_SPEED_MM_S = 100.0  # 分速度 100% 时末端的线速度 (mm/s)，按实际机械臂标定
+FULL_JOINT_SPEED_DEG_S = 90.0  # 分速度 100% 时关节角速度 (°/s)，按实际机械臂标定
+
+MotionPlan = collections.namedtuple("MotionPlan", ["offsets", "speeds", "dwells"])
+
+
+def _ramp(t, profile):
+    # t 为加减速段内的归一化位置 (0~1)，返回速度插值系数
+    if profile == "scurve":
+        return t * t * (3 - 2 * t)  # smoothstep，起止处加速度为零
+    return t
+
+
+def speed_profile(s, start_speed, end_speed, max_speed=None, profile="trapezoid"):
+    """计算路径归一化位置 s (0~1 的数组) 处的分速度
+
+    梯形和 S 形曲线从 start_speed 加速到 max_speed（巡航速度），再减速到 end_speed；
+    max_speed 不低于起止速度，为 None 时取两者较大值，起止速度相同时即为匀速。
+    """
+    s = np.asarray(s, dtype=float)
+    if profile == "linear":
+        return start_speed + (end_speed - start_speed) * s
+    if profile not in PROFILES:
+        raise ValueError(f"未知的速度曲线: {profile}")
+    max_speed = max(start_speed, end_speed, max_speed or 0)
+
+    ramp = DEFAULT_RAMP_FRACTION
+    accel = _ramp(np.clip(s / ramp, 0, 1), profile)
+    decel = _ramp(np.clip((1 - s) / ramp, 0, 1), profile)
+    # 加速段从起始速度升到最高速度，减速段从最高速度降到最终速度，两者取较小值即得梯形
+    up = start_speed + (max_speed - start_speed) * accel
+    down = end_speed + (max_speed - end_speed) * decel
+    return np.minimum(up, down)
+
+
+def plan_linear_move(
+    offset,
+    start_speed,
+    end_speed,
+    max_speed=None,
+    profile="trapezoid",
+    max_step=DEFAULT_MAX_STEP,
+    max_segments=None,
+    full_speed=FULL_SPEED_MM_S,
+):
+    """把一次直线偏移运动拆分为若干段 DescartesLinearOffset
+
+    段数由总距离和 max_step 决定，所有段一次性向量化计算；给出 max_segments 时
+    段数超出上限抛出 ValueError，不会悄悄放大每段长度。
+    offsets 的累计和保留三位小数后与目标偏移严格相等，不会产生累计误差；
+    speeds 为每段的分速度 (1~100 的整数)，dwells 为每段按速度估算的运行时间 (s)。
+    """
+    offset = np.asarray(offset, dtype=float)
+    distance = float(np.linalg.norm(offset))
+    if distance == 0:
+        raise ValueError("目标偏移不能为零")
+    num_steps = max(1, math.ceil(distance / max_step))
+    if max_segments is not None and num_steps > max_segments:
+        raise ValueError(
+            f"每段不超过 {max_step:g} mm 需要 {num_steps} 段，超过上限 {max_segments}"
+        )
+
+    # 各段终点按比例取整后再差分，避免每段单独取整的误差累积
+    fractions = np.arange(1, num_steps + 1) / num_steps
+    points = np.round(np.outer(fractions, offset), 3)
+    offsets = np.diff(points, axis=0, prepend=np.zeros((1, 3)))
+
+    # 每段速度取该段中点处的曲线值
+    midpoints = (np.arange(num_steps) + 0.5) / num_steps
+    speeds = speed_profile(midpoints, start_speed, end_speed, max_speed, profile)
+    speeds = np.clip(np.rint(speeds), 1, 100).astype(int)
+
+    dwells = (distance / num_steps) / (speeds / 100 * full_speed)
+    return MotionPlan(offsets, speeds, dwells)
+
+
+def plan_commands(plan):
+    """逐段生成 (DescartesLinearOffset 指令, 停顿秒数)"""
+    for (x, y, z), speed, dwell in zip(
+        plan.offsets.tolist(), plan.speeds.tolist(), plan.dwells.tolist()
+    ):
+        yield DescartesLinearOffset(x, y, z, speed), dwell
@@ -0,0 +1,624 @@
+import collections
+import itertools
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import serial
+
+import commands
+
+# 走优先通道的指令：急停与按键松开必须越过排队中的运动指令
+PRIORITY_COMMANDS = ("Stop", "MovStp")
+
+# 控制器会回复的指令（见 docs 中 Order 指令“正确返回”表），其余指令写出即视为完成
+REPLY_COMMANDS = (
+    "SetStep",
+    "Speed",
+    "SetStepOK",
+    "Clean",
+    "Editor",
+    "JointAngle",
+    "JointAngleOffset",
+    "DescartesPoint",
+    "DescartesPointOffset",
+    "DescartesLine",
+    "DescartesLinearOffset",
+    "DI",
+    "DO",
+    "Suction",
+    "Grasp",
+    "Single",
+    "Cycle",
+    "Factory",
+    "Origin",
+    "Stop",
+    "Infor",
+    "Binary",
+)
+
+# 急停后不会再有回复的运动指令
+MOTION_COMMANDS = (
+    "JointAngle",
+    "JointAngleOffset",
+    "DescartesPoint",
+    "DescartesPointOffset",
+    "DescartesLine",
+    "DescartesLinearOffset",
+    "Origin",
+)
+
+DEFAULT_ACK_TIMEOUT = 30  # 等待回复的默认秒数，需覆盖最慢的一段运动
+
+# 控制器丢弃整帧时的回复前缀（"Error: frame crc" 等，见 binary_protocol），帧内指令都没有执行
+FRAME_ERROR = "Error: frame"
+
+logger = logging.getLogger(__name__)
+
+
+def command_name(command):
+    """取指令的操作码部分，例如 "DescartesLine_1,2,3,100\\n" -> "DescartesLine"
+
+    command 可以是文本，也可以是 commands 模块中的指令对象。
+    """
+    opcode = getattr(command, "opcode", None)
+    if opcode is not None:
+        return opcode
+    return command.strip().split("_", 1)[0]
+
+
+def reply_name(line):
+    """由控制器回复推断对应的指令操作码，例如 "Total_Speed: 100%" -> "Speed" """
+    if line.startswith("{"):
+        return "Infor"  # Infor 返回 JSON
+    if " Step -- " in line:
+        return "SetStep"
+    head = line.split(":", 1)[0].strip().rstrip("0123456789")
+    if head == "Total_Speed":
+        return "Speed"
+    return head
+
+
+class AckError(Exception):
+    """指令没有得到控制器的确认"""
+
+
+class ConnectionLost(AckError):
+    """串口断开，指令是否已被控制器执行无法确定"""
+
+
+# 串口读线程
+class SerialReader(threading.Thread):
+    """持续读取串口，按行切分回复，并与等待确认的指令一一对应"""
+
+    def __init__(self, ser, replies, lost=None, hold=False):
+        super().__init__(name="SerialReader", daemon=True)
+        self.ser = ser
+        self.replies = replies  # 收到的每一行，由界面线程取走，可为 None
+        self.lost = lost  # 串口读写出错时置位的 threading.Event
+        self.hold = hold  # 出错时保留等待中的指令，交给 ConnectionManager 处理
+        self.instrumentation = None  # 开启延迟统计时为 Instrumentation
+        self.error = None
+        self._buffer = bytearray()
+        # {操作码: deque[(future, 截止时刻, command, 登记序号, 延迟统计 trace, 帧序号)]}
+        self._pending = collections.defaultdict(collections.deque)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._running = True
+
+    def expect(
+        self,
+        name,
+        future,
+        timeout=DEFAULT_ACK_TIMEOUT,
+        command=None,
+        trace=None,
+        frame=None,
+    ):
+        """登记一条等待回复的指令，必须在写出之前调用以免回复先到
+
+        trace 为开启延迟统计时的 CommandTrace，回复配给这条指令时统计 ack 与 total；
+        frame 为按二进制帧发送时的帧序号，控制器丢弃该帧时同一帧的指令一起失败。
+        """
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            self._pending[name].append(
+                (future, deadline, command, next(self._sequence), trace, frame)
+            )
+
+    def forget(self, name, future):
+        """撤销登记（指令没能写出）"""
+        with self._lock:
+            waiting = self._pending.get(name, ())
+            for item in list(waiting):
+                if item[0] is future:
+                    waiting.remove(item)
+
+    def take_pending(self):
+        """取走所有仍在等待回复的 (command, future)，按登记顺序"""
+        with self._lock:
+            items = [
+                item
+                for waiting in self._pending.values()
+                for item in waiting
+                if not item[0].done()
+            ]
+            self._pending.clear()
+        items.sort(key=lambda item: item[3])
+        return [(item[2], item[0]) for item in items]
+
+    def stop(self):
+        self._running = False
+
+    def run(self):
+        while self._running:
+            try:
+                # 先阻塞等待至少一个字节（受 ser.timeout 限制），再一次性取走缓冲区中的全部数据
+                data = self.ser.read(self.ser.in_waiting or 1)
+            except Exception as e:
+                self.error = e
+                if self.lost is not None:
+                    self.lost.set()
+                if not self.hold:
+                    self._fail_all(ConnectionLost(f"串口读取失败: {e}"))
+                return
+            if data:
+                self._buffer += data
+                self._split_lines()
+            self._expire()
+        self._fail_all(AckError("串口已关闭"))
+
+    def _split_lines(self):
+        end = self._buffer.rfind(b"\n")
+        if end < 0:
+            return
+        lines = self._buffer[:end].split(b"\n")
+        del self._buffer[: end + 1]
+        for raw in lines:
+            line = raw.decode(errors="replace").strip()
+            if line:
+                if self.replies is not None:
+                    self.replies.put(line)
+                self._resolve(line)
+
+    def _resolve(self, line):
+        name = reply_name(line)
+        if name == "Error":
+            self._reject(line)
+            return
+        trace = None
+        with self._lock:
+            waiting = self._pending.get(name)
+            while waiting:
+                future, _, _, _, trace, _ = waiting.popleft()
+                if not future.done():
+                    future.set_result(line)
+                    break
+                trace = None
+            if name == "Stop":
+                # 急停后被打断的运动不会再有回复
+                for motion in MOTION_COMMANDS:
+                    self._fail(motion, AckError("运动已被急停中断"))
+        instrumentation = self.instrumentation
+        if trace is not None and instrumentation is not None:
+            instrumentation.replied(trace)
+
+    def _reject(self, line):
+        """控制器回复 "Error: ..." 时让最早登记、仍在等待回复的指令失败
+
+        控制器按顺序处理指令，错误与正常回复一样按顺序返回；错误信息只说明哪个参数
+        超出范围（如 "Error: X_DescartesCoordinate exceed scope"、"Error: Speed exceed
+        scope" 指的是运动指令的速度参数），不能据此判断是哪条指令。
+        帧错误 (FRAME_ERROR) 时整帧没有执行，最早那条指令所在帧的指令全部失败。
+        """
+        with self._lock:
+            for waiting in self._pending.values():
+                while waiting and waiting[0][0].done():
+                    waiting.popleft()
+            queues = [w for w in self._pending.values() if w]
+            if not queues:
+                return
+            waiting = min(queues, key=lambda w: w[0][3])
+            future, _, _, _, _, frame = waiting.popleft()
+            future.set_exception(AckError(line))
+            if frame is None or not line.startswith(FRAME_ERROR):
+                return
+            for waiting in queues:
+                for item in [item for item in waiting if item[5] == frame]:
+                    waiting.remove(item)
+                    if not item[0].done():
+                        item[0].set_exception(AckError(line))
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._lock:
+            for name, waiting in self._pending.items():
+                while waiting and (waiting[0][0].done() or waiting[0][1] <= now):
+                    future = waiting.popleft()[0]
+                    if not future.done():
+                        future.set_exception(TimeoutError(f"等待 {name} 回复超时"))
+
+    def _fail(self, name, error):
+        waiting = self._pending.get(name)
+        while waiting:
+            future = waiting.popleft()[0]
+            if not future.done():
+                future.set_exception(error)
+
+    def _fail_all(self, error):
+        with self._lock:
+            for name in list(self._pending):
+                self._fail(name, error)
+
+
+# 串口写线程
+class SerialWriter(threading.Thread):
+    """独占串口写操作的后台线程，界面线程只负责把指令放进队列"""
+
+    def __init__(
+        self,
+        ser,
+        results,
+        reader=None,
+        maxsize=64,
+        lost=None,
+        hold=False,
+        on_write=None,
+        instrumentation=None,
+    ):
+        super().__init__(name="SerialWriter", daemon=True)
+        self.ser = ser
+        self.results = results  # 发送结果 (command, error)，由界面线程取走，可为 None
+        self.reader = reader  # 登记等待回复的指令
+        self.maxsize = maxsize
+        self.lost = lost  # 串口写出错时置位的 threading.Event
+        self.hold = hold  # 出错时把指令放回队首并停止，交给 ConnectionManager 处理
+        self.on_write = on_write  # 每条指令写出后调用 on_write(command)
+        self.instrumentation = instrumentation  # 开启延迟统计时为 Instrumentation
+        self.framing = None  # 协商启用二进制帧后为 binary_protocol.BinaryFraming
+        self._frames = itertools.count()  # 帧序号，帧错误时据此找出同一帧的指令
+        self._queue = collections.deque()
+        self._priority = collections.deque()
+        self._cond = threading.Condition()
+        self._running = True
+
+    def put(self, command, delay=0, future=None, timeout=DEFAULT_ACK_TIMEOUT):
+        """指令入队，delay 为写出后的停顿秒数；队列已满或线程已停止时返回 False
+
+        传入 future 时，收到控制器回复后以回复行完成，不回复的指令在写出后完成。
+        """
+        name = command_name(command)
+        instrumentation = self.instrumentation
+        trace = None if instrumentation is None else instrumentation.enqueued(name)
+        item = (command, delay, future, timeout, trace)
+        with self._cond:
+            if not self._running:
+                return False
+            if name in PRIORITY_COMMANDS:
+                self._drop_pending(name)
+                self._priority.append(item)
+            elif len(self._queue) >= self.maxsize:
+                return False
+            else:
+                self._queue.append(item)
+            self._cond.notify()
+        return True
+
+    def _drop_pending(self, name):
+        # 急停清空所有排队的运动；松开按键只丢弃还没发出的 MovStart，避免停止后又开始运动
+        if name == "Stop":
+            dropped = list(self._queue)
+            self._queue.clear()
+        else:
+            dropped = [
+                item for item in self._queue if command_name(item[0]) == "MovStart"
+            ]
+            for item in dropped:
+                self._queue.remove(item)
+        for command, _, future, _, _ in dropped:
+            if future is not None:
+                future.cancel()
+            self._post(command, "已被 " + name + " 取消")
+
+    def _post(self, command, error):
+        if self.results is not None:
+            self.results.put((command, error))
+
+    def pending(self):
+        with self._cond:
+            return len(self._priority) + len(self._queue)
+
+    def take_queued(self):
+        """取走所有还没写出的 (command, delay, future, timeout)"""
+        with self._cond:
+            items = list(self._priority) + list(self._queue)
+            self._priority.clear()
+            self._queue.clear()
+        return [item[:4] for item in items]
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            for command, _, future, _, _ in self._queue:
+                if future is not None:
+                    future.cancel()
+            self._cond.notify()
+
+    def run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._priority or self._queue or not self._running
+                )
+                # 关闭前仍然把已入队的急停写出去
+                if self._priority:
+                    batch, framing = [self._priority.popleft()], None
+                elif self._running:
+                    batch, framing = self._take_batch()
+                else:
+                    break
+
+            try:
+                written = self._write_batch(batch, framing)
+            except Exception as e:
+                # 不能让线程悄悄退出：停止接收新指令，排队中的指令全部失败
+                logger.exception("串口写线程异常退出")
+                self._abort(batch, e)
+                return
+            if not written:
+                return
+            delay = batch[-1][1]
+            if delay > 0:
+                # 分段运动的停顿在 I/O 线程里等待，急停到达时立即结束等待
+                with self._cond:
+                    self._cond.wait_for(
+                        lambda: self._priority or not self._running, timeout=delay
+                    )
+
+    def _abort(self, batch, error):
+        with self._cond:
+            self._running = False
+            items = batch + list(self._priority) + list(self._queue)
+            self._priority.clear()
+            self._queue.clear()
+        for command, _, future, _, _ in items:
+            if future is not None and not future.done():
+                future.set_exception(error)
+            self._post(command, error)
+
+    def _guarded(self, callback, *args):
+        # 写出后的回调（示教记录、延迟统计）出错只记录日志，不影响后续指令
+        try:
+            callback(*args)
+        except Exception:
+            logger.exception("写线程回调出错: %r", callback)
+
+    def _take_batch(self):
+        """取出下一批指令，返回 (batch, framing)；以文本发送时 framing 为 None
+
+        二进制帧模式下把排队的连续指令合并为一帧，到带停顿的指令为止。需持有 _cond。
+        """
+        item = self._queue.popleft()
+        framing = self.framing
+        if framing is None or not framing.accepts(item[0]):
+            return [item], None
+        batch = [item]
+        size = framing.size(item[0])
+        while self._queue and batch[-1][1] == 0:
+            command = self._queue[0][0]
+            if not framing.accepts(command):
+                break
+            size += framing.size(command)
+            if size > framing.max_payload:
+                break
+            batch.append(self._queue.popleft())
+        return batch, framing
+
+    def _write_batch(self, batch, framing):
+        """一次写出一批指令；串口失效且 hold 时放回队首并返回 False"""
+        instrumentation = self.instrumentation
+        frame = None if framing is None else next(self._frames)
+        expects = []
+        for i, (command, _, future, timeout, trace) in enumerate(batch):
+            name = command_name(command)
+            # 会回复的指令都要登记，回复和错误才能按顺序配给正确的指令；
+            # 没有 future（如界面的 send_command）时用内部的 Future 占位。
+            # 手动输入的未知指令控制器以错误回复，同样登记
+            expects_reply = self.reader is not None and (
+                name in REPLY_COMMANDS or name not in commands.OPCODES
+            )
+            expects.append(expects_reply)
+            if expects_reply and future is None:
+                future = Future()
+                batch[i] = (command, batch[i][1], future, timeout, trace)
+            if trace is not None and instrumentation is not None:
+                instrumentation.dequeued(trace, expects_reply)
+            if expects_reply:
+                # trace 随登记交给读线程，回复配给这条指令时才统计，失败的指令不计入
+                self.reader.expect(name, future, timeout, command, trace, frame)
+        try:
+            if framing is None:
+                data = batch[0][0].encode()
+                if self.framing is not None and not data.isascii():
+                    # 非 ASCII 文本可能含有帧同步字节 0xA5，控制器会误当作帧
+                    raise ValueError("二进制帧模式下文本指令只能包含 ASCII 字符")
+            else:
+                data = framing.frame([item[0] for item in batch])
+            if instrumentation is not None:
+                write_started = [
+                    instrumentation.encoded(item[4]) if item[4] is not None else None
+                    for item in batch
+                ]
+            self.ser.write(data)
+        except Exception as e:
+            lost = self.lost is not None and isinstance(
+                e, (serial.SerialException, OSError)
+            )
+            if lost:
+                self.lost.set()
+            for (command, _, future, _, _), expects_reply in zip(batch, expects):
+                if lost and self.hold:
+                    if expects_reply:
+                        self.reader.forget(command_name(command), future)
+                    continue
+                if future is not None and not future.done():
+                    future.set_exception(e)
+                self._post(command, e)
+            if lost and self.hold:
+                # 串口已失效：指令按原顺序放回队首，线程退出，等待重连后处理
+                with self._cond:
+                    name = command_name(batch[0][0])
+                    lane = self._priority if name in PRIORITY_COMMANDS else self._queue
+                    lane.extendleft(reversed(batch))
+                return False
+            return True
+        for i, ((command, _, future, _, trace), expects_reply) in enumerate(
+            zip(batch, expects)
+        ):
+            if trace is not None and instrumentation is not None:
+                self._guarded(
+                    self._trace_written, instrumentation, trace, write_started[i]
+                )
+            if future is not None and not expects_reply:
+                future.set_result(None)
+            self._post(command, None)
+            if self.on_write is not None:
+                self._guarded(self.on_write, command)
+        return True
+
+    def _trace_written(self, instrumentation, trace, write_started):
+        try:
+            out_waiting = self.ser.out_waiting
+        except Exception:
+            out_waiting = None  # 部分平台或虚拟串口不支持
+        instrumentation.written(trace, write_started, out_waiting)
+        if instrumentation.drain:
+            try:
+                self.ser.flush()
+            except Exception:
+                return
+            instrumentation.drained(trace)
+
+
+# 串口通信类
+class SerialController:
+    def __init__(self, events=True):
+        self.ser = serial.Serial()
+        self.ser.timeout = 0.05  # 读线程每次最多阻塞的时间，同时决定超时检查的粒度
+        self.ser.write_timeout = 1
+        # 写线程回传的发送结果和读线程收到的回复；无人取用时（如批处理）传 events=False
+        self.results = queue.SimpleQueue() if events else None
+        self.replies = queue.SimpleQueue() if events else None
+        self.reader = None
+        self.writer = None
+        self.last_error = None  # 最近一次打开串口失败的原因
+        self.lost = threading.Event()  # 读写线程发现串口失效时置位
+        self.hold_on_error = False  # 由 ConnectionManager 置位：失效时保留未完成的指令
+        self.on_write = None  # 写出成功后在写线程中调用 on_write(command)，如示教记录
+        self.instrumentation = None  # 延迟统计，见 instrument()
+        self.framing = None  # 二进制帧编码器，见 binary_protocol.negotiate()
+
+    def open_serial(self, port, baudrate):
+        if not self.ser.is_open:
+            self.ser.port = port
+            self.ser.baudrate = baudrate
+            self.last_error = None
+            self.lost.clear()
+            self.framing = None  # 控制器可能已重启，回到文本模式
+            try:
+                self.ser.open()
+                self.reader = SerialReader(
+                    self.ser, self.replies, self.lost, self.hold_on_error
+                )
+                self.writer = SerialWriter(
+                    self.ser,
+                    self.results,
+                    self.reader,
+                    lost=self.lost,
+                    hold=self.hold_on_error,
+                    on_write=self._written,
+                    instrumentation=self.instrumentation,
+                )
+                self.reader.instrumentation = self.instrumentation
+                self.reader.start()
+                self.writer.start()
+                return True
+            except Exception as e:
+                self.last_error = e
+                return False
+        return False
+
+    def close_serial(self):
+        if self.ser.is_open:
+            if self.writer is not None:
+                self.writer.stop()
+                self.writer.join(timeout=1)
+                self.writer = None
+            if self.reader is not None:
+                self.reader.stop()
+                self.reader.join(timeout=1)
+                self.reader = None
+            self.ser.close()
+            return True
+        return False
+
+    def instrument(self, instrumentation):
+        """开启（传入 Instrumentation）或关闭（传入 None）指令路径的延迟统计，可随时切换"""
+        self.instrumentation = instrumentation
+        for thread in (self.reader, self.writer):
+            if thread is not None:
+                thread.instrumentation = instrumentation
+
+    def set_framing(self, framing):
+        """启用（传入 BinaryFraming）或关闭（传入 None）二进制帧模式"""
+        self.framing = framing
+        if self.writer is not None:
+            self.writer.framing = framing
+
+    def _written(self, command):
+        on_write = self.on_write
+        if on_write is not None:
+            on_write(command)
+
+    def detach(self):
+        """串口失效后关闭串口并取回未完成的指令，不取消也不让它们失败
+
+        返回 (queued, unacked)：queued 为还没写出的 (command, delay, future, timeout)，
+        unacked 为已写出但没有回复的 (command, future)，由调用者决定重发或放弃。
+        """
+        queued, unacked = [], []
+        if self.writer is not None:
+            queued += self.writer.take_queued()
+            self.writer.stop()
+            self.writer.join(timeout=1)
+            queued += self.writer.take_queued()  # 停止前写失败放回的指令
+            self.writer = None
+        if self.reader is not None:
+            unacked = self.reader.take_pending()
+            self.reader.stop()
+            self.reader.join(timeout=1)
+            self.reader = None
+        try:
+            self.ser.close()
+        except Exception:
+            pass  # 设备已拔出时关闭也可能失败
+        return queued, unacked
+
+    def send_command(self, command, delay=0):
+        """指令交给写线程发送，不阻塞界面；实际写出结果从 results 取回"""
+        if self.ser.is_open and self.writer is not None:
+            return self.writer.put(command, delay)
+        return False
+
+    def submit(self, command, delay=0, timeout=DEFAULT_ACK_TIMEOUT):
+        """发送指令并返回 Future，控制器确认后以回复行完成，可用于脚本中串联动作"""
+        future = Future()
+        if not (
+            self.ser.is_open
+            and self.writer is not None
+            and self.writer.put(command, delay, future, timeout)
+        ):
+            future.set_exception(RuntimeError("串口未打开或发送队列已满"))
+        return future
@@ -0,0 +1,74 @@
+import collections
+import logging
+import logging.handlers
+import tkinter as tk
+
+FLUSH_INTERVAL_MS = 33  # 约每帧刷新一次
+DEFAULT_MAX_LINES = 500
+
+
+# 串口信息框日志
+class SerialLog:
+    """串口信息框的有界日志
+
+    文本框最多保留 max_lines 行，旧行自动删除；新消息先进入环形缓冲，
+    每帧最多刷新一次文本框。给出 path 时同时写入按大小轮转的日志文件。
+    """
+
+    def __init__(
+        self,
+        root,
+        text,
+        max_lines=DEFAULT_MAX_LINES,
+        path=None,
+        max_bytes=10 * 1024 * 1024,
+        backup_count=5,
+    ):
+        self.root = root
+        self.text = text
+        self.max_lines = max_lines
+        self._pending = collections.deque(maxlen=max_lines)
+        self._line_count = 0  # 文本框当前行数
+        self._scheduled = False
+        self._logger = None
+        if path:
+            handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            self._logger = logging.getLogger(f"robotarm.serial.{id(self)}")
+            self._logger.propagate = False
+            self._logger.setLevel(logging.INFO)
+            self._logger.addHandler(handler)
+
+    def append(self, message):
+        self._pending.append(message)
+        if self._logger is not None:
+            self._logger.info(message)
+        if not self._scheduled:
+            self._scheduled = True
+            self.root.after(FLUSH_INTERVAL_MS, self.flush)
+
+    def flush(self):
+        """把缓冲的消息一次性写入文本框并删除超出上限的旧行"""
+        self._scheduled = False
+        if not self._pending:
+            return
+        lines = list(self._pending)
+        self._pending.clear()
+
+        self.text.configure(state="normal")
+        self.text.insert(tk.END, "\n".join(lines) + "\n")
+        self._line_count += len(lines) + sum(line.count("\n") for line in lines)
+        excess = self._line_count - self.max_lines
+        if excess > 0:
+            self.text.delete("1.0", f"{excess + 1}.0")
+            self._line_count = self.max_lines
+        self.text.configure(state="disabled")
+        self.text.see(tk.END)  # 自动滚动到最后一行
+
+    def close(self):
+        if self._logger is not None:
+            for handler in self._logger.handlers[:]:
+                handler.close()
+                self._logger.removeHandler(handler)
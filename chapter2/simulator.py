@@ -0,0 +1,363 @@
+"""机械臂控制器模拟器：在伪终端 (pty) 上按 Order 指令格式应答，用于无硬件测试与基准测试
+
+用法：
+    python simulator.py --baudrate 115200 --time-scale 1.0
+启动后打印伪终端路径，在主程序或 batch_runner.py 中把它当作串口打开即可。
+"""
+
+import argparse
+import json
+import math
+import os
+import queue
+import threading
+import time
+import tty
+
+from binary_protocol import FrameDecoder
+from kinematics import Kinematics
+from planner import FULL_JOINT_SPEED_DEG_S, FULL_SPEED_MM_S
+
+JOG_RATE = 10.0  # 按键移动时每秒移动的角度或毫米数
+HOME_JOINTS = (0.0, 0.0, 0.0)
+
+# 有运动时间的指令
+MOTIONS = (
+    "JointAngle",
+    "JointAngleOffset",
+    "DescartesPoint",
+    "DescartesPointOffset",
+    "DescartesLine",
+    "DescartesLinearOffset",
+    "Origin",
+)
+
+
+def parse_command(line):
+    """解析一行指令，返回 (操作码, 参数字符串列表)；兼容文档示例中的全角逗号和结尾逗号"""
+    line = line.strip().replace("，", ",")
+    name, _, rest = line.partition("_")
+    args = [a.strip() for a in rest.split(",") if a.strip()]
+    return name, args
+
+
+# 控制器状态与指令应答
+class ArmSimulator:
+    def __init__(self, time_scale=1.0, kinematics=None):
+        self.time_scale = time_scale  # 运动时间缩放，0 表示立即完成
+        self.kinematics = kinematics or Kinematics()  # 保持关节角与末端坐标一致
+        self.joints = list(HOME_JOINTS)
+        self.xyz = self.kinematics.forward(self.joints).tolist()
+        self.total_speed = 100
+        self.suction = 0
+        self.grasp = 0
+        self.di = [0] * 4
+        self.do = [0] * 4
+        self.steps = {}
+        self.jog = None  # (坐标系, 轴号, 方向, 开始时间)
+
+    def motion_time(self, name, args):
+        """估算一条运动指令的运行时间 (s)"""
+        if name == "Origin":
+            speed = float(args[0]) if args else 100
+            distance = max(abs(a - h) for a, h in zip(self.joints, HOME_JOINTS))
+            rate = FULL_JOINT_SPEED_DEG_S
+        else:
+            values = [float(a) for a in args[:3]]
+            speed = float(args[3])
+            if name.startswith("Joint"):
+                rate = FULL_JOINT_SPEED_DEG_S
+                if name == "JointAngle":
+                    values = [v - j for v, j in zip(values, self.joints)]
+                distance = max(abs(v) for v in values)
+            else:
+                rate = FULL_SPEED_MM_S
+                if name in ("DescartesPoint", "DescartesLine"):
+                    values = [v - p for v, p in zip(values, self.xyz)]
+                distance = math.sqrt(sum(v * v for v in values))
+        speed = max(speed * self.total_speed / 100, 1)
+        return distance / (rate * speed / 100) * self.time_scale
+
+    def handle(self, line):
+        """执行一条指令（运动立即到位），返回应答行列表，不应答的指令返回空列表"""
+        name, args = parse_command(line)
+        handler = getattr(self, "_cmd_" + name, None)
+        if handler is None:
+            return [f"Error: unknown command {line.strip()}"]
+        try:
+            return handler(args)
+        except (IndexError, ValueError) as e:
+            return [f"Error: {name} bad arguments ({e})"]
+
+    def _move_joints(self, name, args, offset):
+        values = [float(a) for a in args[:3]]
+        if offset:
+            values = [j + v for j, v in zip(self.joints, values)]
+        self.joints = values
+        self.xyz = self.kinematics.forward(values).tolist()
+        a1, a2, a3 = self.joints
+        return [f"{name}: {a1:f}(A1), {a2:f}(A2), {a3:f}(A3)"]
+
+    def _move_xyz(self, name, args, offset):
+        values = [float(a) for a in args[:3]]
+        if offset:
+            values = [p + v for p, v in zip(self.xyz, values)]
+        joints = self.kinematics.inverse_point(*values)
+        if joints is None:
+            return [f"Error: {name} target unreachable"]
+        self.xyz = values
+        self.joints = list(joints)
+        x, y, z = self.xyz
+        return [f"{name}: {x:f}mm(X), {y:f}mm(Y), {z:f}mm(Z)"]
+
+    def _cmd_JointAngle(self, args):
+        return self._move_joints("JointAngle", args, False)
+
+    def _cmd_JointAngleOffset(self, args):
+        return self._move_joints("JointAngleOffset", args, True)
+
+    def _cmd_DescartesPoint(self, args):
+        return self._move_xyz("DescartesPoint", args, False)
+
+    def _cmd_DescartesPointOffset(self, args):
+        return self._move_xyz("DescartesPointOffset", args, True)
+
+    def _cmd_DescartesLine(self, args):
+        return self._move_xyz("DescartesLine", args, False)
+
+    def _cmd_DescartesLinearOffset(self, args):
+        return self._move_xyz("DescartesLinearOffset", args, True)
+
+    def _cmd_Origin(self, args):
+        self.joints = list(HOME_JOINTS)
+        self.xyz = self.kinematics.forward(self.joints).tolist()
+        return ["Origin: 3 motors return origin OK"]
+
+    def _cmd_Stop(self, args):
+        self.jog = None
+        return ["Stop: 3 motors stop"]
+
+    def _cmd_Speed(self, args):
+        self.total_speed = int(args[0])
+        return [f"Total_Speed: {self.total_speed:03d}%"]
+
+    def _cmd_Suction(self, args):
+        self.suction = int(args[0])
+        return [f"Suction: {self.suction}"]
+
+    def _cmd_Grasp(self, args):
+        self.grasp = int(args[0])
+        return [f"Grasp: {self.grasp}"]
+
+    def _cmd_DI(self, args):
+        pin, state = int(args[0]), int(args[1])
+        self.di[pin] = state
+        return [f"DI{pin}: {state}"]
+
+    def _cmd_DO(self, args):
+        pin, state = int(args[0]), int(args[1])
+        self.do[pin] = state
+        return [f"DO{pin}: {state}"]
+
+    def _cmd_SetStep(self, args):
+        step, kind = int(args[2]), int(args[3])
+        self.steps[step] = args
+        names = {
+            1: "SetJointAngle",
+            2: "SetJointAngleOffset",
+            3: "SetDescartesPoint",
+            4: "SetDescartesPointOffset",
+            5: "SetDescartesLine",
+            6: "SetDescartesLinearOffset",
+        }
+        if kind in names:
+            x, y, z, speed, delay = (float(a) for a in args[4:9])
+            unit = "" if kind <= 2 else "mm"
+            axes = ("A1", "A2", "A3") if kind <= 2 else ("X", "Y", "Z")
+            coords = ", ".join(f"{v:f}{unit}({a})" for v, a in zip((x, y, z), axes))
+            return [
+                f"{step:02d}th Step -- {names[kind]}:{coords}; "
+                f"Speed:{int(speed):03d}%; Delay:{int(delay)}ms"
+            ]
+        return [
+            f"{step:02d}th Step -- Device0(0:Suction; 1:Grasp):0(0:OFF; 1:ON); Delay:0ms"
+        ]
+
+    def _cmd_SetStepOK(self, args):
+        return [f"SetStepOK: Set step to {int(args[0])}th program recipe"]
+
+    def _cmd_Clean(self, args):
+        self.steps.clear()
+        return [f"Clean: {int(args[0])}th program recipe"]
+
+    def _cmd_Editor(self, args):
+        return [f"Editor: {int(args[0])}th program recipe"]
+
+    def _cmd_MovStart(self, args):
+        self.jog = (int(args[0]), int(args[1]), int(args[2]), time.monotonic())
+        return []
+
+    def _cmd_MovStp(self, args):
+        if self.jog is not None:
+            frame, axis, direction, started = self.jog
+            # 关节坐标系正方向为 1；世界坐标系正方向为 0（与主程序中的按键约定一致）
+            positive = direction == 1 if frame == 0 else direction == 0
+            delta = JOG_RATE * (time.monotonic() - started) * (1 if positive else -1)
+            if frame == 0:
+                self.joints[axis - 1] += delta
+                self.xyz = self.kinematics.forward(self.joints).tolist()
+            else:
+                xyz = list(self.xyz)
+                xyz[axis - 1] += delta
+                joints = self.kinematics.inverse_point(*xyz)
+                if joints is not None:
+                    self.xyz = xyz
+                    self.joints = list(joints)
+            self.jog = None
+        return []
+
+    def _cmd_Binary(self, args):
+        # 帧与文本按首字节区分，始终都能接收，这里只确认支持
+        return [f"Binary: {int(args[0])}"]
+
+    def _cmd_Infor(self, args):
+        return [
+            json.dumps(
+                {
+                    "joints": self.joints,
+                    "xyz": self.xyz,
+                    "speed": self.total_speed,
+                    "suction": self.suction,
+                    "grasp": self.grasp,
+                    "di": self.di,
+                    "do": self.do,
+                },
+                separators=(",", ":"),
+            )
+        ]
+
+
+# 伪终端上的模拟控制器
+class PtySimulator:
+    """在 pty 主端运行 ArmSimulator，从端路径 port 可以像真实串口一样打开
+
+    baudrate 不为 None 时按每字节 10 位（起始位 + 8 数据位 + 停止位）模拟线路传输时间。
+    输入可以是文本行，也可以是 binary_protocol 的二进制帧，帧中的每条指令与文本指令同样处理。
+    急停、按键松开和状态查询在读线程中立即处理，其余指令按顺序执行并在运动时间结束后应答。
+    """
+
+    def __init__(self, time_scale=1.0, baudrate=None):
+        self.arm = ArmSimulator(time_scale)
+        self.baudrate = baudrate
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self._commands = queue.SimpleQueue()  # (指令, 入队时的急停计数)
+        self._stop_cond = threading.Condition()
+        self._stop_count = 0
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()  # 保护 arm 状态
+        self._running = True
+        self._threads = [
+            threading.Thread(target=self._read_loop, name="SimReader", daemon=True),
+            threading.Thread(target=self._exec_loop, name="SimExecutor", daemon=True),
+        ]
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def close(self):
+        self._running = False
+        self._commands.put((None, 0))
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def _line_time(self, size):
+        return size * 10 / self.baudrate if self.baudrate else 0
+
+    def _write(self, lines):
+        data = "".join(line + "\r\n" for line in lines).encode()
+        with self._write_lock:
+            time.sleep(self._line_time(len(data)))
+            try:
+                os.write(self.master, data)
+            except OSError:
+                pass
+
+    def _read_loop(self):
+        decoder = FrameDecoder()
+        while self._running:
+            try:
+                data = os.read(self.master, 4096)
+            except OSError:
+                break
+            if not data:
+                break
+            time.sleep(self._line_time(len(data)))
+            for kind, value in decoder.feed(data):
+                if kind == "error":
+                    self._write([f"Error: {value}"])
+                    continue
+                line = value if kind == "text" else str(value)
+                name, _ = parse_command(line)
+                if name in ("Stop", "MovStp", "Infor"):
+                    # 急停打断正在执行的运动，并作废急停前收到的待执行指令；
+                    # 状态查询不排在运动后面，运动过程中也立即应答
+                    if name == "Stop":
+                        with self._stop_cond:
+                            self._stop_count += 1
+                            self._stop_cond.notify_all()
+                    with self._lock:
+                        self._write(self.arm.handle(line))
+                else:
+                    self._commands.put((line, self._stop_count))
+
+    def _exec_loop(self):
+        while self._running:
+            line, stop_count = self._commands.get()
+            if line is None:
+                return
+            name, args = parse_command(line)
+            if name in MOTIONS:
+                with self._lock:
+                    try:
+                        duration = self.arm.motion_time(name, args)
+                    except (IndexError, ValueError):
+                        duration = 0
+            else:
+                duration = 0
+            with self._stop_cond:
+                if self._stop_cond.wait_for(
+                    lambda: self._stop_count != stop_count, timeout=duration
+                ):
+                    continue  # 被急停作废或打断，不再应答
+            with self._lock:
+                self._write(self.arm.handle(line))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="机械臂控制器模拟器")
+    parser.add_argument("--baudrate", type=int, default=None, help="模拟线路速率")
+    parser.add_argument(
+        "--time-scale", type=float, default=1.0, help="运动时间缩放，0 为立即完成"
+    )
+    args = parser.parse_args(argv)
+
+    sim = PtySimulator(args.time_scale, args.baudrate).start()
+    print(f"模拟器已启动: {sim.port}", flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sim.close()
+
+
+if __name__ == "__main__":
+    main()
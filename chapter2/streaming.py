@@ -0,0 +1,112 @@
+import collections
+import threading
+
+from serial_io import DEFAULT_ACK_TIMEOUT
+
+
+class StreamError(Exception):
+    """流式发送中断，index 为第一条没有得到确认的指令序号"""
+
+    def __init__(self, index, command, error):
+        super().__init__(f"第 {index} 条指令 {str(command).strip()} 失败: {error}")
+        self.index = index
+        self.command = command
+        self.error = error
+
+
+# 流式发送
+class CommandStreamer:
+    """在 SerialController 上保持多条指令在途，收到确认后立即补发下一条
+
+    window 限制在途指令条数；rx_buffer 不为 None 时，另外按字节数限制在途数据，
+    与 grbl 的字符计数方式相同，保证控制器接收缓冲区不会溢出。
+    """
+
+    def __init__(
+        self, controller, window=4, rx_buffer=None, timeout=DEFAULT_ACK_TIMEOUT
+    ):
+        self.controller = controller
+        self.window = window
+        self.rx_buffer = rx_buffer
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._aborted = False
+
+    def abort(self):
+        """停止补发，已经在途的指令不受影响"""
+        with self._cond:
+            self._aborted = True
+            self._cond.notify_all()
+
+    def stream(self, commands, on_ack=None):
+        """按顺序发送 commands 中的指令，返回得到确认的条数
+
+        commands 可以是任意可迭代对象（包括生成器），只会按需取用。
+        on_ack(index, command, reply) 在每条指令按顺序确认后调用，运行在调用者线程。
+        任一指令失败时停止补发并抛出 StreamError；commands 自身抛出的异常
+        在已发出的指令确认完后原样抛出。
+        """
+        self._aborted = False
+        in_flight = collections.deque()  # (index, command, future, size)
+        in_flight_bytes = 0
+        acked = 0
+
+        def release(_future):
+            with self._cond:
+                self._cond.notify_all()
+
+        def reap():
+            nonlocal in_flight_bytes, acked
+            # 按发送顺序确认，保证 on_ack 的顺序与文件顺序一致
+            while in_flight and in_flight[0][2].done():
+                index, command, future, size = in_flight.popleft()
+                in_flight_bytes -= size
+                try:
+                    reply = future.result()
+                except BaseException as e:
+                    raise StreamError(index, command, e) from e
+                acked += 1
+                if on_ack is not None:
+                    on_ack(index, command, reply)
+
+        def has_credit(size):
+            if len(in_flight) >= self.window:
+                return False
+            if self.rx_buffer is None or not in_flight:
+                return True
+            return in_flight_bytes + size <= self.rx_buffer
+
+        def drain():
+            while in_flight:
+                reap()
+                with self._cond:
+                    if in_flight and not in_flight[0][2].done():
+                        self._cond.wait(timeout=0.1)
+
+        try:
+            for index, command in enumerate(commands):
+                size = len(command.encode())
+                while True:
+                    reap()
+                    with self._cond:
+                        if self._aborted:
+                            return acked
+                        if has_credit(size):
+                            break
+                        # 在锁内检查，避免错过确认回调的通知
+                        if not in_flight[0][2].done():
+                            self._cond.wait(timeout=0.1)
+                future = self.controller.submit(command, timeout=self.timeout)
+                in_flight.append((index, command, future, size))
+                in_flight_bytes += size
+                future.add_done_callback(release)
+        except StreamError:
+            raise
+        except Exception:
+            # 指令来源出错（如作业文件格式错误）时，先等已发出的指令确认完再抛出
+            drain()
+            raise
+
+        # 等待最后几条指令确认
+        drain()
+        return acked
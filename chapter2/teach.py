@@ -0,0 +1,281 @@
+"""示教记录与回放
+
+TeachRecorder 挂在 SerialController.on_write 上，把每条实际写出的指令连同时间戳追加到
+会话文件（JSONL，每行 {"t": 秒, "command": "..."}，也可以直接交给 batch_runner.py 执行）。
+
+回放时 plan_replay() 先简化会话：
+    - 连续的 Speed_ 只保留最后一条，与当前速度相同的 Speed_ 去掉；
+    - 速度相同的连续 DescartesLinearOffset_ 视为一条折线，用 Ramer–Douglas–Peucker
+      算法去掉偏离不超过 tolerance (mm) 的中间点，共线的小段合并为一段；
+然后按确认流式发送，不再重复手动操作时的停顿。按键点动 (MovStart_/MovStp) 无法换算成
+位置，按记录的持续时间原样回放；急停和状态查询不回放。
+
+用法：
+    python teach.py session.jsonl --port /dev/ttyUSB0
+    python teach.py session.jsonl --dry-run
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+
+import numpy as np
+
+import commands
+from serial_io import DEFAULT_ACK_TIMEOUT, SerialController
+from streaming import CommandStreamer, StreamError
+
+DEFAULT_TOLERANCE = 0.5  # 合并直线段时允许的最大偏差 (mm)
+NOT_RECORDED = ("Infor",)  # 状态查询（遥测）不改变机械臂状态
+NOT_REPLAYED = ("Stop", "Infor")
+JOG_COMMANDS = ("MovStart", "MovStp")
+
+
+class TeachRecorder:
+    """把写出的指令记录到会话文件，记录在串口写线程中进行"""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = None
+        self._controller = None
+        self._started = None
+        self._lock = threading.Lock()
+
+    def start(self, controller):
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._started = time.monotonic()
+        self._controller = controller
+        controller.on_write = self.record
+
+    def stop(self):
+        if self._controller is not None:
+            self._controller.on_write = None
+            self._controller = None
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def record(self, command):
+        if isinstance(command, str):
+            # 界面手动输入的文本指令；无法解析的不记录，以免会话文件无法加载
+            try:
+                command = commands.from_text(command)
+            except ValueError:
+                return
+        if command.opcode in NOT_RECORDED:
+            return
+        t = time.monotonic() - self._started
+        line = json.dumps({"t": round(t, 3), "command": str(command)})
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+                self._file.flush()  # 示教过程中断电也不丢失已记录的指令
+                self.count += 1
+
+
+def load_session(path):
+    """读取会话文件，返回 [(t, 指令对象)]"""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                item = json.loads(line)
+                entries.append(
+                    (float(item.get("t", 0)), commands.from_text(item["command"]))
+                )
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"第 {line_no} 行格式错误: {e}") from e
+    return entries
+
+
+def rdp(points, tolerance):
+    """Ramer–Douglas–Peucker 折线简化，points 为 (N, 3)，返回保留点的下标（含首尾）"""
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = points[first], points[last]
+        chord = end - start
+        length = np.linalg.norm(chord)
+        inner = points[first + 1 : last] - start
+        if length == 0:
+            distance = np.linalg.norm(inner, axis=1)
+        else:
+            distance = np.linalg.norm(np.cross(inner, chord), axis=1) / length
+        index = int(np.argmax(distance))
+        if distance[index] > tolerance:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)
+
+
+def merge_linear_offsets(run, tolerance):
+    """合并一段速度相同的 DescartesLinearOffset_，返回新的指令列表"""
+    offsets = np.array([(c.x, c.y, c.z) for c in run])
+    points = np.vstack([np.zeros(3), np.cumsum(offsets, axis=0)])
+    kept = points[rdp(points, tolerance)]
+    merged = np.diff(kept, axis=0)
+    if np.abs(merged).max() > commands.COORD_LIMIT:
+        return list(run)
+    speed = run[0].speed
+    return [commands.DescartesLinearOffset(x, y, z, speed) for x, y, z in merged]
+
+
+def plan_replay(entries, simplify=True, tolerance=DEFAULT_TOLERANCE):
+    """会话记录 -> [(指令, 保持秒数)]，保持秒数只对按键点动的 MovStart_ 非零"""
+    plan = []
+    for i, (t, command) in enumerate(entries):
+        if command.opcode in NOT_REPLAYED:
+            continue
+        hold = 0.0
+        if command.opcode == "MovStart" and i + 1 < len(entries):
+            hold = max(entries[i + 1][0] - t, 0.0)
+        plan.append((command, hold))
+    if not simplify:
+        return plan
+
+    # 连续的 Speed_ 只保留最后一条，再去掉与当前速度相同的
+    collapsed = []
+    for item in plan:
+        if (
+            collapsed
+            and item[0].opcode == "Speed"
+            and collapsed[-1][0].opcode == "Speed"
+        ):
+            collapsed[-1] = item
+        else:
+            collapsed.append(item)
+    result = []
+    speed = None
+    run = []
+
+    def flush():
+        if run:
+            result.extend((c, 0.0) for c in merge_linear_offsets(run, tolerance))
+            run.clear()
+
+    for command, hold in collapsed:
+        if command.opcode == "Speed":
+            if command.value == speed:
+                continue
+            speed = command.value
+        if command.opcode == "DescartesLinearOffset":
+            if run and command.speed != run[0].speed:
+                flush()
+            run.append(command)
+            continue
+        flush()
+        result.append((command, hold))
+    flush()
+    return result
+
+
+class Replayer:
+    """回放 plan_replay() 的结果
+
+    普通指令按确认流式发送；遇到按键点动时先等已发出的指令确认完，
+    再按记录的时长保持 MovStart_。abort() 可在其他线程中调用。
+    """
+
+    def __init__(self, controller, window=4, timeout=DEFAULT_ACK_TIMEOUT):
+        self.controller = controller
+        self._streamer = CommandStreamer(controller, window=window, timeout=timeout)
+        self._aborted = threading.Event()
+
+    def abort(self):
+        self._aborted.set()
+        self._streamer.abort()
+
+    def run(self, plan, on_ack=None):
+        """返回发出并确认的指令数；失败时抛出 StreamError
+
+        on_ack(command, reply) 在每条流式指令确认后调用。
+        """
+        self._aborted.clear()
+        done = 0
+        index = 0
+        while index < len(plan) and not self._aborted.is_set():
+            command, hold = plan[index]
+            if command.opcode in JOG_COMMANDS:
+                self.controller.send_command(command)
+                if hold:
+                    self._aborted.wait(hold)
+                done += 1
+                index += 1
+                continue
+            # 一直流式发送到下一条点动指令
+            end = index
+            while end < len(plan) and plan[end][0].opcode not in JOG_COMMANDS:
+                end += 1
+            done += self._streamer.stream(
+                (c for c, _ in plan[index:end]),
+                on_ack and (lambda i, c, reply: on_ack(c, reply)),
+            )
+            index = end
+        if self._aborted.is_set():
+            self.controller.send_command(commands.MOV_STP)  # 可能停在点动保持中
+        return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="回放示教会话")
+    parser.add_argument("session", help="示教记录的会话文件 (JSONL)")
+    parser.add_argument("--port", default="/dev/ttyUSB0")
+    parser.add_argument("--baudrate", type=int, default=115200)
+    parser.add_argument("--window", type=int, default=4, help="同时在途的指令数")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_ACK_TIMEOUT)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help="合并直线段的最大偏差 (mm)",
+    )
+    parser.add_argument("--no-simplify", action="store_true", help="按原样回放")
+    parser.add_argument("--dry-run", action="store_true", help="只打印回放的指令")
+    args = parser.parse_args(argv)
+
+    try:
+        entries = load_session(args.session)
+    except (OSError, ValueError) as e:
+        print(f"无法读取会话: {e}", file=sys.stderr)
+        return 1
+    plan = plan_replay(entries, not args.no_simplify, args.tolerance)
+    print(f"会话 {len(entries)} 条指令，回放 {len(plan)} 条", file=sys.stderr)
+    if args.dry_run:
+        for command, hold in plan:
+            print(f"{command}  # 保持 {hold:.3f}s" if hold else command)
+        return 0
+
+    controller = SerialController(events=False)
+    if not controller.open_serial(args.port, args.baudrate):
+        print(f"无法打开串口: {controller.last_error}", file=sys.stderr)
+        return 2
+    try:
+        started = time.monotonic()
+        count = Replayer(controller, args.window, args.timeout).run(plan)
+    except StreamError as e:
+        print(f"回放中断: {e}", file=sys.stderr)
+        return 1
+    finally:
+        controller.close_serial()
+    print(
+        f"回放完成，{count} 条指令，用时 {time.monotonic() - started:.1f} 秒",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""机械臂状态遥测：按固定频率查询 Infor，样本存入预分配的 NumPy 环形缓冲
+
+查询经串口写线程发出，回复在读线程中解析并写入缓冲，界面线程只取快照绘图。
+同一时刻最多一条 Infor 在途，控制器或链路忙时实际采样率自动降低，不会堆积查询。
+样本可以追加写入紧凑的二进制文件（每条 32 字节），之后用 load_samples() 内存映射读取：
+
+    samples = load_samples("run.bin")
+    cycle = np.diff(samples["t"])
+"""
+
+import json
+import threading
+import time
+
+import numpy as np
+
+import commands
+
+# 时间戳 (s, Unix 时间)、关节角 (°)、末端坐标 (mm)
+SAMPLE_DTYPE = np.dtype([("t", "<f8"), ("joints", "<f4", (3,)), ("xyz", "<f4", (3,))])
+DEFAULT_RATE = 10.0  # 采样频率 (Hz)
+DEFAULT_CAPACITY = 36000  # 默认频率下保留一小时
+DEFAULT_TIMEOUT = 1.0  # 等待 Infor 回复的秒数
+
+# Infor 返回的 JSON 中可能的字段名
+_JOINT_KEYS = ("joints", "joint", "angles")
+_JOINT_FIELDS = ("A1", "A2", "A3")
+_XYZ_KEYS = ("xyz", "position", "pos")
+_XYZ_FIELDS = ("X", "Y", "Z")
+
+
+def _vector(data, keys, fields):
+    for key in keys:
+        if key in data:
+            return [float(v) for v in data[key][:3]]
+    if all(field in data for field in fields):
+        return [float(data[field]) for field in fields]
+    return None
+
+
+def parse_infor(line):
+    """解析 Infor 回复，返回 (joints, xyz)，缺少的一项为 None；不是有效回复时返回 None"""
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    try:
+        joints = _vector(data, _JOINT_KEYS, _JOINT_FIELDS)
+        xyz = _vector(data, _XYZ_KEYS, _XYZ_FIELDS)
+    except (TypeError, ValueError):
+        return None
+    if joints is None and xyz is None:
+        return None
+    return joints, xyz
+
+
+def load_samples(path, mmap=True):
+    """读取 TelemetryPoller 记录的二进制文件，默认以只读内存映射方式打开"""
+    if mmap:
+        return np.memmap(path, dtype=SAMPLE_DTYPE, mode="r")
+    return np.fromfile(path, dtype=SAMPLE_DTYPE)
+
+
+def decimate(t, y, buckets):
+    """按时间分成 buckets 段，每段保留最小值和最大值，保证尖峰在抽稀后仍然可见
+
+    返回 (t, y)，长度最多为 2 * buckets；NaN 被忽略。
+    """
+    if len(t) <= 2 * buckets:
+        return t, y
+    edges = np.linspace(t[0], t[-1], buckets + 1)[1:-1]
+    starts = np.unique(np.concatenate(([0], np.searchsorted(t, edges))))
+    low = np.fmin.reduceat(y, starts)
+    high = np.fmax.reduceat(y, starts)
+    return np.repeat(t[starts], 2), np.column_stack([low, high]).ravel()
+
+
+class SampleRing:
+    """定长环形缓冲，写满后覆盖最旧的样本，线程安全"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=SAMPLE_DTYPE)
+        self._next = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, t, joints, xyz):
+        with self._lock:
+            sample = self._data[self._next]
+            sample["t"] = t
+            sample["joints"] = joints
+            sample["xyz"] = xyz
+            self._next = (self._next + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+            return self._data[self._next - 1 : self._next or None].copy()
+
+    def clear(self):
+        with self._lock:
+            self._next = 0
+            self._count = 0
+
+    def snapshot(self, last=None):
+        """按时间顺序返回最近 last 个样本（副本）"""
+        with self._lock:
+            count = self._count if last is None else min(last, self._count)
+            start = self._next - count
+            if start >= 0:
+                return self._data[start : self._next].copy()
+            return np.concatenate((self._data[start:], self._data[: self._next]))
+
+    def save(self, path):
+        """把当前缓冲的样本写入二进制文件，可用 load_samples() 读取"""
+        self.snapshot().tofile(path)
+
+
+class TelemetryPoller(threading.Thread):
+    """定时发送 Infor 并记录回复
+
+    kinematics 不为 None 时，用正/逆解补全回复中缺少的关节角或末端坐标；
+    给出 path 时每个样本同时追加写入该文件。
+    """
+
+    def __init__(
+        self,
+        controller,
+        ring=None,
+        rate=DEFAULT_RATE,
+        timeout=DEFAULT_TIMEOUT,
+        kinematics=None,
+        path=None,
+    ):
+        super().__init__(name="TelemetryPoller", daemon=True)
+        if rate <= 0:
+            raise ValueError("采样频率必须大于 0")
+        self.controller = controller
+        self.ring = ring if ring is not None else SampleRing()
+        self.period = 1.0 / rate
+        self.timeout = timeout
+        self.kinematics = kinematics
+        self.sent = 0
+        self.received = 0
+        self.failed = 0
+        self._file = open(path, "ab") if path else None
+        self._in_flight = None
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        deadline = time.monotonic()
+        try:
+            while not self._stop_event.is_set():
+                if self.controller.ser.is_open and (
+                    self._in_flight is None or self._in_flight.done()
+                ):
+                    self._in_flight = self.controller.submit(
+                        commands.INFOR, timeout=self.timeout
+                    )
+                    self._in_flight.add_done_callback(self._on_reply)
+                    self.sent += 1
+                # 按绝对时间安排下一次查询，避免误差累积
+                deadline += self.period
+                delay = deadline - time.monotonic()
+                if delay < 0:
+                    deadline = time.monotonic()
+                    delay = 0
+                self._stop_event.wait(delay)
+        finally:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _on_reply(self, future):
+        # 在串口读线程中执行，只做解析和写缓冲
+        now = time.time()
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+            return
+        state = parse_infor(future.result())
+        if state is None:
+            self.failed += 1
+            return
+        joints, xyz = state
+        if self.kinematics is not None:
+            if xyz is None:
+                xyz = self.kinematics.forward(joints).tolist()
+            elif joints is None:
+                joints = self.kinematics.inverse_point(*xyz)
+        nan = (float("nan"),) * 3
+        sample = self.ring.append(now, joints or nan, xyz or nan)
+        self.received += 1
+        file = self._file
+        if file is not None:
+            try:
+                file.write(sample.tobytes())
+            except (OSError, ValueError):
+                pass  # 文件已在停止时关闭
@@ -0,0 +1,73 @@
+import numpy as np
+
+from telemetry import decimate
+
+REDRAW_INTERVAL_MS = 200  # 绘图刷新间隔，与采样频率无关
+DEFAULT_SECONDS = 30.0  # 显示最近的时长 (s)
+COLORS = ("#d62728", "#2ca02c", "#1f77b4")  # X/A1, Y/A2, Z/A3
+MARGIN = 4
+
+
+# 遥测曲线
+class TelemetryPlot:
+    """在 Canvas 上绘制环形缓冲中最近 seconds 秒的末端坐标或关节角
+
+    每次刷新只按画布宽度抽稀后更新三条折线的坐标，不重建图元，
+    数据量再大，绘制开销也只与画布宽度有关。
+    """
+
+    def __init__(self, root, canvas, ring, field="xyz", seconds=DEFAULT_SECONDS):
+        self.root = root
+        self.canvas = canvas
+        self.ring = ring
+        self.field = field  # "xyz" 或 "joints"
+        self.seconds = seconds
+        self._lines = [
+            canvas.create_line(0, 0, 0, 0, fill=color, width=1) for color in COLORS
+        ]
+        self._label = canvas.create_text(
+            MARGIN, MARGIN, anchor="nw", font=("TkDefaultFont", 8)
+        )
+        self._job = None
+
+    def start(self):
+        if self._job is None:
+            self._redraw()
+
+    def stop(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+
+    def _redraw(self):
+        self._job = self.root.after(REDRAW_INTERVAL_MS, self._redraw)
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        samples = self.ring.snapshot()
+        if len(samples) < 2 or width < 10 or height < 10:
+            return
+        t = samples["t"]
+        samples = samples[t >= t[-1] - self.seconds]
+        t = samples["t"]
+        values = samples[self.field].astype(float)
+        low, high = np.nanmin(values), np.nanmax(values)
+        if not np.isfinite(low):
+            return
+        span = max(high - low, 1e-6)
+        t0 = t[-1] - self.seconds
+
+        for i, line in enumerate(self._lines):
+            ts, ys = decimate(t, values[:, i], width // 2)
+            keep = np.isfinite(ys)
+            if keep.sum() < 2:
+                continue
+            xs = MARGIN + (ts[keep] - t0) / self.seconds * (width - 2 * MARGIN)
+            ys = height - MARGIN - (ys[keep] - low) / span * (height - 2 * MARGIN)
+            self.canvas.coords(line, *np.column_stack([xs, ys]).ravel().tolist())
+
+        last = values[-1]
+        self.canvas.itemconfigure(
+            self._label,
+            text=f"{low:.1f} ~ {high:.1f}   当前 "
+            + ", ".join(f"{v:.1f}" for v in last),
+        )
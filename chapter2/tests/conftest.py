@@ -0,0 +1,79 @@
+import os
+import select
+import time
+import tty
+
+import pytest
+
+from serial_io import SerialController
+from simulator import PtySimulator
+
+
+@pytest.fixture
+def simulator():
+    sim = PtySimulator(time_scale=0.01)
+    sim.start()
+    yield sim
+    sim.close()
+
+
+@pytest.fixture
+def controller(simulator):
+    controller = SerialController(events=False)
+    assert controller.open_serial(simulator.port, 115200)
+    yield controller
+    controller.close_serial()
+
+
+class ScriptedDevice:
+    """由测试扮演控制器的伪终端：读取主机写出的字节，回复由测试逐条写入"""
+
+    def __init__(self):
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+        self._buffer = b""
+
+    def _fill(self, deadline, done):
+        while not done():
+            ready, _, _ = select.select([self.master], [], [], 0.05)
+            if ready:
+                self._buffer += os.read(self.master, 4096)
+            elif time.monotonic() > deadline:
+                raise TimeoutError(f"没有收到期望的数据: {self._buffer!r}")
+
+    def read(self, size, timeout=2.0):
+        """读取恰好 size 个字节"""
+        self._fill(time.monotonic() + timeout, lambda: len(self._buffer) >= size)
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def read_line(self, timeout=2.0):
+        self._fill(time.monotonic() + timeout, lambda: b"\n" in self._buffer)
+        line, _, self._buffer = self._buffer.partition(b"\n")
+        return line.decode()
+
+    def reply(self, *lines):
+        os.write(self.master, "".join(line + "\r\n" for line in lines).encode())
+
+    def close(self):
+        for fd in (self.master, self.slave):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+@pytest.fixture
+def device():
+    device = ScriptedDevice()
+    yield device
+    device.close()
+
+
+@pytest.fixture
+def device_controller(device):
+    controller = SerialController(events=False)
+    assert controller.open_serial(device.port, 115200)
+    yield controller
+    controller.close_serial()
@@ -0,0 +1,76 @@
+import pytest
+
+import commands
+from binary_protocol import SYNC, BinaryFraming, FrameDecoder
+from serial_io import AckError
+
+
+def test_frames_and_text_round_trip():
+    decoder = FrameDecoder()
+    command = commands.DescartesLine(200, 0, 150, 100)
+    items = decoder.feed(BinaryFraming().frame([command]) + b"Infor\n")
+    assert [(kind, str(value)) for kind, value in items] == [
+        ("command", str(command)),
+        ("text", "Infor"),
+    ]
+
+
+def test_stop_after_corrupted_length_is_not_swallowed():
+    decoder = FrameDecoder()
+    frame = bytearray(BinaryFraming().frame([commands.DescartesLine(1, 2, 3, 50)]))
+    frame[1] = 0xFF  # LEN 损坏，解码器会等待 255 字节
+    assert decoder.feed(bytes(frame[:8])) == []
+    assert decoder.feed(b"Stop\n") == [("error", "frame truncated"), ("text", "Stop")]
+
+
+def test_stop_after_garbage_is_split_out():
+    decoder = FrameDecoder()
+    frame = bytearray(BinaryFraming().frame([commands.DescartesLine(1, 2, 3, 50)]))
+    frame[-1] ^= 0xFF  # CRC 错误，剩余字节成为乱码
+    items = decoder.feed(bytes(frame) + b"MovStp\n")
+    assert items[0] == ("error", "frame crc")
+    assert items[-1] == ("text", "MovStp")
+
+
+def test_partial_frame_expires():
+    now = [0.0]
+    decoder = FrameDecoder(timeout=0.5, clock=lambda: now[0])
+    assert decoder.feed(bytes((SYNC, 40, 1, 2))) == []
+    now[0] = 0.4
+    assert decoder.feed(bytes((3, 4))) == []  # 陆续到达的字节不重新计时
+    now[0] = 0.6
+    assert decoder.feed(b"Speed_50\n") == [
+        ("error", "frame truncated"),
+        ("text", "Speed_50"),
+    ]
+
+
+def test_corrupted_multi_record_frame_is_skipped_without_text():
+    decoder = FrameDecoder()
+    framing = BinaryFraming()
+    moves = [commands.DescartesLinearOffset(i + 1, 0, 0, 50) for i in range(3)]
+    frame = bytearray(framing.frame(moves))
+    frame[20] = 0x0A  # 第二条记录损坏，恰好成为换行
+    good = commands.DescartesLine(200, 0, 150, 100)
+    items = decoder.feed(bytes(frame) + framing.frame([good]) + b"Speed_50\n")
+    assert [(kind, str(value)) for kind, value in items] == [
+        ("error", "frame crc"),
+        ("command", str(good)),
+        ("text", "Speed_50"),
+    ]
+
+
+def test_frame_error_fails_every_command_in_the_frame(device, device_controller):
+    device_controller.set_framing(BinaryFraming())
+    moves = [commands.DescartesLinearOffset(i + 1, 0, 0, 50) for i in range(3)]
+    with device_controller.writer._cond:  # 三条一起入队，合并为一帧
+        futures = [device_controller.submit(move, timeout=5) for move in moves]
+    frame = BinaryFraming().frame(moves)
+    assert device.read(len(frame)) == frame
+    later = device_controller.submit(commands.DescartesLine(200, 0, 150, 100))
+    assert device.read(2)[0] == SYNC
+    device.reply("Error: frame crc")
+    for future in futures:
+        with pytest.raises(AckError, match="frame crc"):
+            future.result(2)
+    assert not later.done()  # 下一帧不受影响
@@ -0,0 +1,112 @@
+import queue
+import time
+import types
+
+import pytest
+
+import commands
+from binary_protocol import request_binary
+from connection import ConnectionManager
+from serial_io import ConnectionLost, SerialController
+
+
+class MovingPort:
+    """代替 PortScanner：断线后适配器以新的设备名出现（如 ttyUSB0 -> ttyUSB1）"""
+
+    def __init__(self):
+        self.device = None
+
+    def cached(self):
+        return []
+
+    def devices(self, max_age=None):
+        return []
+
+    def find(self, identity, max_age=None):
+        if self.device is None:
+            return None
+        return types.SimpleNamespace(device=self.device)
+
+
+def wait_event(events, text, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    seen = []
+    while time.monotonic() < deadline:
+        try:
+            seen.append(events.get(timeout=0.05))
+        except queue.Empty:
+            continue
+        if text in seen[-1]:
+            return seen[-1]
+    raise AssertionError(f"没有等到 {text!r}: {seen}")
+
+
+def connect(device, policy):
+    controller = SerialController(events=False)
+    scanner = MovingPort()
+    manager = ConnectionManager(
+        controller, policy=policy, scanner=scanner, poll_interval=0.02
+    )
+    manager.start()
+    assert manager.open(device.port, 115200)
+    return manager, scanner
+
+
+@pytest.fixture
+def managers():
+    started = []
+    yield started
+    for manager in started:
+        manager.stop()
+        manager.close()
+
+
+def send_and_unplug(device, controller):
+    """发出一条绝对位置和一条偏移指令，控制器不回复就断开"""
+    absolute = controller.submit(commands.JointAngle(0, 10, 10, 100))
+    offset = controller.submit(commands.DescartesLinearOffset(5, 0, 0, 100))
+    assert device.read_line() == "JointAngle_0,10,10,100"
+    assert device.read_line() == "DescartesLinearOffset_5,0,0,100"
+    device.close()
+    return absolute, offset
+
+
+def test_replay_resends_only_idempotent_moves(device, simulator, managers):
+    manager, scanner = connect(device, "replay")
+    managers.append(manager)
+    absolute, offset = send_and_unplug(device, manager.controller)
+    wait_event(manager.events, "正在重连")
+    assert not absolute.done() and not offset.done()  # 断线期间保留，等待重连
+    scanner.device = simulator.port
+    wait_event(manager.events, "已重新连接")
+    assert absolute.result(2).startswith("JointAngle")
+    with pytest.raises(ConnectionLost):
+        offset.result(2)  # 不确定是否已执行，不重发
+    assert manager.connected
+
+
+def test_abort_fails_everything_in_flight(device, simulator, managers):
+    manager, scanner = connect(device, "abort")
+    managers.append(manager)
+    absolute, offset = send_and_unplug(device, manager.controller)
+    for future in (absolute, offset):
+        with pytest.raises(ConnectionLost):
+            future.result(2)
+    scanner.device = simulator.port
+    wait_event(manager.events, "已重新连接")
+    assert manager.controller.submit(commands.Suction(1)).result(2)
+
+
+def test_binary_mode_is_renegotiated_after_reconnect(device, simulator, managers):
+    manager, scanner = connect(device, "replay")
+    managers.append(manager)
+    accepted = request_binary(manager.controller)
+    assert device.read_line() == "Binary_1"
+    device.reply("Binary: 1")
+    assert accepted.result(2)
+    device.close()
+    wait_event(manager.events, "正在重连")
+    scanner.device = simulator.port
+    wait_event(manager.events, "已重新启用二进制帧模式")
+    assert manager.controller.framing is not None
+    assert manager.controller.submit(commands.Suction(1)).result(2)
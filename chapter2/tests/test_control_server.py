@@ -0,0 +1,54 @@
+import pytest
+
+import commands
+from control_client import RemoteController
+from control_server import ControlServer
+from serial_io import AckError, SerialController
+
+
+@pytest.fixture
+def server(simulator):
+    controller = SerialController(events=False)
+    server = ControlServer(controller, address="127.0.0.1:0")
+    assert controller.open_serial(simulator.port, 115200)
+    host, port = server.start()
+    server.url = f"{host}:{port}"
+    yield server
+    server.stop()
+    controller.close_serial()
+
+
+@pytest.fixture
+def clients(server):
+    opened = []
+
+    def connect(name):
+        client = RemoteController(server.url, name=name, events=False)
+        assert client.open_serial()
+        opened.append(client)
+        return client
+
+    yield connect
+    for client in opened:
+        client.close_serial()
+
+
+def test_second_client_cannot_move_but_can_stop(clients):
+    owner = clients("a")
+    other = clients("b")
+    assert "控制权被其他客户端占用" in other.events.get(timeout=2)
+    assert not other.acquire()
+    with pytest.raises(AckError, match="控制权被 a 占用"):
+        other.submit(commands.Suction(1)).result(2)
+    assert other.submit(commands.STOP).result(2).startswith("Stop")
+    assert owner.submit(commands.Suction(1)).result(2).startswith("Suction")
+
+
+@pytest.mark.parametrize(
+    "key, value", [("timeout", float("nan")), ("timeout", -1), ("delay", float("inf"))]
+)
+def test_send_rejects_invalid_delay_and_timeout(clients, key, value):
+    client = clients("a")
+    request = {"op": "send", "command": "Speed_50", key: value}
+    with pytest.raises(AckError, match=key):
+        client._call(request)
@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+import commands
+from fleet import Fleet
+from simulator import PtySimulator
+
+
+@pytest.fixture
+def fleet():
+    fleet = Fleet(window=2, timeout=5)
+    yield fleet
+    fleet.close()
+
+
+def test_broadcast_stop_reports_each_arm(simulator, device, fleet):
+    fleet.add("a", simulator.port)
+    fleet.add("b", device.port)  # 不回复的控制器
+    results = asyncio.run(fleet.broadcast_stop(timeout=0.3))
+    assert results["a"].startswith("Stop")
+    assert isinstance(results["b"], TimeoutError)
+    assert device.read_line() == "Stop"  # 急停确实发出，只是没有确认
+
+
+def test_run_jobs_drives_arms_in_parallel(simulator, fleet):
+    other = PtySimulator(time_scale=0.01)
+    other.start()
+    try:
+        fleet.add("a", simulator.port)
+        fleet.add("b", other.port)
+        jobs = {
+            "a": [commands.DescartesLine(200, 0, 150 + i, 100) for i in range(5)],
+            "b": [commands.DescartesLine(200, 0, 150, 100), commands.Suction(1)],
+        }
+        assert asyncio.run(fleet.run_jobs(jobs)) == {"a": 5, "b": 2}
+    finally:
+        fleet.close()
+        other.close()
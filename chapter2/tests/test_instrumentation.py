@@ -0,0 +1,38 @@
+import types
+
+import commands
+from instrumentation import Instrumentation
+from main import RobotControlApp
+
+
+def test_failed_command_without_future_is_not_paired_with_later_reply(controller):
+    instrumentation = Instrumentation()
+    controller.instrument(instrumentation)
+    # 界面 send_command 不带 future，控制器以 Error 拒绝
+    assert controller.send_command("DescartesLine_900,900,900,100\n")
+    reply = controller.submit(commands.DescartesLine(200, 0, 150, 100)).result(2)
+    assert reply.startswith("DescartesLine")
+    stages = instrumentation.snapshot()
+    assert stages["ack"]["DescartesLine"]["count"] == 1
+    assert stages["total"]["DescartesLine"]["count"] == 1
+
+
+def test_motion_handlers_are_traced_by_their_own_name():
+    instrumentation = Instrumentation()
+    app = RobotControlApp.__new__(RobotControlApp)
+    app.serial_controller = types.SimpleNamespace(
+        instrumentation=instrumentation, send_command=lambda command: True
+    )
+    app.update_serial_info = lambda text: None
+    app.reach_check_var = types.SimpleNamespace(get=lambda: False)
+    app.workcell = None
+    app.speed = 100
+    entry = types.SimpleNamespace(get=lambda: "10")
+    app.joint_x = app.joint_y = app.joint_z = entry
+    app.line_x = app.line_y = app.line_z = entry
+    app.send_joint_data()
+    app.send_line_data()
+    assert sorted(instrumentation.snapshot()["handler"]) == [
+        "send_joint_data",
+        "send_line_data",
+    ]
@@ -0,0 +1,75 @@
+import json
+import types
+
+import pytest
+
+from kinematics import load_kinematics
+from main import RobotControlApp
+from sequence import plan_sequence
+
+ARM_CONFIG = {
+    "geometry": {
+        "base_height": 150,
+        "upper_arm": 200,
+        "forearm": 200,
+        "tool_offset": 75,
+    },
+    "joint_limits": [[-135, 135], [-10, 85], [-30, 75]],
+}
+
+
+class Entry:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return str(self.value)
+
+
+def gui(kinematics=None, reach_check=False):
+    app = RobotControlApp.__new__(RobotControlApp)
+    app.sent = []
+    app.info = []
+    app.serial_controller = types.SimpleNamespace(
+        instrumentation=None, send_command=lambda c: app.sent.append(str(c)) or True
+    )
+    app.update_serial_info = app.info.append
+    app._kinematics = kinematics
+    app.reach_check_var = types.SimpleNamespace(get=lambda: reach_check)
+    app.workcell = None
+    app.speed = 100
+    app.joint_x, app.joint_y, app.joint_z = Entry(-10), Entry(-20), Entry(-30)
+    app.world_x, app.world_y, app.world_z = Entry(250), Entry(0), Entry(100)
+    return app
+
+
+def test_gui_sends_without_reach_check_by_default():
+    # 示意尺寸下这两个目标都“超限”，未加载标定配置时不应被拒绝
+    app = gui()
+    app.send_joint_data()
+    app.send_world_data()
+    assert app.sent == ["JointAngle_-10,-20,-30,100", "DescartesPoint_250,0,100,100"]
+
+
+def test_gui_reach_check_uses_calibrated_geometry(tmp_path):
+    path = tmp_path / "arm.json"
+    path.write_text(json.dumps(ARM_CONFIG))
+    app = gui(load_kinematics(str(path)), reach_check=True)
+    app.send_joint_data()
+    assert app.sent == []
+    assert app.info[-1].startswith("目标不可达")
+
+
+def test_load_kinematics_rejects_bad_limits(tmp_path):
+    path = tmp_path / "arm.json"
+    config = dict(ARM_CONFIG, joint_limits=[[135, -135], [-10, 85], [-30, 75]])
+    path.write_text(json.dumps(config))
+    with pytest.raises(ValueError, match="标定配置错误"):
+        load_kinematics(str(path))
+
+
+def test_plan_sequence_checks_reach_only_on_request():
+    tasks = [[[250, 0, 100], [0, 250, 100]]]
+    assert plan_sequence(tasks).order == [0]
+    with pytest.raises(ValueError, match="不可达"):
+        plan_sequence(tasks, check_reach=True)
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from planner import plan_linear_move, speed_profile
+
+
+@pytest.mark.parametrize("profile", ["trapezoid", "scurve"])
+def test_profile_ramps_to_cruise_speed_when_start_equals_end(profile):
+    s = np.linspace(0, 1, 21)
+    speeds = speed_profile(s, 20, 20, max_speed=80, profile=profile)
+    assert np.ptp(speeds) > 0
+    assert speeds[0] == pytest.approx(20)
+    assert speeds[-1] == pytest.approx(20)
+    assert speeds.max() == pytest.approx(80)
+
+
+def test_cruise_speed_below_endpoints_is_raised():
+    speeds = speed_profile(np.linspace(0, 1, 11), 50, 30, max_speed=10)
+    assert speeds.min() >= 30
+
+
+def test_planned_segments_accelerate_and_decelerate():
+    plan = plan_linear_move((100, 0, 0), 20, 20, max_speed=80)
+    assert plan.speeds[0] < plan.speeds.max() == 80
+    assert plan.speeds[-1] < plan.speeds.max()
+    assert plan.offsets.sum(axis=0) == pytest.approx([100, 0, 0])
+
+
+def test_long_moves_keep_max_step():
+    plan = plan_linear_move((400, 0, 0), 50, 50)
+    assert len(plan.speeds) == 80
+    assert np.abs(plan.offsets).max() <= 5.0
+
+
+def test_segment_cap_raises_instead_of_stretching_segments():
+    with pytest.raises(ValueError, match="上限"):
+        plan_linear_move((400, 0, 0), 50, 50, max_segments=50)
@@ -0,0 +1,71 @@
+import pytest
+
+import commands
+from serial_io import AckError
+
+
+def test_unreachable_target_fails_without_waiting_for_timeout(controller):
+    future = controller.submit(
+        commands.from_text("DescartesLine_900,900,900,100"), timeout=5
+    )
+    with pytest.raises(AckError, match="unreachable"):
+        future.result(1)
+    # 失败的指令不影响之后的回复匹配
+    assert (
+        controller.submit(commands.from_text("Speed_30"))
+        .result(1)
+        .startswith("Total_Speed")
+    )
+
+
+def test_error_for_unregistered_command_does_not_fail_others(controller):
+    controller.send_command("Foo_1\n")
+    future = controller.submit(commands.from_text("DescartesLine_200,0,150,100"))
+    assert future.result(2).startswith("DescartesLine")
+
+
+# 控制器文档中的错误回复
+X_SCOPE_ERROR = (
+    "Error: X_DescartesCoordinate exceed scope,"
+    "The scope is -300.000000(mm) to 300.000000(mm)"
+)
+SINGULAR_ERROR = "Error: Joint singularly, A2_JointAngle - A3_JointAngle < 10"
+SPEED_SCOPE_ERROR = "Error: Speed exceed scope,The scope is 1(1%) to 100(100%)"
+LINE_REPLY = "DescartesLine: 1.000000mm(X), 2.000000mm(Y), 3.000000mm(Z)"
+
+
+def test_documented_error_fails_the_rejected_move(device, device_controller):
+    rejected = device_controller.submit(commands.DescartesLine(400, 0, 100, 50))
+    accepted = device_controller.submit(commands.DescartesLine(1, 2, 3, 50))
+    assert device.read_line().startswith("DescartesLine_400")
+    assert device.read_line().startswith("DescartesLine_1")
+    device.reply(X_SCOPE_ERROR, LINE_REPLY)
+    with pytest.raises(AckError, match="X_DescartesCoordinate"):
+        rejected.result(1)
+    assert accepted.result(1) == LINE_REPLY
+
+
+def test_speed_argument_error_does_not_fail_a_later_speed_command(
+    device, device_controller
+):
+    move = device_controller.submit(commands.DescartesLine(1, 2, 3, 50))
+    speed = device_controller.submit(commands.Speed(30))
+    device.read_line()
+    device.read_line()
+    device.reply(SPEED_SCOPE_ERROR, "Total_Speed: 030%")
+    with pytest.raises(AckError, match="Speed exceed scope"):
+        move.result(1)
+    assert speed.result(1) == "Total_Speed: 030%"
+
+
+def test_error_for_command_without_future_keeps_replies_in_order(
+    device, device_controller
+):
+    # 界面的 send_command 没有 future，错误也必须由它消耗
+    assert device_controller.send_command(commands.JointAngle(-10, -20, -30, 100))
+    device.read_line()
+    device.reply(SINGULAR_ERROR)
+    future = device_controller.submit(commands.JointAngle(0, 0, 0, 100))
+    device.read_line()
+    device.reply("JointAngle: 0.000000(A1), 0.000000(A2), 0.000000(A3)")
+    assert future.result(1).startswith("JointAngle")
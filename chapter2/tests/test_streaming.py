@@ -0,0 +1,44 @@
+import threading
+
+import pytest
+
+import commands
+from streaming import CommandStreamer, StreamError
+
+
+def moves(count):
+    return [commands.DescartesLine(200, 0, 150 + i, 100) for i in range(count)]
+
+
+def test_window_limits_in_flight_and_refills_on_ack(device, device_controller):
+    streamer = CommandStreamer(device_controller, window=2, timeout=5)
+    result = {}
+    thread = threading.Thread(
+        target=lambda: result.setdefault("count", streamer.stream(moves(4)))
+    )
+    thread.start()
+    assert device.read_line().endswith(",150,100")
+    assert device.read_line().endswith(",151,100")
+    with pytest.raises(TimeoutError):
+        device.read_line(timeout=0.3)  # 窗口已满，没有确认前不发第三条
+    device.reply("DescartesLine: 200.000000mm(X), 0.000000mm(Y), 100.000000mm(Z)")
+    assert device.read_line().endswith(",152,100")  # 一条确认后立即补发一条
+    device.reply("DescartesLine: 200.000000mm(X), 0.000000mm(Y), 101.000000mm(Z)")
+    assert device.read_line().endswith(",153,100")
+    device.reply(
+        "DescartesLine: 200.000000mm(X), 0.000000mm(Y), 102.000000mm(Z)",
+        "DescartesLine: 200.000000mm(X), 0.000000mm(Y), 103.000000mm(Z)",
+    )
+    thread.join(2)
+    assert result["count"] == 4
+
+
+def test_stream_error_reports_first_failed_index(controller):
+    plan = moves(2) + [commands.DescartesLine(900, 900, 900, 100)] + moves(2)
+    acked = []
+    streamer = CommandStreamer(controller, window=4, timeout=5)
+    with pytest.raises(StreamError) as info:
+        streamer.stream(plan, lambda index, command, reply: acked.append(index))
+    assert info.value.index == 2
+    assert str(info.value.command) == "DescartesLine_900,900,900,100"
+    assert acked == [0, 1]
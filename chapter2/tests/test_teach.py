@@ -0,0 +1,18 @@
+import commands
+from teach import TeachRecorder, load_session
+
+
+def test_records_raw_text_commands(controller, tmp_path):
+    path = tmp_path / "session.jsonl"
+    recorder = TeachRecorder(str(path))
+    recorder.start(controller)
+    try:
+        # 界面手动输入的指令以文本发送
+        assert controller.submit("Suction_1\n").result(2).startswith("Suction")
+        controller.submit("Bogus_1\n").exception(2)
+        # 记录出错时写线程也必须继续工作，急停仍能发出
+        assert controller.submit(commands.STOP).result(2).startswith("Stop")
+    finally:
+        recorder.stop()
+    entries = load_session(str(path))
+    assert [str(command) for _, command in entries] == ["Suction_1", "Stop"]
@@ -0,0 +1,271 @@
+"""工作单元障碍物模型：发送运动前检查末端路径是否穿过夹具、料盘等固定障碍物
+
+配置文件为 JSON，障碍物为轴对齐长方体或竖直圆柱，margin 为末端半径加安全余量 (mm)：
+
+    {
+        "margin": 10,
+        "cell_size": 50,
+        "obstacles": [
+            {"name": "料盘", "box": [[200, -100, 0], [300, 100, 40]]},
+            {"name": "立柱", "cylinder": {"center": [150, 200], "radius": 20, "z": [0, 300]}}
+        ]
+    }
+
+障碍物按膨胀后的包围盒登记到均匀网格中；检查一段线段时沿线段逐格遍历（3D DDA），
+只对经过的格子里的障碍物做精确相交测试，代价与线段经过的格子数成正比，与障碍物总数无关。
+直线运动 (DescartesLine_/DescartesLinearOffset_) 按直线检查；点到点运动和关节运动的
+末端轨迹不是直线，按关节角线性插值后用正解采样成折线检查。
+"""
+
+import collections
+import json
+import math
+
+import numpy as np
+
+DEFAULT_MARGIN = 10.0
+DEFAULT_CELL_SIZE = 50.0
+JOINT_STEP = 2.0  # 关节插值采样的最大角度间隔 (°)
+HOME_JOINTS = (0.0, 0.0, 0.0)
+
+Box = collections.namedtuple("Box", ["name", "low", "high"])
+Cylinder = collections.namedtuple(
+    "Cylinder", ["name", "x", "y", "radius", "z_low", "z_high"]
+)
+
+LINEAR_MOVES = ("DescartesLine", "DescartesLinearOffset")
+
+
+def _parse_obstacle(item):
+    name = item.get("name", "障碍物")
+    if "box" in item:
+        low, high = item["box"]
+        low = tuple(float(v) for v in low)
+        high = tuple(float(v) for v in high)
+        if len(low) != 3 or len(high) != 3 or any(a > b for a, b in zip(low, high)):
+            raise ValueError(
+                f"{name}: box 应为 [[x0,y0,z0],[x1,y1,z1]] 且下限不大于上限"
+            )
+        return Box(name, low, high)
+    if "cylinder" in item:
+        spec = item["cylinder"]
+        x, y = (float(v) for v in spec["center"])
+        z_low, z_high = (float(v) for v in spec["z"])
+        return Cylinder(name, x, y, float(spec["radius"]), z_low, z_high)
+    raise ValueError(f"{name}: 未知的障碍物类型，应为 box 或 cylinder")
+
+
+def load_workcell(path):
+    """读取配置文件，格式错误时抛出 ValueError"""
+    with open(path, encoding="utf-8") as f:
+        try:
+            config = json.load(f)
+            obstacles = [_parse_obstacle(item) for item in config.get("obstacles", [])]
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"工作单元配置错误: {e}") from None
+    return Workcell(
+        obstacles,
+        margin=float(config.get("margin", DEFAULT_MARGIN)),
+        cell_size=float(config.get("cell_size", DEFAULT_CELL_SIZE)),
+    )
+
+
+def _segment_hits_box(p, d, low, high):
+    # slab 法：参数 t ∈ [0, 1] 的线段 p + t·d 是否与长方体相交
+    t0, t1 = 0.0, 1.0
+    for axis in range(3):
+        if d[axis] == 0.0:
+            if not low[axis] <= p[axis] <= high[axis]:
+                return False
+            continue
+        a = (low[axis] - p[axis]) / d[axis]
+        b = (high[axis] - p[axis]) / d[axis]
+        if a > b:
+            a, b = b, a
+        t0 = max(t0, a)
+        t1 = min(t1, b)
+        if t0 > t1:
+            return False
+    return True
+
+
+def _segment_hits_cylinder(p, d, cylinder, margin):
+    # 先把线段裁剪到圆柱的高度范围，再求水平面内线段到圆心的最短距离
+    z_low, z_high = cylinder.z_low - margin, cylinder.z_high + margin
+    t0, t1 = 0.0, 1.0
+    if d[2] == 0.0:
+        if not z_low <= p[2] <= z_high:
+            return False
+    else:
+        a = (z_low - p[2]) / d[2]
+        b = (z_high - p[2]) / d[2]
+        if a > b:
+            a, b = b, a
+        t0, t1 = max(t0, a), min(t1, b)
+        if t0 > t1:
+            return False
+    ox, oy = p[0] - cylinder.x, p[1] - cylinder.y
+    dd = d[0] * d[0] + d[1] * d[1]
+    t = t0 if dd == 0.0 else min(max(-(ox * d[0] + oy * d[1]) / dd, t0), t1)
+    dx, dy = ox + t * d[0], oy + t * d[1]
+    radius = cylinder.radius + margin
+    return dx * dx + dy * dy <= radius * radius
+
+
+class Workcell:
+    """静态障碍物集合与均匀网格索引"""
+
+    def __init__(self, obstacles, margin=DEFAULT_MARGIN, cell_size=DEFAULT_CELL_SIZE):
+        self.obstacles = list(obstacles)
+        self.margin = margin
+        self.cell_size = cell_size
+        self._bounds = []  # 膨胀后的包围盒
+        self._grid = collections.defaultdict(list)
+        for index, obstacle in enumerate(self.obstacles):
+            low, high = self._inflated_bounds(obstacle)
+            self._bounds.append((low, high))
+            lo = self._cell(low)
+            hi = self._cell(high)
+            for ix in range(lo[0], hi[0] + 1):
+                for iy in range(lo[1], hi[1] + 1):
+                    for iz in range(lo[2], hi[2] + 1):
+                        self._grid[ix, iy, iz].append(index)
+
+    def _inflated_bounds(self, obstacle):
+        m = self.margin
+        if isinstance(obstacle, Box):
+            low = tuple(v - m for v in obstacle.low)
+            high = tuple(v + m for v in obstacle.high)
+        else:
+            r = obstacle.radius + m
+            low = (obstacle.x - r, obstacle.y - r, obstacle.z_low - m)
+            high = (obstacle.x + r, obstacle.y + r, obstacle.z_high + m)
+        return low, high
+
+    def _cell(self, point):
+        size = self.cell_size
+        return tuple(int(math.floor(v / size)) for v in point)
+
+    def _cells_along(self, p0, p1):
+        """3D DDA：按顺序生成线段经过的网格坐标"""
+        size = self.cell_size
+        cell = list(self._cell(p0))
+        end = self._cell(p1)
+        d = [b - a for a, b in zip(p0, p1)]
+        step, t_max, t_delta = [0, 0, 0], [math.inf] * 3, [math.inf] * 3
+        for axis in range(3):
+            if d[axis] > 0:
+                step[axis] = 1
+                boundary = (cell[axis] + 1) * size
+            elif d[axis] < 0:
+                step[axis] = -1
+                boundary = cell[axis] * size
+            else:
+                continue
+            t_max[axis] = (boundary - p0[axis]) / d[axis]
+            t_delta[axis] = size / abs(d[axis])
+        yield tuple(cell)
+        # 步数上限为三个方向跨越的格数之和，防止浮点误差导致死循环
+        for _ in range(sum(abs(e - c) for e, c in zip(end, cell))):
+            axis = t_max.index(min(t_max))
+            if t_max[axis] > 1.0:
+                break
+            cell[axis] += step[axis]
+            t_max[axis] += t_delta[axis]
+            yield tuple(cell)
+
+    def segment_hit(self, p0, p1):
+        """线段 p0→p1 碰到的第一个障碍物，没有则返回 None"""
+        p0 = tuple(float(v) for v in p0)
+        p1 = tuple(float(v) for v in p1)
+        d = tuple(b - a for a, b in zip(p0, p1))
+        seen = set()
+        for cell in self._cells_along(p0, p1):
+            for index in self._grid.get(cell, ()):
+                if index in seen:
+                    continue
+                seen.add(index)
+                obstacle = self.obstacles[index]
+                if isinstance(obstacle, Box):
+                    low, high = self._bounds[index]
+                    hit = _segment_hits_box(p0, d, low, high)
+                else:
+                    hit = _segment_hits_cylinder(p0, d, obstacle, self.margin)
+                if hit:
+                    return obstacle
+        return None
+
+    def point_hit(self, point):
+        return self.segment_hit(point, point)
+
+    def check_path(self, points):
+        """检查折线 (N, 3)，无碰撞返回 None，否则返回原因"""
+        points = [tuple(p) for p in np.asarray(points, dtype=float).tolist()]
+        if len(points) == 1:
+            obstacle = self.point_hit(points[0])
+            if obstacle is not None:
+                return f"目标点 {_fmt(points[0])} 位于 {obstacle.name} 内"
+            return None
+        for a, b in zip(points[:-1], points[1:]):
+            obstacle = self.segment_hit(a, b)
+            if obstacle is not None:
+                return f"路径 {_fmt(a)} → {_fmt(b)} 穿过 {obstacle.name}"
+        return None
+
+    def check_move(self, start, command, kinematics):
+        """检查一条运动指令从 start（末端坐标，未知时为 None）出发的路径"""
+        path = move_path(start, command, kinematics)
+        if path is None:
+            return None
+        return self.check_path(path)
+
+
+def _fmt(point):
+    return "(" + ", ".join(f"{v:.1f}" for v in point) + ")"
+
+
+def next_position(start, command, kinematics):
+    """执行 command 后的末端坐标；不是运动指令时返回 start，无法推算时返回 None"""
+    opcode = command.opcode
+    if opcode in ("DescartesPoint", "DescartesLine"):
+        return (command.x, command.y, command.z)
+    if opcode in ("DescartesPointOffset", "DescartesLinearOffset"):
+        if start is None:
+            return None
+        return (start[0] + command.x, start[1] + command.y, start[2] + command.z)
+    if opcode == "JointAngle":
+        return tuple(kinematics.forward([command.x, command.y, command.z]).tolist())
+    if opcode == "JointAngleOffset":
+        joints = None if start is None else kinematics.inverse_point(*start)
+        if joints is None:
+            return None
+        target = [j + v for j, v in zip(joints, (command.x, command.y, command.z))]
+        return tuple(kinematics.forward(target).tolist())
+    if opcode == "Origin":
+        return tuple(kinematics.forward(HOME_JOINTS).tolist())
+    if opcode in ("MovStart", "Stop"):
+        return None  # 点动或急停后位置未知
+    return start
+
+
+def move_path(start, command, kinematics):
+    """运动指令的末端轨迹 (N, 3)；不是运动指令时返回 None，起点未知时只有目标点"""
+    target = next_position(start, command, kinematics)
+    if command.opcode in ("MovStart", "Stop") or target == start:
+        return None
+    if target is None:
+        return None
+    if start is None:
+        return np.array([target])
+    if command.opcode in LINEAR_MOVES:
+        return np.array([start, target])
+    # 点到点运动按关节线性插值
+    joints0 = kinematics.inverse_point(*start)
+    joints1 = kinematics.inverse_point(*target)
+    if joints0 is None or joints1 is None:
+        return np.array([start, target])
+    span = max(abs(b - a) for a, b in zip(joints0, joints1))
+    count = max(2, int(math.ceil(span / JOINT_STEP)) + 1)
+    t = np.linspace(0.0, 1.0, count)[:, None]
+    joints = np.asarray(joints0) + t * (np.asarray(joints1) - np.asarray(joints0))
+    return kinematics.forward(joints)